@@ -2,48 +2,45 @@ import os
 from dotenv import load_dotenv
 import google.generativeai as genai
 import time
-from collections import deque
+import json
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-import re
+import sqlite3
+import pymongo
+from app_index import AppNameIndex
+from rule_engine import RuleEngine, PRODUCTIVE_DOMAINS, UNPRODUCTIVE_DOMAINS
+from classification_store import ClassificationStore
+from ttl_cache import LRUTTLCache
+from cache_keys import CacheKeyBuilder
+from classification_batcher import ClassificationBatcher
+from single_flight import SingleFlight
+from local_model import LocalTitleModel
+from token_bucket import TokenBucketLimiter, FileBucketStore, MongoBucketStore
+from stage_stats import StageStats
 
-class RateLimiter:
-    """
-    A class to manage API request rate limiting.
-    
-    Ensures that the number of requests does not exceed a specified limit per minute
-    by tracking request times and implementing a waiting mechanism.
-    """
-    def __init__(self, requests_per_minute=60):
-        """
-        Initialize the RateLimiter with a specified requests per minute limit.
-        
-        Args:
-            requests_per_minute (int): Maximum number of requests allowed per minute.
-        """
-        self.requests_per_minute = requests_per_minute
-        self.request_times = deque()
-        
-    def wait_if_needed(self):
-        """
-        Wait if necessary to stay within rate limits.
-        
-        Removes requests older than 1 minute, checks if current request will exceed limit,
-        and sleeps if needed to maintain the rate limit.
-        """
-        now = datetime.now()
-        
-        # Remove requests older than 1 minute
-        while self.request_times and (now - self.request_times[0]) > timedelta(minutes=1):
-            self.request_times.popleft()
-            
-        # If at limit, wait until oldest request is more than 1 minute old
-        if len(self.request_times) >= self.requests_per_minute:
-            wait_time = (self.request_times[0] + timedelta(minutes=1) - now).total_seconds()
-            if wait_time > 0:
-                time.sleep(wait_time)
-                
-        # Add current request
-        self.request_times.append(now)
+# Shared by the single-window and the batched prompt
+CLASSIFICATION_GUIDELINES = """
+                Productive applications include:
+                - Development tools (VSCode, PyCharm, IntelliJ, Sublime, etc.)
+                - Office suites (Word, Excel, PowerPoint, etc.)
+                - Browsers when used for work/research
+                - Communication tools (Teams, Slack, Zoom, etc.)
+                - Design tools (Figma, Photoshop, etc.)
+                - Project management (Jira, Asana, etc.)
+                - Terminal/command line applications
+                - Database tools
+                - Learning platforms
+
+                Unproductive applications include:
+                - Games and gaming platforms
+                - Social media platforms
+                - Streaming entertainment
+                - Non-work-related video platforms
+                - Messaging apps when not work-related
+
+                Consider both the application name AND the window title context.
+                For example, VS Code showing a Python file would be productive.
+"""
 
 class AIClassifier:
     """
@@ -60,8 +57,15 @@ class AIClassifier:
         # Load environment variables
         load_dotenv()
         
-        # Initialize rate limiter (adjust rate as needed)
-        self.rate_limiter = RateLimiter(requests_per_minute=30)
+        # Token bucket for Gemini requests (adjust rate as needed)
+        requests_per_minute = float(os.getenv('AI_REQUESTS_PER_MINUTE', 30))
+        self.rate_limiter = TokenBucketLimiter(
+            rate=requests_per_minute / 60,
+            capacity=float(os.getenv('AI_RATE_LIMIT_BURST', requests_per_minute)),
+            store=self._rate_limit_store()
+        )
+        # Seconds a request may wait for a token before falling back to rules
+        self.rate_limit_wait = float(os.getenv('AI_RATE_LIMIT_WAIT', 10))
         
         # Load Gemini API Key
         api_key = os.getenv('GEMINI_API_KEY')
@@ -160,6 +164,13 @@ class AIClassifier:
             'chess.com', 'Chess.com', 'lichess', 'Lichess',
         }
         
+        # Built-in lists, restored when corrections are deleted
+        self._builtin_productive_apps = frozenset(self.productive_apps)
+        self._builtin_unproductive_apps = frozenset(self.unproductive_apps)
+
+        # Normalized token index over both app lists
+        self.app_index = AppNameIndex(self.productive_apps, self.unproductive_apps)
+        
         # AI misclassification correction dictionary
         self.known_corrections = {
             'vscode': True,
@@ -174,66 +185,75 @@ class AIClassifier:
         }
         
         # Domain-based classification patterns
-        self.productive_domains = [
-            r'github\.com',
-            r'gitlab\.com',
-            r'bitbucket\.org',
-            r'stackoverflow\.com',
-            r'docs\.python\.org',
-            r'developer\.mozilla\.org',
-            r'w3schools\.com',
-            r'medium\.com',
-            r'dev\.to',
-            r'learn\.microsoft\.com',
-            r'aws\.amazon\.com',
-            r'cloud\.google\.com',
-            r'docs\.aws\.amazon\.com',
-            r'azure\.microsoft\.com',
-            r'jira\.com',
-            r'atlassian\.com',
-            r'codepen\.io',
-            r'replit\.com',
-            r'kaggle\.com',
-            r'freecodecamp\.org',
-            r'udemy\.com',
-            r'coursera\.org',
-            r'edx\.org',
-            r'linkedin\.com/learning',
-            r'pluralsight\.com',
-            r'educative\.io'
-        ]
-        
-        self.unproductive_domains = [
-            r'facebook\.com',
-            r'instagram\.com',
-            r'twitter\.com',
-            r'reddit\.com',
-            r'netflix\.com',
-            r'hulu\.com',
-            r'disney\.com',
-            r'disneyplus\.com',
-            r'youtube\.com/(?!.*tutorial|.*learn|.*education|.*programming|.*code|.*development)',
-            r'twitch\.tv',
-            r'tiktok\.com',
-            r'pinterest\.com',
-            r'snapchat\.com',
-            r'tumblr\.com',
-            r'9gag\.com',
-            r'buzzfeed\.com',
-            r'espn\.com',
-            r'nfl\.com',
-            r'nba\.com',
-            r'mlb\.com'
-        ]
+        self.productive_domains = list(PRODUCTIVE_DOMAINS)
+        self.unproductive_domains = list(UNPRODUCTIVE_DOMAINS)
+
+        # Domain, activity and keyword rules compiled into one engine
+        self._build_rule_engine()
         
         # Cache for AI classifications
-        self.classification_cache = {}
-        self.cache_duration = timedelta(hours=24)
-        self.cache_cleanup_counter = 0
+        self.cache_duration = timedelta(hours=float(os.getenv('CLASSIFICATION_CACHE_TTL_HOURS', 24)))
+        self.classification_cache = LRUTTLCache(
+            max_entries=int(os.getenv('CLASSIFICATION_CACHE_MEMORY_ENTRIES', 2000)),
+            ttl_seconds=self.cache_duration.total_seconds()
+        )
+        # Browser pages are cached per site and title, other apps per app
+        self.cache_keys = CacheKeyBuilder()
+
+        # On-disk tier behind the cache, so verdicts survive restarts
+        self.classification_store = None
+        try:
+            self.classification_store = ClassificationStore(
+                os.getenv('CLASSIFICATION_CACHE_PATH', os.path.join('cache', 'classifications.db')),
+                ttl_seconds=self.cache_duration.total_seconds(),
+                max_entries=int(os.getenv('CLASSIFICATION_CACHE_MAX_ENTRIES', 10000))
+            )
+            self._warm_load_cache()
+        except sqlite3.Error as e:
+            print(f"Classification store unavailable, using memory cache only: {e}")
+            self.classification_store = None
+
+        # On-box model trained from AI verdicts and user feedback; only
+        # answers when it is at least LOCAL_MODEL_THRESHOLD confident
+        self.local_model = LocalTitleModel(
+            os.getenv('LOCAL_MODEL_PATH', os.path.join('cache', 'local_model.npz'))
+        )
+        self.local_model_threshold = float(os.getenv('LOCAL_MODEL_THRESHOLD', 0.9))
+        self.local_model_min_samples = int(os.getenv('LOCAL_MODEL_MIN_SAMPLES', 50))
+        self.feedback_weight = 5.0
         
         # User feedback dictionary to learn from corrections
         self.user_feedback = {}
+        self.feedback_store = None
+
+        # Windows that need the AI are sent in batches of up to AI_BATCH_SIZE
+        self.batcher = ClassificationBatcher(
+            self._classify_batch_with_ai,
+            max_batch=int(os.getenv('AI_BATCH_SIZE', 20)),
+            max_wait=float(os.getenv('AI_BATCH_WAIT', 0.5)),
+            workers=int(os.getenv('CLASSIFIER_WORKERS', 2))
+        )
+
+        # Concurrent cache misses for the same app share one AI request
+        self.single_flight = SingleFlight()
+        self.ai_wait_timeout = float(os.getenv('AI_WAIT_TIMEOUT', 120))
+
+        # Which strategy answers each window, and how long each one takes
+        self.stage_stats = StageStats()
         
+    def _rate_limit_store(self):
+        """
+        Pick where the Gemini budget is kept: AI_RATE_LIMIT_SHARED=file shares
+        it between processes on this machine, =mongo between all hosts.
+        """
+        shared = os.getenv('AI_RATE_LIMIT_SHARED', '').lower()
+        if shared == 'file':
+            return FileBucketStore(os.getenv('AI_RATE_LIMIT_FILE', os.path.join('cache', 'ai_rate_limit.json')))
+        if shared == 'mongo':
+            client = pymongo.MongoClient(os.getenv('MONGODB_URI'))
+            return MongoBucketStore(client['productivity_tracker']['rate_limits'])
+        return None
+
     def _clean_app_name(self, app_name):
         """Normalize app name for consistent matching"""
         return app_name.lower().strip()
@@ -245,102 +265,95 @@ class AIClassifier:
         title = parts[1].strip() if len(parts) > 1 else ""
         return app_name, title
     
-    def _check_domain_patterns(self, window_title):
-        """Check if window title contains a productive or unproductive domain"""
-        # Check against productive domains
-        for pattern in self.productive_domains:
-            if re.search(pattern, window_title, re.IGNORECASE):
-                return True, True  # Found match, is productive
-                
-        # Check against unproductive domains
-        for pattern in self.unproductive_domains:
-            if re.search(pattern, window_title, re.IGNORECASE):
-                return True, False  # Found match, is unproductive
-                
-        # No match found
-        return False, None
-    
-    def _detect_productive_activities(self, window_title):
-        """Detect specific productive activities in the window title"""
-        productive_patterns = [
-            r'\.py\b',  # Python files
-            r'\.js\b',  # JavaScript files
-            r'\.html\b',  # HTML files
-            r'\.css\b',  # CSS files
-            r'\.java\b',  # Java files
-            r'\.cpp\b|\.c\b|\.h\b',  # C/C++ files
-            r'\.php\b',  # PHP files
-            r'\.sql\b',  # SQL files
-            r'\.md\b',  # Markdown files
-            r'\.json\b',  # JSON files
-            r'\.xml\b',  # XML files
-            r'\.yml\b|\.yaml\b',  # YAML files
-            r'\.sh\b|\.bat\b|\.ps1\b',  # Shell scripts
-            r'pull request|PR #|issue #|commit',  # Git operations
-            r'debug|breakpoint|console|terminal',  # Development activities
-            r'localhost|127\.0\.0\.1|0\.0\.0\.0',  # Local development
-            r'ssh:|ftp:|sftp:',  # Remote connections
-            r'database|db connection|query',  # Database work
-            r'meeting notes|agenda|minutes',  # Meeting documentation
-            r'report|analysis|dashboard',  # Business activities
-            r'project plan|roadmap|sprint',  # Project management
-            r'presentation|slides|deck',  # Presentations
-            r'document|specification|requirements',  # Documentation
-            r'learning|tutorial|course|training',  # Learning activities
-        ]
-        
-        for pattern in productive_patterns:
-            if re.search(pattern, window_title, re.IGNORECASE):
-                return True
-                
-        return False
-    
-    def _check_productivity_keywords(self, window_title):
-        """Check for productivity-related keywords in window title"""
-        productive_keywords = [
-            'work', 'project', 'task', 'meeting', 'email', 'code', 'develop', 'write', 'edit',
-            'design', 'create', 'build', 'research', 'learn', 'study', 'review', 'analyse', 'analyze',
-            'report', 'document', 'presentation', 'client', 'customer', 'planning', 'debug',
-            'test', 'implement', 'deploy', 'database', 'server', 'api', 'cloud', 'git', 'terminal',
-            'console', 'editor', 'ide', 'notebook', 'programming', 'development'
-        ]
-        
-        for keyword in productive_keywords:
-            if re.search(r'\b' + re.escape(keyword) + r'\b', window_title, re.IGNORECASE):
-                return True
-                
-        return False
+    def _build_rule_engine(self):
+        """Compile the title rules; called again whenever the rules change"""
+        self.rule_engine = RuleEngine.from_classifier_rules(
+            self.productive_domains,
+            self.unproductive_domains
+        )
+
+    def _answered(self, stage, verdict, started):
+        """Count the strategy that decided a window and time the whole lookup"""
+        self.stage_stats.count(f'answered.{stage}')
+        self.stage_stats.lap('classify_by_rules', started)
+        return verdict
         
-    def _is_cached_classification_valid(self, cached_result):
-        """Check if cached classification is still valid"""
-        return (datetime.now() - cached_result['timestamp']) < self.cache_duration
-    
-    def _cleanup_cache(self):
-        """Periodically clean up expired cache entries"""
-        self.cache_cleanup_counter += 1
-        if self.cache_cleanup_counter >= 100:  # Cleanup every 100 classifications
-            now = datetime.now()
-            expired_keys = [
-                key for key, value in self.classification_cache.items()
-                if (now - value['timestamp']) > self.cache_duration
-            ]
-            for key in expired_keys:
-                del self.classification_cache[key]
-            self.cache_cleanup_counter = 0
-    
-    def add_user_feedback(self, window_info, is_productive):
-        """Add user feedback for a misclassified window"""
-        app_name, _ = self._extract_app_and_title(window_info)
+    def _warm_load_cache(self):
+        """Fill the memory cache with the unexpired verdicts stored on disk"""
+        entries = self.classification_store.load(limit=self.classification_cache.max_entries)
+        # Oldest first, so the newest verdicts end up most recently used
+        for key, productive, source, updated_at in reversed(entries):
+            self.classification_cache.put(key, {
+                'productive': productive,
+                'timestamp': datetime.fromtimestamp(updated_at),
+                'source': source
+            }, created_at=updated_at)
+
+    def _cache_verdict(self, key, is_productive, source):
+        """Cache a verdict in memory and write it through to the disk store"""
+        now = datetime.now()
+        self.classification_cache.put(key, {
+            'productive': is_productive,
+            'timestamp': now,
+            'source': source
+        }, created_at=now.timestamp())
+        if self.classification_store is not None:
+            try:
+                self.classification_store.put(key, is_productive, source, now.timestamp())
+            except sqlite3.Error as e:
+                print(f"Classification store write error: {e}")
+
+    def cache_stats(self):
+        """Get hit, miss and eviction counters of the classification cache"""
+        return self.classification_cache.stats()
+
+    def single_flight_stats(self):
+        """Get counters of AI requests shared between concurrent callers"""
+        return self.single_flight.stats()
+
+    def classifier_stats(self):
+        """
+        Get per-strategy counters and latency histograms together with the
+        counters of the cache, rate limiter, batcher and local model.
+        """
+        stats = self.stage_stats.snapshot()
+        stats.update({
+            'cache': self.cache_stats(),
+            'single_flight': self.single_flight_stats(),
+            'rate_limiter': self.rate_limiter.stats(),
+            'batcher': self.batcher.stats(),
+            'local_model': self.local_model.stats(),
+            'rule_engine': self.rule_engine.stats(),
+            'app_index': self.app_index.stats()
+        })
+        return stats
+
+    def _apply_feedback(self, window_info, is_productive, learn=True):
+        """
+        Apply a correction to the in-memory rules.
+
+        The app sets and the app index are updated in place; the compiled
+        title rules do not depend on app feedback and are left alone. A
+        correction of a browser page covers its site or title only, never
+        the whole browser.
+
+        Returns:
+            str: The key the correction applies to: the app's clean name, or
+            the page's cache key for browser pages.
+        """
+        app_name, window_title = self._extract_app_and_title(window_info)
         clean_app = self._clean_app_name(app_name)
+
+        keys = self.cache_keys.build(clean_app, window_title)
+        if keys.page is not None:
+            self.user_feedback[keys.store] = is_productive
+            if learn:
+                self.local_model.learn(app_name, window_title, is_productive, self.feedback_weight)
+                self._cache_verdict(keys.store, is_productive, 'user_feedback')
+            return keys.store
+
         self.user_feedback[clean_app] = is_productive
         
-        # Update the cache as well
-        self.classification_cache[clean_app] = {
-            'productive': is_productive,
-            'timestamp': datetime.now(),
-            'source': 'user_feedback'
-        }
-        
         # If there's significant user feedback, add it to the predefined lists
         if clean_app in self.user_feedback:
             if is_productive:
@@ -353,106 +366,389 @@ class AIClassifier:
                 # Remove from productive if it was there
                 if clean_app in self.productive_apps:
                     self.productive_apps.remove(clean_app)
+
+        self.app_index.add(clean_app, is_productive)
+
+        if learn:
+            self.local_model.learn(app_name, window_title, is_productive, self.feedback_weight)
+            # Update the cache as well
+            self._cache_verdict(clean_app, is_productive, 'user_feedback')
+        return clean_app
+
+    def add_user_feedback(self, window_info, is_productive, employee_id=None):
+        """Add user feedback for a misclassified window"""
+        return self.add_user_feedback_batch(employee_id, [(window_info, is_productive)])
+
+    def add_user_feedback_batch(self, employee_id, corrections):
+        """
+        Apply several corrections and persist them in one write.
+
+        Args:
+            employee_id (str): Employee who made the corrections; they are
+                only persisted when it is set and a feedback store is attached.
+            corrections (list): (window_info, is_productive) tuples.
+
+        Returns:
+            int: Number of corrections applied.
+        """
+        saved = []
+        for window_info, is_productive in corrections:
+            clean_app = self._apply_feedback(window_info, is_productive)
+            saved.append((clean_app, window_info, is_productive))
+
+        if employee_id and self.feedback_store is not None:
+            try:
+                self.feedback_store.save_many(employee_id, saved)
+            except Exception as e:
+                print(f"Could not persist user feedback: {e}")
+        return len(saved)
+
+    def load_feedback(self, feedback_store):
+        """
+        Attach a feedback store and apply every correction it holds.
+
+        Corrections were already learned by the local model and cached when
+        they were first made, so loading only restores the rules.
+
+        Args:
+            feedback_store (FeedbackStore): Persistent corrections.
+        """
+        self.feedback_store = feedback_store
+        count = 0
+        try:
+            for doc in feedback_store.load_all():
+                self._apply_feedback(doc['window_info'], doc['productive'], learn=False)
+                count += 1
+        except Exception as e:
+            print(f"Could not load user feedback: {e}")
+        return count
     
+    def forget_feedback(self, employee_id):
+        """
+        Delete an employee's corrections and undo them in memory.
+
+        The app lists, app index and feedback rules are rebuilt from the
+        built-in lists and everyone else's corrections; verdicts cached from
+        the deleted corrections are dropped and the local model unlearns
+        them.
+
+        Args:
+            employee_id (str): Employee whose corrections are deleted.
+
+        Returns:
+            int: Number of corrections deleted.
+        """
+        if self.feedback_store is None:
+            return 0
+        removed = self.feedback_store.delete_employee(employee_id)
+        for doc in removed:
+            self.classification_cache.delete(doc['app'])
+            if self.classification_store is not None:
+                self.classification_store.delete(doc['app'])
+            app_name, window_title = self._extract_app_and_title(doc['window_info'])
+            self.local_model.unlearn(app_name, window_title, doc['productive'], self.feedback_weight)
+
+        self.user_feedback = {}
+        self.productive_apps = set(self._builtin_productive_apps)
+        self.unproductive_apps = set(self._builtin_unproductive_apps)
+        self.app_index = AppNameIndex(self.productive_apps, self.unproductive_apps)
+        for doc in self.feedback_store.load_all():
+            self._apply_feedback(doc['window_info'], doc['productive'], learn=False)
+        return len(removed)
+
+    def fallback_classification(self, window_info):
+        """
+        Heuristic verdict used when the AI classification is unavailable.
+
+        Defaults to productive for development tools when in doubt.
+        """
+        app_name, _ = self._extract_app_and_title(window_info)
+        clean_app = self._clean_app_name(app_name)
+        return 'code' in clean_app or 'develop' in clean_app or 'studio' in clean_app
+
+    def classify_by_rules(self, window_info):
+        """
+        Classify a window using only local strategies (rules, cache and the
+        local model).
+
+        Never calls the Gemini API, so it is safe to use from latency
+        sensitive code such as the tracking loop.
+
+        Returns:
+            bool or None: The verdict, or None if only the AI can decide.
+        """
+        stats = self.stage_stats
+        started = lap = time.perf_counter()
+
+        # Extract and clean app name and title
+        app_name, window_title = self._extract_app_and_title(window_info)
+        clean_app = self._clean_app_name(app_name)
+        # Browser pages are decided by the page, never by the browser alone
+        keys = self.cache_keys.build(clean_app, window_title)
+        page_title = keys.page[1] if keys.page is not None else None
+        lap = stats.lap('stage.parse', lap)
+
+        # Strategy 1: Known correction check
+        is_productive = self.known_corrections.get(app_name)
+        lap = stats.lap('stage.known_corrections', lap)
+        if is_productive is not None:
+            return self._answered('known_corrections', is_productive, started)
+
+        # Strategy 2: User feedback check, per app or per browser page
+        for key in keys.lookup:
+            is_productive = self.user_feedback.get(key)
+            if is_productive is not None:
+                break
+        lap = stats.lap('stage.user_feedback', lap)
+        if is_productive is not None:
+            return self._answered('user_feedback', is_productive, started)
+
+        # Strategy 3: Check predefined lists first
+        if page_title is None:
+            if clean_app in self.productive_apps or app_name in self.productive_apps:
+                is_productive = True
+            elif clean_app in self.unproductive_apps or app_name in self.unproductive_apps:
+                is_productive = False
+        lap = stats.lap('stage.app_sets', lap)
+        if is_productive is not None:
+            return self._answered('app_sets', is_productive, started)
+
+        # Strategies 4-6: Domain patterns, productive activities and
+        # productivity keywords in the window title, matched in one pass
+        # and counted by the kind of rule that decided
+        rule = self.rule_engine.match(page_title if page_title is not None else window_title)
+        lap = stats.lap('stage.title_rules', lap)
+        if rule:
+            return self._answered(rule.kind, rule.productive, started)
+
+        # Strategy 6b: Known app in the app part of the label, e.g. "Visual
+        # Studio Code"; after the title rules so they decide what a page is about
+        if page_title is None:
+            is_productive = self.app_index.lookup(app_name)
+        lap = stats.lap('stage.app_index', lap)
+        if is_productive is not None:
+            return self._answered('app_index', is_productive, started)
+
+        # Strategy 7: Check cache from the most specific key (title, site)
+        # down to the app (expired entries are dropped on read)
+        for key in keys.lookup:
+            cached_result = self.classification_cache.get(key)
+            if cached_result is not None:
+                stats.lap('stage.cache', lap)
+                return self._answered('cache', cached_result['productive'], started)
+        lap = stats.lap('stage.cache', lap)
+
+        # Strategy 8: Local model trained on earlier verdicts
+        is_productive = self.local_model.classify(
+            app_name, window_title,
+            self.local_model_threshold,
+            self.local_model_min_samples
+        )
+        stats.lap('stage.local_model', lap)
+        if is_productive is not None:
+            return self._answered('local_model', is_productive, started)
+        return self._answered('needs_ai', None, started)
+
+    def _classify_with_ai(self, app_name, window_title, cache_key):
+        """Context-aware AI classification with rate limiting and retries"""
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                if not self._acquire_ai_budget():
+                    # Out of budget: answer from the heuristic instead of stalling
+                    self.stage_stats.count('fallback.rate_limited')
+                    return self.fallback_classification(app_name)
+
+                # Enhanced prompt with more context
+                prompt = f"""
+                Classify if the application '{app_name}' with window title '{window_title}' is used for productive work purposes.
+
+                {CLASSIFICATION_GUIDELINES}
+
+                Respond with ONLY 'yes' if productive, 'no' if unproductive.
+                """
+
+                started = time.perf_counter()
+                response = self.model.generate_content(prompt)
+                self.stage_stats.lap('ai.gemini_request', started)
+                self.stage_stats.count('ai.requests')
+                self.stage_stats.count('ai.windows')
+                is_productive = 'yes' in response.text.lower() and 'no' not in response.text.lower()
+
+                # Cache the result and learn from it
+                self._cache_verdict(cache_key, is_productive, 'ai')
+                self.local_model.learn(app_name, window_title, is_productive)
+
+                return is_productive
+
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    print(f"AI Classification failed after {max_retries} attempts: {e}")
+                    self.stage_stats.count('fallback.ai_failed')
+                    return self.fallback_classification(app_name)
+                self.stage_stats.count('ai.retries')
+                time.sleep(2 ** attempt)  # Exponential backoff
+
+    def _acquire_ai_budget(self):
+        """Wait up to rate_limit_wait for a Gemini token, timing the wait"""
+        started = time.perf_counter()
+        granted = self.rate_limiter.acquire('gemini', timeout=self.rate_limit_wait)
+        self.stage_stats.lap('ai.rate_limit_wait', started)
+        return granted
+
+    def _build_batch_prompt(self, items):
+        """Build one prompt asking for a JSON verdict per window"""
+        windows = json.dumps([
+            {'id': index, 'app': app_name, 'title': window_title}
+            for index, (app_name, window_title, _) in enumerate(items)
+        ], ensure_ascii=False)
+        return f"""
+                Classify if each of the following applications, given its window title, is used for productive work purposes.
+
+                {CLASSIFICATION_GUIDELINES}
+
+                Windows (JSON):
+                {windows}
+
+                Respond with ONLY a JSON array containing one object per window, in the form
+                [{{"id": 0, "productive": true}}, {{"id": 1, "productive": false}}]
+                """
+
+    @staticmethod
+    def _parse_batch_response(text):
+        """
+        Read the verdicts out of a batched response.
+
+        Returns:
+            dict: Window id to verdict, for every well-formed entry.
+        """
+        start = text.find('[')
+        end = text.rfind(']')
+        if start == -1 or end < start:
+            raise ValueError(f"No JSON array in response: {text[:200]!r}")
+        verdicts = {}
+        for entry in json.loads(text[start:end + 1]):
+            if isinstance(entry, dict) and isinstance(entry.get('productive'), bool):
+                verdicts[entry.get('id')] = entry['productive']
+        return verdicts
+
+    def _classify_batch_with_ai(self, items):
+        """
+        Classify several windows with one rate-limited AI request.
+
+        Args:
+            items (list): (app_name, window_title, cache_key) tuples.
+
+        Returns:
+            list: Verdicts in the order of ``items``.
+        """
+        if len(items) == 1:
+            return [self._classify_with_ai(*items[0])]
+
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                if not self._acquire_ai_budget():
+                    # Out of budget: answer from the heuristic instead of stalling
+                    self.stage_stats.count('fallback.rate_limited', len(items))
+                    return [self.fallback_classification(app_name) for app_name, _, _ in items]
+                started = time.perf_counter()
+                response = self.model.generate_content(self._build_batch_prompt(items))
+                self.stage_stats.lap('ai.gemini_request', started)
+                self.stage_stats.count('ai.requests')
+                self.stage_stats.count('ai.windows', len(items))
+                verdicts = self._parse_batch_response(response.text)
+                break
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    print(f"Batched AI classification failed after {max_retries} attempts: {e}")
+                    self.stage_stats.count('fallback.ai_failed', len(items))
+                    return [self.fallback_classification(app_name) for app_name, _, _ in items]
+                self.stage_stats.count('ai.retries')
+                time.sleep(2 ** attempt)  # Exponential backoff
+
+        results = []
+        for index, (app_name, window_title, cache_key) in enumerate(items):
+            if index in verdicts:
+                self._cache_verdict(cache_key, verdicts[index], 'ai')
+                self.local_model.learn(app_name, window_title, verdicts[index])
+                results.append(verdicts[index])
+            else:
+                # The model skipped this window; do not cache a guess
+                self.stage_stats.count('fallback.ai_skipped')
+                results.append(self.fallback_classification(app_name))
+        return results
+
+    def _start_ai_request(self, app_name, window_title, keys):
+        """Queue an AI request; only called by the single-flight leader for a key"""
+        # A flight for this key may have landed since the caller missed the cache
+        for key in keys.lookup:
+            cached_result = self.classification_cache.get(key, count=False)
+            if cached_result is not None:
+                future = Future()
+                future.set_result(cached_result['productive'])
+                return future
+        return self.batcher.submit(app_name, window_title, keys.store)
+
+    def classify_window_async(self, window_info):
+        """
+        Classify a window without waiting for the AI.
+
+        Windows the rules can decide resolve right away; the rest join the
+        next AI batch.
+
+        Returns:
+            Future: Resolves to True if productive, False otherwise.
+        """
+        future = None
+        try:
+            verdict = self.classify_by_rules(window_info)
+            if verdict is None:
+                app_name, window_title = self._extract_app_and_title(window_info)
+                keys = self.cache_keys.build(self._clean_app_name(app_name), window_title)
+                future = self.single_flight.do_future(
+                    keys.store,
+                    lambda: self._start_ai_request(app_name, window_title, keys)
+                )
+        except Exception as e:
+            print(f"Window classification error: {e}")
+            self.stage_stats.count('errors')
+            verdict = False
+
+        if future is None:
+            future = Future()
+            future.set_result(verdict)
+        return future
+
     def classify_window(self, window_info):
         """
         Enhanced classify window as productive or unproductive
         Uses multiple strategies for more accurate classification
         """
         try:
-            # Extract and clean app name and title
+            # Strategies 1-8: rules, cache and local model
+            verdict = self.classify_by_rules(window_info)
+            if verdict is not None:
+                return verdict
+
+            # Strategy 9: Context-aware AI classification, batched with
+            # other windows waiting for a verdict
             app_name, window_title = self._extract_app_and_title(window_info)
-            clean_app = self._clean_app_name(app_name)
-            
-            # Strategy 1: Known correction check
-            if app_name in self.known_corrections:
-                return self.known_corrections[app_name]
-                
-            # Strategy 2: User feedback check
-            if clean_app in self.user_feedback:
-                return self.user_feedback[clean_app]
-            
-            # Strategy 3: Check predefined lists first
-            if clean_app in self.productive_apps or app_name in self.productive_apps:
-                return True
-            if clean_app in self.unproductive_apps or app_name in self.unproductive_apps:
-                return False
-            
-            # Strategy 4: Check for domain patterns in window title
-            domain_match, is_productive = self._check_domain_patterns(window_title)
-            if domain_match:
-                return is_productive
-                
-            # Strategy 5: Check for productive activity patterns in window title
-            if self._detect_productive_activities(window_title):
-                return True
-                
-            # Strategy 6: Check for productivity keywords
-            if self._check_productivity_keywords(window_title):
-                return True
-            
-            # Strategy 7: Check cache
-            if clean_app in self.classification_cache:
-                cached_result = self.classification_cache[clean_app]
-                if self._is_cached_classification_valid(cached_result):
-                    return cached_result['productive']
-            
-            # Strategy 8: Context-aware AI classification
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    self.rate_limiter.wait_if_needed()
-                    
-                    # Enhanced prompt with more context
-                    prompt = f"""
-                    Classify if the application '{app_name}' with window title '{window_title}' is used for productive work purposes.
-                    
-                    Productive applications include:
-                    - Development tools (VSCode, PyCharm, IntelliJ, Sublime, etc.)
-                    - Office suites (Word, Excel, PowerPoint, etc.)
-                    - Browsers when used for work/research
-                    - Communication tools (Teams, Slack, Zoom, etc.)
-                    - Design tools (Figma, Photoshop, etc.)
-                    - Project management (Jira, Asana, etc.)
-                    - Terminal/command line applications
-                    - Database tools
-                    - Learning platforms
-                    
-                    Unproductive applications include:
-                    - Games and gaming platforms
-                    - Social media platforms
-                    - Streaming entertainment
-                    - Non-work-related video platforms
-                    - Messaging apps when not work-related
-                    
-                    Consider both the application name AND the window title context.
-                    For example, VS Code showing a Python file would be productive.
-                    
-                    Respond with ONLY 'yes' if productive, 'no' if unproductive.
-                    """
-                    
-                    response = self.model.generate_content(prompt)
-                    is_productive = 'yes' in response.text.lower() and 'no' not in response.text.lower()
-                    
-                    # Cache the result
-                    self.classification_cache[clean_app] = {
-                        'productive': is_productive,
-                        'timestamp': datetime.now(),
-                        'source': 'ai'
-                    }
-                    
-                    # Periodic cache cleanup
-                    self._cleanup_cache()
-                    
-                    return is_productive
-                    
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        print(f"AI Classification failed after {max_retries} attempts: {e}")
-                        # Default to productive for development tools when in doubt
-                        return 'code' in clean_app or 'develop' in clean_app or 'studio' in clean_app
-                    time.sleep(2 ** attempt)  # Exponential backoff
-            
+            keys = self.cache_keys.build(self._clean_app_name(app_name), window_title)
+            started = time.perf_counter()
+            verdict = self.single_flight.do(
+                keys.store,
+                lambda: self._start_ai_request(app_name, window_title, keys),
+                timeout=self.ai_wait_timeout
+            )
+            self.stage_stats.lap('stage.gemini', started)
+            return verdict
+
+        except FutureTimeoutError:
+            print(f"AI classification of '{window_info}' timed out")
+            self.stage_stats.count('fallback.timeout')
+            return self.fallback_classification(window_info)
         except Exception as e:
             print(f"Window classification error: {e}")
-            return False  # Default to unproductive for any unexpected errors
\ No newline at end of file
+            self.stage_stats.count('errors')
+            return False  # Default to unproductive for any unexpected errors
@@ -1,9 +1,8 @@
 # Import required libraries
 import requests
-from flask import Flask, jsonify, request, send_file, make_response, session
+from flask import Flask, jsonify, request, send_file, make_response, session, g
 from flask_cors import CORS
-from main import ProductivityTracker
-import threading
+from tenant_registry import TenantRegistry
 import io
 from bson.objectid import ObjectId
 import logging
@@ -11,6 +10,7 @@ import json
 import zipfile
 from datetime import datetime
 import os
+import atexit
 from dotenv import load_dotenv
 
 
@@ -32,8 +32,12 @@ app.secret_key = '123VirtuTask'  # Required for session management
 # Configure CORS to allow frontend access
 CORS(app, origins=["https://my-react-app-355046145223.us-central1.run.app"], supports_credentials=True)
 
-# Initialize the productivity tracker without an employee ID
-tracker = ProductivityTracker()
+# One tracker per employee, sharing the MongoDB client and AI classifier
+registry = TenantRegistry(
+    max_tenants=int(os.environ.get('MAX_TENANTS', 100)),
+    idle_timeout=float(os.environ.get('TENANT_IDLE_TIMEOUT', 3600))
+)
+atexit.register(registry.close)
 
 # Load environment variables
 load_dotenv()
@@ -94,8 +98,8 @@ def verify_token():
                 "message": "User does not have an employee ID"
             }), 400
 
-        # Set employee ID in session and tracker
-        tracker.set_employee_id(employee_id)
+        # Set employee ID in session and make sure the employee has a tracker
+        registry.get(employee_id)
         session['employee_id'] = employee_id
 
         logger.info(f"Token verified for employee {employee_id}")
@@ -160,8 +164,8 @@ def verify_token():
                 "message": "User does not have an employee ID"
             }), 400
 
-        # Set employee ID in session and tracker
-        tracker.set_employee_id(employee_id)
+        # Set employee ID in session and make sure the employee has a tracker
+        registry.get(employee_id)
         session['employee_id'] = employee_id
 
         logger.info(f"Token verified for employee {employee_id}")
@@ -221,7 +225,6 @@ def check_authentication():
                     "message": "User does not have an employee ID"
                 }), 400
             
-            tracker.set_employee_id(employee_id)
             session['employee_id'] = employee_id
                 
         except Exception as e:
@@ -231,18 +234,24 @@ def check_authentication():
                 "message": "Authentication error"
             }), 500
     
-    # Ensure employee ID is set in tracker after session restoration
-    if employee_id and not tracker.employee_id:
-        tracker.set_employee_id(employee_id)
-        logger.debug(f"Restored employee_id from session: {employee_id}")
-    
     # Final authentication check
-    if not tracker.employee_id:
+    if not employee_id:
         return jsonify({
             "status": "error",
             "message": "Not authenticated. Please login first."
         }), 401
 
+    # Route the request to this employee's tracker, which stays pinned so
+    # requests of other employees cannot evict it while this one runs
+    g.tracker = registry.pin(employee_id)
+
+@app.teardown_request
+def unpin_tracker(exc):
+    """Let the request's tracker be evicted again"""
+    tracker = g.pop('tracker', None)
+    if tracker is not None:
+        registry.unpin(tracker.employee_id)
+
 # Application Routes
 @app.route('/daily-summary')
 def get_daily_summary():
@@ -252,7 +261,7 @@ def get_daily_summary():
     """
     logger.info("API CALL: /daily-summary")
     try:
-        summary = tracker.get_daily_summary()
+        summary = g.tracker.get_daily_summary()
         
         window_times = [
             [
@@ -295,7 +304,7 @@ def get_productivity_score(employee_id):
         today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Find the score for today for this employee
-        score_record = tracker.db['daily_scores'].find_one({
+        score_record = registry.db['daily_scores'].find_one({
             'date': today_start,
             'employee_id': employee_id
         })
@@ -335,7 +344,7 @@ def start_session():
     try:
         data = request.get_json()
         logger.debug(f"Starting session with name: {data.get('session_name')}")
-        result = tracker.start_session(data['session_name'])
+        result = g.tracker.start_session(data['session_name'])
         logger.debug(f"Session start result: {result}")
         return jsonify(result)
     except Exception as e:
@@ -350,7 +359,7 @@ def download_report(report_id):
     logger.info(f"API CALL: /download-report/{report_id}")
     try:
         logger.debug(f"Fetching report with ID: {report_id}")
-        report = tracker.get_report(report_id)
+        report = g.tracker.get_report(report_id)
         if not report:
             logger.warning(f"Report with ID {report_id} not found")
             return jsonify({
@@ -379,7 +388,7 @@ def end_session():
     logger.info("API CALL: /end-session")
     try:
         logger.debug("Ending current session")
-        result = tracker.end_session()
+        result = g.tracker.end_session()
         logger.debug(f"Session end result: {result}")
         
         # Handle partial success case
@@ -411,7 +420,7 @@ def get_current_session():
     """
     logger.info("API CALL: /current-session")
     try:
-        if not tracker.current_session or not tracker.session_active:
+        if not g.tracker.current_session or not g.tracker.session_active:
             logger.warning("No active session found")
             return jsonify({
                 "status": "error",
@@ -420,16 +429,16 @@ def get_current_session():
         
         logger.debug("Fetching current session details")
         current_data = {
-            "session_name": tracker.current_session.get('name', ''),
-            "productive_time": tracker.current_session.get('productive_time', 0),
-            "unproductive_time": tracker.current_session.get('unproductive_time', 0),
+            "session_name": g.tracker.current_session.get('name', ''),
+            "productive_time": g.tracker.current_session.get('productive_time', 0),
+            "unproductive_time": g.tracker.current_session.get('unproductive_time', 0),
             "window_details": [
                 {
                     "window": window,
                     "active_time": details.get('active_time', 0),
                     "productive": details.get('productive', False)
                 }
-                for window, details in tracker.current_session.get('window_details', {}).items()
+                for window, details in g.tracker.current_session.get('window_details', {}).items()
             ]
         }
         
@@ -439,6 +448,89 @@ def get_current_session():
         logger.error(f"Error in current-session: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@app.route('/session-timeline/<session_id>')
+def get_session_timeline(session_id):
+    """
+    Retrieve the per-minute activity timeline of a session
+    """
+    logger.info(f"API CALL: /session-timeline/{session_id}")
+    try:
+        bucket_seconds = int(request.args.get('bucket', 60))
+        if bucket_seconds <= 0:
+            return jsonify({
+                "status": "error",
+                "message": "Bucket size must be positive"
+            }), 400
+
+        timeline = g.tracker.get_session_timeline(session_id, bucket_seconds)
+        return jsonify({
+            "session_id": session_id,
+            "bucket_seconds": bucket_seconds,
+            "timeline": timeline
+        })
+    except Exception as e:
+        logger.error(f"Error in session-timeline: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/classifier-feedback', methods=['POST'])
+def submit_classifier_feedback():
+    """
+    Record a batch of classification corrections
+    Body: {"corrections": [{"window": "<window label>", "productive": true}, ...]}
+    """
+    logger.info("API CALL: /classifier-feedback [POST]")
+    try:
+        data = request.get_json() or {}
+        corrections = data.get('corrections')
+        if not isinstance(corrections, list) or not corrections:
+            return jsonify({
+                "status": "error",
+                "message": "Expected a non-empty 'corrections' list"
+            }), 400
+
+        parsed = []
+        for correction in corrections:
+            if (not isinstance(correction, dict)
+                    or not isinstance(correction.get('window'), str)
+                    or not correction['window'].strip()
+                    or not isinstance(correction.get('productive'), bool)):
+                return jsonify({
+                    "status": "error",
+                    "message": "Each correction needs a 'window' string and a 'productive' boolean"
+                }), 400
+            parsed.append((correction['window'], correction['productive']))
+
+        applied = g.tracker.ai_classifier.add_user_feedback_batch(g.tracker.employee_id, parsed)
+        logger.debug(f"Applied {applied} classifier corrections")
+        return jsonify({"status": "success", "applied": applied})
+    except Exception as e:
+        logger.error(f"Error recording classifier feedback: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/classifier-stats')
+def get_classifier_stats():
+    """
+    Retrieve per-strategy classification counters and latency histograms
+    """
+    logger.info("API CALL: /classifier-stats")
+    try:
+        return jsonify(g.tracker.ai_classifier.classifier_stats())
+    except Exception as e:
+        logger.error(f"Error getting classifier stats: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/screenshot-stats')
+def get_screenshot_stats():
+    """
+    Retrieve per-stage screenshot timings (capture, preprocess, OCR, insert)
+    """
+    logger.info("API CALL: /screenshot-stats")
+    try:
+        return jsonify(g.tracker.ocr_pipeline.stats())
+    except Exception as e:
+        logger.error(f"Error getting screenshot stats: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/privacy-settings', methods=['GET'])
 def get_privacy_settings():
     """
@@ -446,7 +538,7 @@ def get_privacy_settings():
     """
     logger.info("API CALL: /privacy-settings")
     try:
-        settings = tracker.get_privacy_settings()
+        settings = g.tracker.get_privacy_settings()
         logger.debug(f"Retrieved privacy settings: {settings}")
         return jsonify(settings)
     except Exception as e:
@@ -463,7 +555,7 @@ def update_privacy_settings():
         data = request.get_json()
         logger.debug(f"Updating privacy settings: {data}")
         
-        result = tracker.update_privacy_settings(data)
+        result = g.tracker.update_privacy_settings(data)
         
         if result.get("status") == "error":
             logger.warning(f"Error updating settings: {result.get('message')}")
@@ -485,7 +577,7 @@ def delete_user_data():
         data = request.get_json()
         delete_type = data.get('type', 'all')
         
-        result = tracker.delete_user_data(delete_type)
+        result = g.tracker.delete_user_data(delete_type)
         
         if result.get("status") == "error":
             logger.warning(f"Error deleting data: {result.get('message')}")
@@ -504,7 +596,7 @@ def export_user_data():
     """
     logger.info("API CALL: /export-data")
     try:
-        result = tracker.export_user_data()
+        result = g.tracker.export_user_data()
         
         if result.get("status") == "error":
             logger.warning(f"Error exporting data: {result.get('message')}")
@@ -533,8 +625,8 @@ def logout():
         # Clear the employee ID from session
         session.pop('employee_id', None)
         
-        # Reset the tracker's employee_id
-        tracker.set_employee_id(None)
+        # Drop the employee's tracker unless a session is still running
+        registry.release(g.tracker.employee_id)
         
         logger.debug("User logged out successfully")
         return jsonify({
@@ -547,11 +639,7 @@ def logout():
 
 # Main application entry point
 if __name__ == '__main__':
-    # Start background tracking thread
-    logger.info("Starting tracking thread...")
-    tracking_thread = threading.Thread(target=tracker.update_tracking, daemon=True)
-    tracking_thread.start()
-    
+    # Tracking workers are started per employee by the registry
     # Get port from environment variable, default to 8080 if not set
     port = int(os.environ.get('PORT', 8080))
     
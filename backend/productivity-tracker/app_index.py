@@ -0,0 +1,156 @@
+import re
+
+# Executable and bundle extensions dropped before matching
+_EXTENSIONS = re.compile(r'\.(?:exe|app|appimage|bin)\b')
+
+# Words, keeping trailing '+' and '#' so 'notepad++' or 'disney+' survive
+_TOKENS = re.compile(r'[^\W_]+[+#]*')
+
+# Trailing non-letters of a token, e.g. the '2016' in 'excel2016'
+_NON_ALPHA_SUFFIX = re.compile(r'[^a-z]+$')
+
+# Separators between the document or page and the app in a window title,
+# e.g. "report.xlsx - Excel" or "Inbox | Outlook"
+_TITLE_SEPARATORS = re.compile(r'\s+[-\u2013\u2014|\u2022]\s+')
+
+# App names that are also everyday words ("Numbers don't lie"); they are
+# matched only as the exact app name by the classifier's app sets
+GENERIC_APP_NAMES = frozenset({'access', 'numbers', 'origin', 'pages', 'preview', 'signal'})
+
+
+def normalize_app_name(name):
+    """
+    Turn an app name or window label into match tokens.
+
+    Example: "WINWORD.EXE" → ['winword'], "Visual Studio Code" →
+    ['visual', 'studio', 'code'].
+    """
+    return _TOKENS.findall(_EXTENSIONS.sub('', name.casefold()))
+
+
+class AppNameIndex:
+    """
+    Token trie over known productive and unproductive app names.
+
+    Names are case-folded, stripped of executable extensions and split into
+    tokens, so 'excel', 'EXCEL' and 'excel.exe' share one entry and a label
+    such as "Google Chrome" or "main.py - project - Visual Studio Code"
+    resolves in a single walk over the tokens of its app part. A label
+    token also matches an entry when it only adds non-letters, such as
+    'excel2016' or 'python3'. Generic words that double as app names are
+    not indexed.
+    """
+    def __init__(self, productive_apps=(), unproductive_apps=()):
+        """
+        Build the index.
+
+        Args:
+            productive_apps (iterable): Names of productive apps.
+            unproductive_apps (iterable): Names of unproductive apps. A name
+                that normalizes the same as a productive one is productive.
+        """
+        self._root = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        for name in unproductive_apps:
+            self.add(name, False)
+        for name in productive_apps:
+            self.add(name, True)
+
+    def add(self, name, is_productive):
+        """
+        Add an app name, replacing the verdict of an existing entry.
+
+        Args:
+            name (str): App name.
+            is_productive (bool): Verdict for the app.
+        """
+        tokens = normalize_app_name(name)
+        if not tokens or (len(tokens) == 1 and tokens[0] in GENERIC_APP_NAMES):
+            return
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        if None not in node:
+            self.size += 1
+        node[None] = is_productive
+
+    def remove(self, name):
+        """
+        Remove an app name from the index.
+
+        Args:
+            name (str): App name.
+
+        Returns:
+            bool: True if the name was indexed.
+        """
+        path = [self._root]
+        for token in normalize_app_name(name):
+            node = path[-1].get(token)
+            if node is None:
+                return False
+            path.append(node)
+        if len(path) == 1 or None not in path[-1]:
+            return False
+
+        del path[-1][None]
+        self.size -= 1
+        # Prune branches that no longer lead to an entry
+        tokens = normalize_app_name(name)
+        for depth in range(len(tokens), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][tokens[depth - 1]]
+        return True
+
+    @staticmethod
+    def _child(node, token):
+        """Follow a token, falling back to its letters-only prefix"""
+        child = node.get(token)
+        if child is None:
+            base = _NON_ALPHA_SUFFIX.sub('', token)
+            if base and base != token:
+                child = node.get(base)
+        return child
+
+    def lookup(self, label):
+        """
+        Find the known app named in a window label.
+
+        Only the app part of the label is searched: the text after the last
+        title separator, such as "Google Chrome" in "Steam summer sale -
+        Google Chrome", so page and document titles cannot name an app. The
+        match starting at the earliest token wins; among matches starting at
+        the same token the longer one wins.
+
+        Args:
+            label (str): App name or window label.
+
+        Returns:
+            bool or None: The app's verdict, or None if no known app matches.
+        """
+        tokens = normalize_app_name(_TITLE_SEPARATORS.split(label)[-1])
+        for start in range(len(tokens)):
+            verdict = None
+            node = self._root
+            for token in tokens[start:]:
+                node = self._child(node, token)
+                if node is None:
+                    break
+                if None in node:
+                    verdict = node[None]
+            if verdict is not None:
+                self.hits += 1
+                return verdict
+        self.misses += 1
+        return None
+
+    def stats(self):
+        """Get index counters"""
+        return {
+            'entries': self.size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
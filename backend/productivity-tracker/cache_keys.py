@@ -0,0 +1,134 @@
+import re
+from collections import namedtuple
+from ttl_cache import LRUTTLCache
+
+# Apps whose verdict depends on the page they show rather than on the app
+BROWSER_APPS = {
+    'chrome', 'google chrome', 'chromium', 'firefox', 'mozilla firefox',
+    'edge', 'msedge', 'microsoft edge', 'safari', 'opera', 'brave', 'vivaldi'
+}
+
+# Top-level domains accepted in titles; keeps file names such as
+# 'main.py' or 'notes.md' from being read as hosts
+_TLDS = {
+    'com', 'org', 'net', 'io', 'dev', 'app', 'ai', 'co', 'edu', 'gov', 'info',
+    'biz', 'me', 'tv', 'gg', 'ly', 'so', 'to', 'xyz', 'site', 'tech', 'cloud',
+    'us', 'uk', 'de', 'fr', 'es', 'it', 'nl', 'in', 'jp', 'au', 'ca', 'br',
+    'cn', 'ru', 'nz', 'mx', 'se', 'ch', 'pl'
+}
+
+# Public suffixes with two labels, so 'bbc.co.uk' registers as itself
+_MULTI_PART_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'com.au', 'net.au', 'org.au',
+    'co.jp', 'co.in', 'com.br', 'co.nz', 'com.cn', 'com.mx', 'github.io'
+}
+
+_HOST = re.compile(r'\b((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+([a-z]{2,}))\b')
+_DIGITS = re.compile(r'\d+')
+_SPACES = re.compile(r'\s+')
+
+# Keys of a window, most specific first, the key its AI verdict is stored
+# under, and the (browser, page title) of a browser page (None otherwise)
+CacheKeys = namedtuple('CacheKeys', ['lookup', 'store', 'page'])
+
+
+def registered_domain(host):
+    """
+    Reduce a host name to its registered domain (eTLD+1).
+
+    Example: "docs.github.com" → "github.com", "news.bbc.co.uk" → "bbc.co.uk".
+    """
+    labels = host.split('.')
+    if len(labels) >= 3 and '.'.join(labels[-2:]) in _MULTI_PART_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def browser_page(clean_app, window_title):
+    """
+    Split a browser window into the browser and the page it shows.
+
+    Handles "chrome: Page" labels as well as raw titles such as
+    "Repo - GitHub - Google Chrome".
+
+    Args:
+        clean_app (str): Normalized app name.
+        window_title (str): Window title.
+
+    Returns:
+        tuple: (browser, page title), or None for other apps and for browser
+        windows without a page title.
+    """
+    text = window_title.strip()
+    app = clean_app
+    if not text:
+        for browser in BROWSER_APPS:
+            suffix = ' - ' + browser
+            if clean_app.endswith(suffix):
+                app, text = browser, clean_app[:-len(suffix)].strip()
+                break
+    if app not in BROWSER_APPS or not text:
+        return None
+    return app, text
+
+
+def normalize_title(title):
+    """Case-fold a title and fold numbers and whitespace so counters do not split keys"""
+    return _SPACES.sub(' ', _DIGITS.sub('#', title.casefold())).strip()
+
+
+class CacheKeyBuilder:
+    """
+    Builds the cache-key hierarchy of a window: app → site → title.
+
+    Browser pages are keyed by the registered domain in their title, so a
+    verdict for "github.com" covers every page title on that site; pages
+    without a domain fall back to their normalized title. A browser page is
+    never looked up by the browser alone, so one verdict cannot cover every
+    tab. Other apps keep a single verdict per app. Keys are computed once per
+    (app, title) and memoized.
+    """
+    def __init__(self, memo_size=4096):
+        self._memo = LRUTTLCache(max_entries=memo_size)
+
+    def _site(self, title):
+        """Key of the registered domain named in a browser title, if any"""
+        for match in _HOST.finditer(title):
+            if match.group(2) in _TLDS:
+                return 'domain:' + registered_domain(match.group(1))
+        return None
+
+    def build(self, clean_app, window_title):
+        """
+        Get the cache keys of a window.
+
+        Args:
+            clean_app (str): Normalized app name.
+            window_title (str): Window title.
+
+        Returns:
+            CacheKeys: Lookup keys from most to least specific, the key a
+            new AI verdict is stored under, and the browser page if any.
+        """
+        memo_key = (clean_app, window_title)
+        keys = self._memo.get(memo_key)
+        if keys is not None:
+            return keys
+
+        page = browser_page(clean_app, window_title)
+        if page is None:
+            # Other apps keep one verdict for all their windows
+            keys = CacheKeys([clean_app], clean_app, None)
+        else:
+            # Key browser pages by site, and by title when no site can be told
+            app, text = page
+            text = text.casefold()
+            title_key = f"{app}|title:{normalize_title(text)}"
+            site = self._site(text)
+            if site:
+                keys = CacheKeys([title_key, site], site, page)
+            else:
+                keys = CacheKeys([title_key], title_key, page)
+
+        self._memo.put(memo_key, keys)
+        return keys
@@ -0,0 +1,134 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ClassificationBatcher:
+    """
+    Groups windows that need an AI verdict into batched requests.
+
+    Windows are collected until ``max_batch`` of them are waiting or
+    ``max_wait`` seconds passed since the first one arrived, then sent to
+    ``classify_batch`` as one request. Every caller gets a Future that is
+    resolved with its window's verdict; callers asking for a key that is
+    already waiting in the current batch share its Future.
+    """
+    def __init__(self, classify_batch, max_batch=20, max_wait=0.5, workers=2):
+        """
+        Initialize the batcher and start its collector thread.
+
+        Args:
+            classify_batch (callable): Takes a list of (app_name, window_title,
+                key) tuples and returns a list of verdicts in the same order.
+            max_batch (int): Maximum number of windows per request.
+            max_wait (float): Seconds a batch may wait to fill up.
+            workers (int): Number of batches that may be in flight at once.
+        """
+        self.classify_batch = classify_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+
+        self._lock = threading.Condition()
+        self._items = []
+        self._futures = {}  # key -> Future for keys waiting in the current batch
+        self._first_added = None
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-batch")
+
+        # Batch counters
+        self.batches = 0
+        self.batched_items = 0
+        self.shared = 0
+        self.failed_batches = 0
+
+        self._collector = threading.Thread(target=self._collect_loop, name="ai-batch-collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, app_name, window_title, key):
+        """
+        Queue a window for the next batch.
+
+        Args:
+            app_name (str): Application name.
+            window_title (str): Window title.
+            key (str): Cache key of the verdict.
+
+        Returns:
+            Future: Resolves to the window's verdict.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                self.shared += 1
+                return future
+
+            future = Future()
+            self._futures[key] = future
+            self._items.append((app_name, window_title, key))
+            if self._first_added is None:
+                self._first_added = time.monotonic()
+            self._lock.notify()
+            return future
+
+    def stats(self):
+        """Get batch counters"""
+        with self._lock:
+            waiting = len(self._items)
+        return {
+            'batches': self.batches,
+            'batched_items': self.batched_items,
+            'avg_batch_size': round(self.batched_items / self.batches, 2) if self.batches else 0.0,
+            'shared': self.shared,
+            'failed_batches': self.failed_batches,
+            'waiting': waiting
+        }
+
+    def shutdown(self):
+        """Send what is waiting and stop the collector"""
+        with self._lock:
+            self._stopped = True
+            self._lock.notify()
+        self._collector.join(timeout=5)
+        self._executor.shutdown(wait=False)
+
+    def _take_batch(self):
+        """Wait for a full or timed-out batch and detach it; None once stopped"""
+        with self._lock:
+            while True:
+                if self._items:
+                    waited = time.monotonic() - self._first_added
+                    if len(self._items) >= self.max_batch or waited >= self.max_wait or self._stopped:
+                        break
+                    self._lock.wait(self.max_wait - waited)
+                elif self._stopped:
+                    return None
+                else:
+                    self._lock.wait()
+
+            items = self._items[:self.max_batch]
+            del self._items[:self.max_batch]
+            futures = [self._futures.pop(key) for _, _, key in items]
+            self._first_added = time.monotonic() if self._items else None
+            return items, futures
+
+    def _collect_loop(self):
+        """Hand batches to the executor as they fill up"""
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            self._executor.submit(self._run_batch, *batch)
+
+    def _run_batch(self, items, futures):
+        """Classify one batch and resolve its futures"""
+        self.batches += 1
+        self.batched_items += len(items)
+        try:
+            verdicts = self.classify_batch(items)
+        except Exception as e:
+            self.failed_batches += 1
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, verdict in zip(futures, verdicts):
+            future.set_result(verdict)
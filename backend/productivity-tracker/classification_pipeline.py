@@ -0,0 +1,130 @@
+import queue
+import threading
+from functools import partial
+
+
+class ClassificationPipeline:
+    """
+    Runs window classification off the tracking thread.
+
+    Windows that the local rules can decide are answered immediately.
+    Everything else is handed to the classifier's AI batcher, which groups
+    windows from every tracker into shared Gemini requests; the caller
+    treats those windows as pending and picks up the verdicts later with
+    ``drain_results``.
+    """
+    def __init__(self, classifier, max_queue=100):
+        """
+        Initialize the pipeline.
+
+        Args:
+            classifier (AIClassifier): Classifier used for rules and AI calls.
+            max_queue (int): Maximum number of windows waiting for a verdict.
+        """
+        self.classifier = classifier
+        self.max_queue = max_queue
+        self._results = queue.Queue()
+        self._in_flight = set()
+        self._idle = threading.Condition()
+        self._stopped = threading.Event()
+
+        # Pipeline counters
+        self.rule_hits = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, window_info):
+        """
+        Classify a window without blocking.
+
+        Args:
+            window_info (str): Window label returned by the WindowTracker.
+
+        Returns:
+            bool or None: The verdict if it is known right away, or None if the
+            window has been queued and its verdict is pending.
+        """
+        try:
+            verdict = self.classifier.classify_by_rules(window_info)
+        except Exception as e:
+            print(f"Window classification error: {e}")
+            return False
+
+        if verdict is not None:
+            self.rule_hits += 1
+            return verdict
+
+        with self._idle:
+            if window_info in self._in_flight:
+                return None
+            if self._stopped.is_set() or len(self._in_flight) >= self.max_queue:
+                # AI backlog is saturated; degrade to the heuristic
+                self.rejected += 1
+                return self.classifier.fallback_classification(window_info)
+            self._in_flight.add(window_info)
+            self.queued += 1
+
+        future = self.classifier.classify_window_async(window_info)
+        future.add_done_callback(partial(self._finish, window_info))
+        return None
+
+    def drain_results(self):
+        """
+        Collect verdicts that finished since the last call.
+
+        Returns:
+            list: (window_info, verdict) tuples.
+        """
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def pending_count(self):
+        """Number of windows waiting for a verdict"""
+        with self._idle:
+            return len(self._in_flight)
+
+    def wait_idle(self, timeout):
+        """
+        Wait for pending classifications to finish.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if nothing is pending anymore.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._in_flight, timeout)
+
+    def stats(self):
+        """Get pipeline counters"""
+        return {
+            'rule_hits': self.rule_hits,
+            'queued': self.queued,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'pending': self.pending_count()
+        }
+
+    def shutdown(self):
+        """Stop accepting windows for the AI; pending verdicts still arrive"""
+        self._stopped.set()
+
+    def _finish(self, window_info, future):
+        """Publish the verdict of a window once its AI batch resolves"""
+        try:
+            verdict = future.result()
+        except Exception as e:
+            print(f"Background classification error: {e}")
+            verdict = self.classifier.fallback_classification(window_info)
+
+        self._results.put((window_info, verdict))
+        with self._idle:
+            self._in_flight.discard(window_info)
+            self.completed += 1
+            self._idle.notify_all()
@@ -0,0 +1,125 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+class ClassificationStore:
+    """
+    SQLite-backed store for classification verdicts.
+
+    Backs the classifier's in-memory cache so verdicts survive restarts of
+    the API process and the desktop build. Entries expire after a TTL and
+    the table is trimmed to a maximum number of entries, oldest first.
+    """
+    def __init__(self, path, ttl_seconds=24 * 3600, max_entries=10000, prune_every=100):
+        """
+        Open (or create) the store.
+
+        Args:
+            path (str): SQLite database file.
+            ttl_seconds (float): Age after which a verdict expires.
+            max_entries (int): Maximum number of verdicts kept on disk.
+            prune_every (int): Number of writes between expiry/size pruning.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS classifications (
+                key TEXT PRIMARY KEY,
+                productive INTEGER NOT NULL,
+                source TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS classifications_updated_at ON classifications (updated_at)'
+        )
+        self._conn.commit()
+
+    def load(self, limit=None):
+        """
+        Read the unexpired verdicts, newest first.
+
+        Args:
+            limit (int, optional): Maximum number of verdicts to return.
+
+        Returns:
+            list: (key, productive, source, updated_at) tuples.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, productive, source, updated_at FROM classifications '
+                'WHERE updated_at >= ? ORDER BY updated_at DESC LIMIT ?',
+                (cutoff, limit if limit is not None else self.max_entries)
+            ).fetchall()
+        return [(key, bool(productive), source, updated_at) for key, productive, source, updated_at in rows]
+
+    def put(self, key, productive, source, updated_at=None):
+        """
+        Write a verdict through to disk.
+
+        Args:
+            key (str): Cache key.
+            productive (bool): Verdict.
+            source (str): Where the verdict came from ('ai', 'user_feedback').
+            updated_at (float, optional): Timestamp; defaults to now.
+        """
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO classifications (key, productive, source, updated_at) '
+                'VALUES (?, ?, ?, ?)',
+                (key, int(bool(productive)), source, updated_at if updated_at is not None else time.time())
+            )
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= self.prune_every:
+                self._prune_locked()
+            self._conn.commit()
+
+    def delete(self, key):
+        """Remove a verdict"""
+        with self._lock:
+            self._conn.execute('DELETE FROM classifications WHERE key = ?', (key,))
+            self._conn.commit()
+
+    def prune(self):
+        """Drop expired verdicts and trim the table to the size cap"""
+        with self._lock:
+            self._prune_locked()
+            self._conn.commit()
+
+    def _prune_locked(self):
+        """Prune without committing; the caller holds the lock"""
+        self._writes_since_prune = 0
+        self._conn.execute(
+            'DELETE FROM classifications WHERE updated_at < ?',
+            (time.time() - self.ttl_seconds,)
+        )
+        self._conn.execute(
+            'DELETE FROM classifications WHERE key NOT IN ('
+            'SELECT key FROM classifications ORDER BY updated_at DESC LIMIT ?)',
+            (self.max_entries,)
+        )
+
+    def count(self):
+        """Number of verdicts on disk, including expired ones not yet pruned"""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM classifications').fetchone()[0]
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,77 @@
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+
+
+class FeedbackStore:
+    """
+    Classifier corrections persisted in MongoDB.
+
+    One document per (employee_id, app) holds the latest correction, so
+    corrections survive restarts and are shared by every process that
+    serves the classifier.
+    """
+    def __init__(self, collection):
+        """
+        Initialize the store.
+
+        Args:
+            collection: MongoDB collection holding the corrections.
+        """
+        self.collection = collection
+        try:
+            self.collection.create_index(
+                [('employee_id', ASCENDING), ('app', ASCENDING)],
+                unique=True
+            )
+        except Exception as e:
+            print(f"Could not create feedback index: {e}")
+
+    def save_many(self, employee_id, corrections):
+        """
+        Upsert corrections in one bulk write.
+
+        Args:
+            employee_id (str): Employee who made the corrections.
+            corrections (list): (app, window_info, is_productive) tuples.
+        """
+        if not corrections:
+            return
+        now = datetime.now()
+        self.collection.bulk_write([
+            UpdateOne(
+                {'employee_id': employee_id, 'app': app},
+                {'$set': {
+                    'window_info': window_info,
+                    'productive': bool(is_productive),
+                    'updated_at': now
+                }},
+                upsert=True
+            )
+            for app, window_info, is_productive in corrections
+        ], ordered=False)
+
+    def load_all(self):
+        """
+        Stream every correction, oldest first, so later ones win when applied.
+
+        Yields:
+            dict: Correction documents.
+        """
+        return self.collection.find(
+            {},
+            {'_id': False, 'employee_id': True, 'app': True, 'window_info': True, 'productive': True}
+        ).sort('updated_at', ASCENDING)
+
+    def delete_employee(self, employee_id):
+        """
+        Remove all corrections made by an employee.
+
+        Returns:
+            list: The removed correction documents.
+        """
+        removed = list(self.collection.find(
+            {'employee_id': employee_id},
+            {'_id': False, 'app': True, 'window_info': True, 'productive': True}
+        ))
+        self.collection.delete_many({'employee_id': employee_id})
+        return removed
@@ -0,0 +1,257 @@
+import os
+import platform
+import subprocess
+import re
+import time
+import threading
+import ctypes
+import ctypes.util
+
+try:
+    from Xlib import display as xdisplay
+except ImportError:  # python-xlib is optional
+    xdisplay = None
+
+# Helper processes are started at most this often; in between, the last
+# reading is advanced by the time since it was taken
+SUBPROCESS_PROBE_INTERVAL = float(os.getenv('IDLE_PROBE_INTERVAL', 5))
+
+# CGEventSourceStateID and CGEventType values for "any input in this session"
+_CG_COMBINED_SESSION_STATE = 0
+_CG_ANY_INPUT_EVENT = 0xFFFFFFFF
+
+
+def _windows_idle_seconds():
+    """Seconds since the last keyboard/mouse input, using GetLastInputInfo"""
+    class LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [('cbSize', ctypes.c_uint), ('dwTime', ctypes.c_uint)]
+
+    info = LASTINPUTINFO()
+    info.cbSize = ctypes.sizeof(LASTINPUTINFO)
+    if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(info)):
+        return None
+    get_tick_count = ctypes.windll.kernel32.GetTickCount
+    get_tick_count.restype = ctypes.c_uint32
+    # Both are 32-bit millisecond counters that wrap after ~49.7 days
+    millis = (get_tick_count() - info.dwTime) & 0xFFFFFFFF
+    return millis / 1000.0
+
+
+def _ioreg_idle_seconds():
+    """Seconds since the last input, read from the IOHIDSystem registry entry"""
+    output = subprocess.check_output(['ioreg', '-c', 'IOHIDSystem', '-d', '4']).decode('utf-8', 'ignore')
+    match = re.search(r'"HIDIdleTime"\s*=\s*(\d+)', output)
+    if not match:
+        return None
+    return int(match.group(1)) / 1_000_000_000
+
+
+def _xprintidle_seconds():
+    """Seconds since the last input, as reported by the xprintidle helper"""
+    output = subprocess.check_output(['xprintidle'])
+    return int(output.strip()) / 1000.0
+
+
+class _SubprocessProbe:
+    """
+    Idle probe backed by a helper process.
+
+    The helper runs at most once per ``SUBPROCESS_PROBE_INTERVAL``; in
+    between, the last reading is advanced by the time since it was taken.
+    Input in the meantime is therefore noticed up to one interval late.
+    One instance is shared by all detectors of the process, so tenants do
+    not each start their own helper.
+    """
+    def __init__(self, read):
+        self._read = read
+        self._reading = None  # (idle seconds, time.monotonic() of the read)
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._reading is None or now - self._reading[1] >= SUBPROCESS_PROBE_INTERVAL:
+                self._reading = (self._read(), now)
+            idle_seconds, read_at = self._reading
+        if idle_seconds is None:
+            return None
+        return idle_seconds + (now - read_at)
+
+
+_ioreg_probe = _SubprocessProbe(_ioreg_idle_seconds)
+_xprintidle_probe = _SubprocessProbe(_xprintidle_seconds)
+
+
+class _MacIdleProbe:
+    """
+    macOS idle probe using CGEventSourceSecondsSinceLastEventType through
+    ctypes. Falls back to the shared ``ioreg`` probe if CoreGraphics cannot
+    be loaded.
+    """
+    def __init__(self):
+        self._seconds_since_input = None
+        try:
+            path = ctypes.util.find_library('CoreGraphics') or ctypes.util.find_library('ApplicationServices')
+            if path:
+                function = ctypes.cdll.LoadLibrary(path).CGEventSourceSecondsSinceLastEventType
+                function.argtypes = [ctypes.c_int32, ctypes.c_uint32]
+                function.restype = ctypes.c_double
+                self._seconds_since_input = function
+        except (OSError, AttributeError) as e:
+            print(f"CoreGraphics idle probe unavailable: {e}")
+
+    def __call__(self):
+        if self._seconds_since_input is not None:
+            return self._seconds_since_input(_CG_COMBINED_SESSION_STATE, _CG_ANY_INPUT_EVENT)
+        return _ioreg_probe()
+
+
+class _XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ('window', ctypes.c_ulong),
+        ('state', ctypes.c_int),
+        ('kind', ctypes.c_int),
+        ('til_or_since', ctypes.c_ulong),
+        ('idle', ctypes.c_ulong),
+        ('eventMask', ctypes.c_ulong)
+    ]
+
+
+class _LinuxIdleProbe:
+    """
+    X11 idle probe using the MIT-SCREEN-SAVER extension.
+
+    The extension is queried through libXss with ctypes, or through
+    python-xlib when libXss is not installed; the display connection is
+    opened once and reused. Without either, the probe falls back to the
+    shared ``xprintidle`` probe.
+    """
+    def __init__(self):
+        self._xlib = None
+        self._xss = None
+        self._display = None
+        self._info = None
+        try:
+            xlib_path = ctypes.util.find_library('X11')
+            xss_path = ctypes.util.find_library('Xss')
+            if xlib_path and xss_path:
+                self._xlib = ctypes.cdll.LoadLibrary(xlib_path)
+                self._xss = ctypes.cdll.LoadLibrary(xss_path)
+                self._xlib.XOpenDisplay.restype = ctypes.c_void_p
+                self._xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+                self._xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+                self._xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(_XScreenSaverInfo)
+                self._xss.XScreenSaverQueryInfo.argtypes = [
+                    ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XScreenSaverInfo)
+                ]
+                self._display = self._xlib.XOpenDisplay(None)
+                if self._display:
+                    self._info = self._xss.XScreenSaverAllocInfo()
+        except OSError as e:
+            print(f"X11 idle probe unavailable: {e}")
+            self._display = None
+
+        self._xlib_root = None
+        if not (self._display and self._info) and xdisplay is not None:
+            try:
+                connection = xdisplay.Display()
+                if connection.has_extension('MIT-SCREEN-SAVER'):
+                    self._xlib_root = connection.screen().root
+                else:
+                    connection.close()
+            except Exception as e:
+                print(f"X11 idle probe unavailable: {e}")
+
+    def __call__(self):
+        if self._display and self._info:
+            root = self._xlib.XDefaultRootWindow(self._display)
+            if self._xss.XScreenSaverQueryInfo(self._display, root, self._info):
+                return self._info.contents.idle / 1000.0
+        elif self._xlib_root is not None:
+            return self._xlib_root.screensaver_query_info().idle / 1000.0
+
+        return _xprintidle_probe()
+
+
+class IdleDetector:
+    """
+    Detects whether the user has stopped interacting with the machine.
+
+    Uses a per-OS probe that reports the seconds since the last keyboard or
+    mouse input. Probes can be replaced or registered for other platforms
+    with ``register_probe``.
+    """
+    _probe_factories = {
+        'Windows': lambda: _windows_idle_seconds,
+        'Darwin': _MacIdleProbe,
+        'Linux': _LinuxIdleProbe
+    }
+
+    def __init__(self, threshold_seconds=300, probe=None):
+        """
+        Initialize the detector.
+
+        Args:
+            threshold_seconds (float): Seconds without input after which the
+                user is considered idle.
+            probe (callable, optional): Function returning the seconds since
+                the last input. Defaults to the probe for the current OS.
+        """
+        self.threshold_seconds = threshold_seconds
+        self._probe = probe
+        self._probe_failed = False
+
+    @classmethod
+    def register_probe(cls, system, factory):
+        """
+        Register a probe factory for a platform.
+
+        Args:
+            system (str): Value of platform.system() the probe applies to.
+            factory (callable): Returns a callable that reports idle seconds.
+        """
+        cls._probe_factories[system] = factory
+
+    def _get_probe(self):
+        """Create the platform probe on first use"""
+        if self._probe is None and not self._probe_failed:
+            factory = self._probe_factories.get(platform.system())
+            if factory is None:
+                self._probe_failed = True
+            else:
+                self._probe = factory()
+        return self._probe
+
+    def idle_seconds(self):
+        """
+        Get the seconds since the last user input.
+
+        Returns:
+            float or None: Idle seconds, or None if they cannot be determined.
+        """
+        probe = self._get_probe()
+        if probe is None:
+            return None
+        try:
+            return probe()
+        except Exception as e:
+            # Missing helpers do not come back; stop probing instead of
+            # failing on every tick
+            print(f"Idle detection disabled: {e}")
+            self._probe = None
+            self._probe_failed = True
+            return None
+
+    def is_idle(self, idle_seconds=None):
+        """
+        Check whether the user is idle.
+
+        Args:
+            idle_seconds (float, optional): Previously probed idle seconds.
+
+        Returns:
+            bool: True if the idle time reached the threshold.
+        """
+        if idle_seconds is None:
+            idle_seconds = self.idle_seconds()
+        return idle_seconds is not None and idle_seconds >= self.threshold_seconds
@@ -0,0 +1,203 @@
+import os
+import re
+import zlib
+import threading
+import numpy as np
+
+_TOKENS = re.compile(r'[^\W_]+')
+
+
+def hash_features(app_name, window_title, n_features):
+    """
+    Hash the tokens of an app name and window title into feature indexes.
+
+    App and title tokens hash into separate namespaces, so 'code' as an
+    app name and 'code' in a title are different features. crc32 keeps the
+    indexes stable across processes, unlike the built-in hash().
+    """
+    tokens = ['a:' + token for token in _TOKENS.findall(app_name.casefold())]
+    tokens += ['t:' + token for token in _TOKENS.findall(window_title.casefold())]
+    return np.fromiter(
+        (zlib.crc32(token.encode('utf-8')) % n_features for token in tokens),
+        dtype=np.int64,
+        count=len(tokens)
+    )
+
+
+class LocalTitleModel:
+    """
+    Multinomial naive Bayes over hashed app and title tokens.
+
+    Learns incrementally from AI verdicts and user feedback and answers
+    without a network call. Token counts are kept in two NumPy rows
+    (unproductive, productive), so a prediction is a single gather and sum
+    over the title's token indexes. The model is persisted with np.savez.
+    """
+    def __init__(self, path=None, n_features=2 ** 16, alpha=1.0, save_every=20):
+        """
+        Initialize the model, loading saved counts if present.
+
+        Args:
+            path (str, optional): .npz file the counts are kept in.
+            n_features (int): Size of the hashed feature space.
+            alpha (float): Laplace smoothing.
+            save_every (int): Number of updates between saves.
+        """
+        self.path = path
+        self.n_features = n_features
+        self.alpha = alpha
+        self.save_every = save_every
+
+        self._lock = threading.Lock()
+        self._token_counts = np.zeros((2, n_features), dtype=np.float64)
+        self._class_tokens = np.zeros(2, dtype=np.float64)
+        self._class_docs = np.zeros(2, dtype=np.float64)
+        self._unsaved = 0
+        self.loaded = False
+
+        # Prediction counters
+        self.confident = 0
+        self.unsure = 0
+
+        if path and os.path.exists(path):
+            self._load()
+
+    @property
+    def samples(self):
+        """Number of training samples seen (feedback counts with its weight)"""
+        return int(self._class_docs.sum())
+
+    def _load(self):
+        """Read saved counts; a file with another feature size is ignored"""
+        try:
+            with np.load(self.path) as saved:
+                if saved['token_counts'].shape != self._token_counts.shape:
+                    print(f"Ignoring local model with a different feature size: {self.path}")
+                    return
+                self._token_counts = saved['token_counts']
+                self._class_tokens = saved['class_tokens']
+                self._class_docs = saved['class_docs']
+            self.loaded = True
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load local model: {e}")
+
+    def save(self):
+        """Write the counts to disk atomically"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            token_counts = self._token_counts.copy()
+            class_tokens = self._class_tokens.copy()
+            class_docs = self._class_docs.copy()
+            self._unsaved = 0
+        temp_path = f"{self.path}.tmp.npz"
+        np.savez(temp_path, token_counts=token_counts, class_tokens=class_tokens, class_docs=class_docs)
+        os.replace(temp_path, self.path)
+
+    def learn(self, app_name, window_title, is_productive, weight=1.0):
+        """
+        Add one labeled window.
+
+        Args:
+            app_name (str): Application name.
+            window_title (str): Window title.
+            is_productive (bool): Label.
+            weight (float): Sample weight, e.g. higher for user feedback.
+        """
+        features = hash_features(app_name, window_title, self.n_features)
+        if not len(features):
+            return
+        label = 1 if is_productive else 0
+        with self._lock:
+            np.add.at(self._token_counts[label], features, weight)
+            self._class_tokens[label] += weight * len(features)
+            self._class_docs[label] += weight
+            self._unsaved += 1
+            due = self._unsaved >= self.save_every
+        if due:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Could not save local model: {e}")
+
+    def unlearn(self, app_name, window_title, is_productive, weight=1.0):
+        """
+        Take back a labeled window added with ``learn``, e.g. a deleted
+        correction. Counts never drop below zero.
+
+        Args:
+            app_name (str): Application name.
+            window_title (str): Window title.
+            is_productive (bool): Label it was learned with.
+            weight (float): Weight it was learned with.
+        """
+        features = hash_features(app_name, window_title, self.n_features)
+        if not len(features):
+            return
+        label = 1 if is_productive else 0
+        with self._lock:
+            counts = self._token_counts[label]
+            np.subtract.at(counts, features, weight)
+            np.maximum(counts, 0, out=counts)
+            self._class_tokens[label] = max(0.0, self._class_tokens[label] - weight * len(features))
+            self._class_docs[label] = max(0.0, self._class_docs[label] - weight)
+            self._unsaved += 1
+
+    def predict(self, app_name, window_title):
+        """
+        Estimate the probability that a window is productive.
+
+        Returns:
+            float or None: P(productive), or None if either class has no
+            samples yet or the window has no tokens.
+        """
+        features = hash_features(app_name, window_title, self.n_features)
+        with self._lock:
+            if not len(features) or not self._class_docs.all():
+                return None
+            log_prior = np.log(self._class_docs / self._class_docs.sum())
+            denominators = self._class_tokens + self.alpha * self.n_features
+            log_likelihood = np.log(
+                (self._token_counts[:, features] + self.alpha) / denominators[:, None]
+            ).sum(axis=1)
+        scores = log_prior + log_likelihood
+        scores -= scores.max()
+        probabilities = np.exp(scores)
+        return float(probabilities[1] / probabilities.sum())
+
+    def classify(self, app_name, window_title, threshold, min_samples=0):
+        """
+        Classify a window if the model is confident enough.
+
+        Args:
+            app_name (str): Application name.
+            window_title (str): Window title.
+            threshold (float): Minimum probability of the winning class.
+            min_samples (int): Samples needed before the model is trusted.
+
+        Returns:
+            bool or None: The verdict, or None to defer to the AI.
+        """
+        if self.samples < min_samples:
+            return None
+        probability = self.predict(app_name, window_title)
+        if probability is not None:
+            if probability >= threshold:
+                self.confident += 1
+                return True
+            if 1 - probability >= threshold:
+                self.confident += 1
+                return False
+        self.unsure += 1
+        return None
+
+    def stats(self):
+        """Get model counters"""
+        return {
+            'samples': self.samples,
+            'confident': self.confident,
+            'unsure': self.unsure
+        }
@@ -4,10 +4,8 @@ import time
 import pymongo
 from window_tracker import WindowTracker
 from ai_classifier import AIClassifier
+from classification_pipeline import ClassificationPipeline
 from datetime import datetime, timedelta
-import pyautogui
-import pytesseract
-from PIL import Image
 import threading
 import json
 import zipfile
@@ -18,47 +16,115 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 import google.generativeai as genai
 from report_generator import ReportGenerator
+from session_buffer import SessionWriteBuffer, decode_window_key
+from segment_log import SegmentLog
+from idle_detector import IdleDetector
+from session_journal import SessionJournal, APPLIED_FIELD
+from feedback_store import FeedbackStore
+from ocr_pipeline import ScreenshotOcrPipeline, OCR_PROFILES
+from tile_diff import TileCache, parse_grid
 from dotenv import load_dotenv
 
 class ProductivityTracker:
-    def __init__(self, employee_id=None):
+    def __init__(self, employee_id=None, client=None, ai_classifier=None, journal=None, ocr_pipeline=None):
         """
         Initialize the ProductivityTracker with MongoDB connection and tracking components.
         
         Args:
             employee_id (str, optional): Unique identifier for the employee. Defaults to None.
+            client (MongoClient, optional): Shared MongoDB client. A new one is created if omitted.
+            ai_classifier (AIClassifier, optional): Shared classifier. A new one is created if omitted.
+            journal (SessionJournal, optional): Shared write journal. A new one is created if omitted.
+            ocr_pipeline (ScreenshotOcrPipeline, optional): Shared OCR workers. A new one is created if omitted.
         """
         # Load environment variables
         load_dotenv()
         
-        # MongoDB Connection using environment variable
-        mongodb_uri = os.getenv('MONGODB_URI')
-        if not mongodb_uri:
-            raise ValueError("""
-            MongoDB URI not found! 
-            Please ensure your .env file contains:
-            MONGODB_URI=your_mongodb_connection_string
-            """)
-        
-        # Establish MongoDB connection
-        self.client = pymongo.MongoClient(mongodb_uri)
+        if client is None:
+            # MongoDB Connection using environment variable
+            mongodb_uri = os.getenv('MONGODB_URI')
+            if not mongodb_uri:
+                raise ValueError("""
+                MongoDB URI not found! 
+                Please ensure your .env file contains:
+                MONGODB_URI=your_mongodb_connection_string
+                """)
+
+            # Establish MongoDB connection
+            client = pymongo.MongoClient(mongodb_uri)
+
+        self.client = client
         self.db = self.client['productivity_tracker']
         self.sessions_collection = self.db['user_sessions']
         self.screenshots_collection = self.db['screenshots']
         self.reports_collection = self.db['reports']
+        self.segments_collection = self.db['session_segments']
+
+        # Tracking writes go through a local journal so database outages
+        # never stall the tracking loop or end the session
+        if journal is None:
+            journal_dir = os.getenv('JOURNAL_DIR', 'journal')
+            journal = SessionJournal(
+                self.db,
+                os.path.join(journal_dir, 'session_journal.log'),
+                fsync_interval=float(os.getenv('JOURNAL_FSYNC_INTERVAL', 1.0))
+            )
+        self.journal = journal
         
         # Store employee ID
         self.employee_id = employee_id
         
         # Trackers
         self.window_tracker = WindowTracker()
-        self.ai_classifier = AIClassifier()
+        if ai_classifier is None:
+            ai_classifier = AIClassifier()
+            ai_classifier.load_feedback(FeedbackStore(self.db['classifier_feedback']))
+        self.ai_classifier = ai_classifier
+
+        # Classification runs off the tracking thread, in shared AI batches, so the tracking loop never waits on the LLM
+        self.classification_pipeline = ClassificationPipeline(
+            self.ai_classifier,
+            max_queue=int(os.getenv('CLASSIFIER_QUEUE_SIZE', 100))
+        )
         
         # Session state
         self.current_session = None
         self.session_active = False
         self.screenshot_thread = None
 
+        # Screenshots are read by a pool of OCR threads off the capture
+        # thread and journaled in batches
+        self._owns_ocr_pipeline = ocr_pipeline is None
+        if ocr_pipeline is None:
+            ocr_pipeline = ScreenshotOcrPipeline(
+                lambda documents: self.journal.insert_many(self.screenshots_collection.name, documents)
+            )
+        self.ocr_pipeline = ocr_pipeline
+        self._stopped = threading.Event()
+
+        # Change-driven tracking configuration (seconds)
+        self.poll_interval = float(os.getenv('TRACKING_POLL_INTERVAL', 1.0))
+        self.flush_interval = float(os.getenv('TRACKING_FLUSH_INTERVAL', 30))
+        self.flush_max_windows = int(os.getenv('TRACKING_FLUSH_MAX_WINDOWS', 50))
+        self.write_buffer = None
+
+        # Activity timeline of the current session
+        self.segment_chunk_size = int(os.getenv('SEGMENT_CHUNK_SIZE', 256))
+        self.segment_log = None
+        self._session_epoch = None
+
+        # Idle detection; user_active is cleared while the user is away so
+        # background work such as screenshots can wait on it
+        self.idle_detector = IdleDetector(
+            threshold_seconds=float(os.getenv('IDLE_THRESHOLD_SECONDS', 300))
+        )
+        self.user_active = threading.Event()
+        self.user_active.set()
+
+        # Interval state for the window currently in the foreground
+        self._tracking_lock = threading.Lock()
+        self._reset_tracking_state()
+
         # Load Gemini API Key from environment
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
@@ -103,17 +169,30 @@ class ProductivityTracker:
             'end_time': None,
             'productive_time': 0,
             'unproductive_time': 0,
+            'pending_time': 0,
             'window_details': {},
             'screenshots': []
         }
+        with self._tracking_lock:
+            self._reset_tracking_state()
+            self.segment_log = SegmentLog()
+            self._session_epoch = time.time()
         self.session_active = True
         
-        # Insert new session and get the ID
-        session_id = self.sessions_collection.insert_one(self.current_session).inserted_id
-        self.current_session['_id'] = session_id
+        # Journal the new session; the ID is assigned client-side
+        session_id = self.journal.insert(self.sessions_collection.name, self.current_session)
         # Also store the string version for reference
         self.current_session['_id_str'] = str(session_id)
 
+        # Counter deltas are written behind the tracking loop
+        self.write_buffer = SessionWriteBuffer(
+            self.sessions_collection,
+            session_id,
+            flush_interval=self.flush_interval,
+            max_pending_windows=self.flush_max_windows,
+            journal=self.journal
+        )
+
         # Create and START the screenshot thread
         self.screenshot_thread = threading.Thread(target=self._screenshot_loop)
         self.screenshot_thread.daemon = True
@@ -133,7 +212,27 @@ class ProductivityTracker:
             
         try:
             self.session_active = False
-            
+
+            # Credit the last open interval, give outstanding classifications
+            # a moment to land, then persist the final counters
+            with self._tracking_lock:
+                now = time.time()
+                if self._idle_since is not None:
+                    self._leave_idle(now)
+                self._close_tracking_interval(now, final=True)
+            self.classification_pipeline.wait_idle(timeout=5)
+            with self._tracking_lock:
+                self._apply_classification_results(time.time())
+                self._flush_session_state()
+                self._persist_segments(final=True)
+                self._reset_tracking_state()
+
+            # The summary reads screenshots back from MongoDB
+            if not self.ocr_pipeline.flush(timeout=10):
+                print(f"Warning: {self.ocr_pipeline.pending()} screenshots not yet read")
+            if not self.journal.sync(timeout=10):
+                print(f"Warning: {self.journal.pending()} journaled writes not yet replayed")
+
             # Add proper thread handling with timeout and error logging
             if self.screenshot_thread and self.screenshot_thread.is_alive():
                 try:
@@ -217,7 +316,7 @@ class ProductivityTracker:
             screenshots = list(self.screenshots_collection.find({
                 "session_id": session_id,
                 "employee_id": self.employee_id  # Filter by employee_id
-            }))
+            }).sort("timestamp", 1))
             
             if not screenshots:
                 print("No screenshots found for this session")
@@ -226,8 +325,7 @@ class ProductivityTracker:
             print(f"Found {len(screenshots)} screenshots")
             
             # Combine all extracted text
-            all_text_list = [doc.get('text', '') for doc in screenshots]
-            all_text = "\n".join(all_text_list)
+            all_text = self._screenshot_text(screenshots)
             
             if not all_text or all_text.isspace():
                 print("No text extracted from screenshots")
@@ -283,8 +381,21 @@ class ProductivityTracker:
         Take screenshots based on user privacy settings in a continuous loop.
         Runs as a daemon thread during an active session.
         """
+        # Perceptual hash and _id of the last screenshot sent to OCR
+        last_fingerprint = None
+        last_read_id = None
+        # Text of each screen tile, so only changed tiles are read again
+        tile_grid = parse_grid(os.getenv('OCR_TILE_GRID', '4x4'))
+        tile_margin = int(os.getenv('OCR_TILE_MARGIN', 8))
+        tile_cache = TileCache(*tile_grid, margin=tile_margin)
+        tile_profile = None
+
         while self.session_active:
             try:
+                # Nothing changes on screen while the user is away
+                if not self.user_active.wait(timeout=1):
+                    continue
+
                 # Get privacy settings from database for this employee
                 settings_doc = self.db['user_settings'].find_one({
                     'type': 'privacy_settings',
@@ -303,32 +414,53 @@ class ProductivityTracker:
                     time.sleep(60)  # Check settings again in a minute
                     continue
                     
-                # Take screenshot
-                screenshot = pyautogui.screenshot()
-                timestamp = datetime.now()
-                
-                # Save screenshot temporarily
-                temp_path = f"temp_screenshot_{timestamp.timestamp()}.png"
-                screenshot.save(temp_path)
-                
-                # Extract text if enabled
-                extracted_text = ""
-                if privacy_settings.get('enableTextExtraction', True):
-                    extracted_text = pytesseract.image_to_string(Image.open(temp_path))
-                
                 # Use the string version of the ID for consistency
                 session_id = str(self.current_session['_id'])
-                
-                # Save to MongoDB with employee_id
-                self.screenshots_collection.insert_one({
+
+                # Take screenshot if text extraction is enabled; it is read
+                # in the background, so a slow OCR pass never delays capture
+                image = None
+                timestamp = datetime.now()
+                if privacy_settings.get('enableTextExtraction', True):
+                    # Preprocessing and Tesseract settings trade accuracy for speed
+                    profile = self.ocr_pipeline.profile(privacy_settings.get('ocrProfile'))
+                    if profile != tile_profile:
+                        # Tile text read under another profile is not reused
+                        tile_cache = TileCache(*tile_grid, margin=tile_margin)
+                        tile_profile = profile
+                    timestamp, image = self.ocr_pipeline.capture(profile)
+
+                # Queue the screenshot record with employee_id; the _id is
+                # assigned now so later identical screens can refer to it
+                document = {
+                    "_id": ObjectId(),
                     "session_id": session_id,
                     "employee_id": self.employee_id,  # Add employee_id to screenshots
-                    "timestamp": timestamp,
-                    "text": extracted_text
-                })
-                
-                # Clean up temp file
-                os.remove(temp_path)
+                    "timestamp": timestamp
+                }
+                if image is None:
+                    self.ocr_pipeline.submit(document)
+                else:
+                    # Exact tile checksums decide what changed
+                    plan = self.ocr_pipeline.plan_tiles(tile_cache, image)
+                    if not plan.dirty:
+                        # Nothing to read; stored as a reference to the
+                        # identical capture read last, or with cached text
+                        self.ocr_pipeline.submit(document, image, plan, profile)
+                    else:
+                        fingerprint = None
+                        unchanged = False
+                        if self.ocr_pipeline.change_threshold:
+                            # Tolerance for rendering noise: same screen as the
+                            # last capture read, unless that one is still
+                            # queued or was stored without text
+                            fingerprint = self.ocr_pipeline.fingerprint(image)
+                            unchanged = (
+                                self.ocr_pipeline.is_unchanged(fingerprint, last_fingerprint)
+                                and self.ocr_pipeline.submit_unchanged(document, last_read_id)
+                            )
+                        if not unchanged and self.ocr_pipeline.submit(document, image, plan, profile):
+                            last_fingerprint, last_read_id = fingerprint, document['_id']
                 
                 # Wait for the configured interval
                 interval_minutes = privacy_settings.get('screenshotInterval', 15)
@@ -338,6 +470,29 @@ class ProductivityTracker:
                 print(f"Screenshot error: {e}")
                 time.sleep(60)  # Wait a minute before retrying
 
+    @staticmethod
+    def _screenshot_text(screenshots):
+        """
+        Join the text of a session's screenshots for the summary prompt.
+
+        Captures stored as the same screen as an earlier one (``same_as``)
+        take that screenshot's text, and every distinct text is included
+        once, so a static screen does not fill the prompt with repeats.
+
+        Args:
+            screenshots (list): Screenshot documents in capture order.
+
+        Returns:
+            str: Distinct screen texts in order of first appearance.
+        """
+        texts = {doc['_id']: doc.get('text', '') for doc in screenshots if '_id' in doc}
+        distinct = {}
+        for doc in screenshots:
+            text = texts.get(doc['same_as'], '') if doc.get('same_as') else doc.get('text', '')
+            if text and not text.isspace():
+                distinct.setdefault(text, None)
+        return "\n".join(distinct)
+
     def _generate_and_store_report(self, summary):
         """
         Generate PDF report and store it in MongoDB.
@@ -352,7 +507,10 @@ class ProductivityTracker:
             # Create PDF in memory
             report_buffer = io.BytesIO()
             report_generator = ReportGenerator()
-            report_generator.generate_report_to_buffer(self.current_session, summary, report_buffer)
+            segments = self.segment_log.iter_segments() if self.segment_log else None
+            report_generator.generate_report_to_buffer(
+                self.current_session, summary, report_buffer, segments=segments
+            )
             
             # Ensure session_id is an ObjectId
             session_id = self.current_session['_id']
@@ -401,81 +559,300 @@ class ProductivityTracker:
             print(f"Error retrieving report: {e}")
             return None
             
+    def _reset_tracking_state(self):
+        """Forget the window interval currently being accumulated."""
+        self._tracked_window = None
+        self._tracked_productive = False
+        self._interval_start = None
+        self._last_credit = time.time()
+        # Seconds credited to windows whose verdict has not arrived yet
+        self._pending_seconds = {}
+        # Start of the current idle period, None while the user is active
+        self._idle_since = None
+        self.user_active.set()
+
+    def _enter_idle(self, now, idle_seconds):
+        """
+        Switch to idle mode after the idle threshold was reached.
+
+        The open interval is closed at the last input, but never before its
+        start: time the tracking loop already credited while the threshold
+        ran out stays active time, so up to the whole threshold period
+        counts as active. The idle period from there on is credited as
+        idle_time when the user comes back.
+
+        Args:
+            now (float): Current time as returned by time.time().
+            idle_seconds (float): Seconds since the last user input.
+        """
+        idle_start = now - idle_seconds
+        if self._interval_start is not None:
+            idle_start = max(idle_start, self._interval_start)
+            self._close_tracking_interval(idle_start, final=True)
+
+        self._idle_since = idle_start
+        self.user_active.clear()
+        print(f"User idle for {int(idle_seconds)}s, pausing tracking")
+
+        # Persist what we have before writes pause
+        self._flush_session_state()
+
+    def _leave_idle(self, now):
+        """
+        Leave idle mode and credit the idle period to the tracked window.
+
+        Args:
+            now (float): Current time as returned by time.time().
+        """
+        seconds = int(round(now - self._idle_since))
+        window = self._tracked_window
+
+        if window is not None and seconds > 0 and self.current_session:
+            window_details = self.current_session['window_details']
+            if window not in window_details:
+                window_details[window] = {
+                    'productive': self._tracked_productive,
+                    'active_time': 0,
+                    'idle_time': 0
+                }
+            window_details[window]['idle_time'] += seconds
+            if self.write_buffer:
+                self.write_buffer.record(window, self._tracked_productive, idle_seconds=seconds)
+            if self.segment_log:
+                self.segment_log.append(
+                    self._idle_since - self._session_epoch,
+                    seconds,
+                    window,
+                    self._tracked_productive,
+                    idle=True
+                )
+
+        self._idle_since = None
+        self._interval_start = now if window is not None else None
+        self._last_credit = now
+        self.user_active.set()
+        print(f"User active again after {seconds}s idle")
+
+    def _apply_classification_results(self, now):
+        """
+        Apply verdicts that arrived from the classification pipeline.
+
+        Time that was recorded as pending for a window is moved retroactively
+        to its productive or unproductive total.
+
+        Args:
+            now (float): Current time as returned by time.time().
+        """
+        for window, is_productive in self.classification_pipeline.drain_results():
+            if window == self._tracked_window and self._tracked_productive is None:
+                # Credit the pending part of the open interval before switching
+                self._close_tracking_interval(now)
+                self._tracked_productive = is_productive
+
+            if not self.current_session:
+                continue
+
+            if self.segment_log:
+                self.segment_log.resolve(window, is_productive)
+
+            seconds = self._pending_seconds.pop(window, 0)
+            details = self.current_session['window_details'].get(window)
+            if details is None:
+                continue
+
+            details['productive'] = is_productive
+            self.current_session['pending_time'] -= seconds
+            if is_productive:
+                self.current_session['productive_time'] += seconds
+            else:
+                self.current_session['unproductive_time'] += seconds
+            if self.write_buffer:
+                self.write_buffer.reattribute(window, is_productive, seconds)
+
+    def _close_tracking_interval(self, now, final=False):
+        """
+        Credit the dwell time of the tracked window up to ``now``.
+
+        Only whole seconds are credited while the window stays in focus; the
+        fractional remainder is carried into the next interval. When ``final``
+        is set (window change or session end) the remainder is rounded instead.
+
+        Args:
+            now (float): Current time as returned by time.time().
+            final (bool): Whether the interval is being closed for good.
+        """
+        if self._tracked_window is None or self._interval_start is None:
+            return
+
+        elapsed = now - self._interval_start
+        seconds = int(round(elapsed)) if final else int(elapsed)
+        if seconds <= 0:
+            if final:
+                self._interval_start = None
+            return
+
+        if self._tracked_productive is None:
+            self.current_session['pending_time'] += seconds
+            self._pending_seconds[self._tracked_window] = (
+                self._pending_seconds.get(self._tracked_window, 0) + seconds
+            )
+        elif self._tracked_productive:
+            self.current_session['productive_time'] += seconds
+        else:
+            self.current_session['unproductive_time'] += seconds
+
+        window_details = self.current_session['window_details']
+        if self._tracked_window not in window_details:
+            window_details[self._tracked_window] = {
+                'productive': self._tracked_productive,
+                'active_time': 0,
+                'idle_time': 0
+            }
+        window_details[self._tracked_window]['active_time'] += seconds
+        if self.write_buffer:
+            self.write_buffer.record(self._tracked_window, self._tracked_productive, active_seconds=seconds)
+        if self.segment_log:
+            self.segment_log.append(
+                self._interval_start - self._session_epoch,
+                seconds,
+                self._tracked_window,
+                self._tracked_productive
+            )
+
+        self._interval_start = None if final else self._interval_start + seconds
+
+    def _flush_session_state(self):
+        """
+        Flush buffered session counter deltas to MongoDB.
+
+        Returns:
+            bool: False if the write failed, True otherwise.
+        """
+        if not self.write_buffer:
+            return True
+        return self.write_buffer.flush()
+
+    def _persist_segments(self, final=False):
+        """
+        Write the next chunk of the segment log to MongoDB.
+
+        Args:
+            final (bool): Persist every remaining segment, including pending ones.
+        """
+        if not self.segment_log or not self.current_session:
+            return
+
+        chunk = self.segment_log.take_chunk(final=final)
+        if not chunk:
+            return
+
+        chunk['session_id'] = str(self.current_session['_id'])
+        chunk['employee_id'] = self.employee_id
+        self.journal.insert(self.segments_collection.name, chunk)
+
+    def _track_tick(self, now):
+        """
+        Process one poll of the foreground window.
+
+        Classification and bookkeeping only run when the window identity
+        changes; otherwise dwell time keeps building up locally. Windows the
+        rules cannot decide are tracked as pending until the classification
+        pipeline returns a verdict. Deltas are flushed when the write buffer's
+        interval or size threshold is reached.
+
+        While the user is idle only the idle probe runs: classification,
+        counter writes and segment persistence are paused until input resumes.
+
+        Args:
+            now (float): Current time as returned by time.time().
+
+        Returns:
+            bool: False if a MongoDB flush failed, True otherwise.
+        """
+        idle_seconds = self.idle_detector.idle_seconds()
+        if self.idle_detector.is_idle(idle_seconds):
+            if self._idle_since is None:
+                self._enter_idle(now, idle_seconds)
+            return True
+        if self._idle_since is not None:
+            self._leave_idle(now)
+
+        self._apply_classification_results(now)
+
+        active_window = self.window_tracker.get_active_window()
+
+        if active_window != self._tracked_window:
+            self._close_tracking_interval(now, final=True)
+
+            # Excluded windows (None) are not tracked at all
+            self._tracked_window = active_window
+            self._interval_start = now if active_window is not None else None
+            if active_window is not None:
+                self._tracked_productive = self.classification_pipeline.submit(active_window)
+        elif now - self._last_credit >= self.flush_interval:
+            self._close_tracking_interval(now)
+            self._last_credit = now
+
+        if self.segment_log and self.segment_log.unpersisted_count() >= self.segment_chunk_size:
+            self._persist_segments()
+
+        if self.write_buffer and self.write_buffer.should_flush(now):
+            return self._flush_session_state()
+
+        return True
+
+    def shutdown(self):
+        """
+        Stop the tracking loop, classification workers and, if this
+        tracker created it, the OCR pipeline.
+
+        Shared resources (MongoDB client, classifier, journal, a shared OCR
+        pipeline) are left open for their owner to close.
+        """
+        self._stopped.set()
+        self.session_active = False
+        self.classification_pipeline.shutdown()
+        if self._owns_ocr_pipeline:
+            self.ocr_pipeline.close()
+
     def update_tracking(self):
-        """Continuously track and update window information"""
+        """
+        Continuously track window changes and update session information.
+
+        Storage errors do not end the session: failed flushes keep their
+        deltas in the write buffer and the journal holds writes until
+        MongoDB is reachable again, so the loop only backs off. Other
+        errors end the session after too many in a row.
+        """
         print("Starting tracking loop...")
 
-        last_update = time.time()
         consecutive_errors = 0
+        storage_errors = 0
 
-        while True:
+        while not self._stopped.is_set():
             try:
                 if not self.current_session or not self.session_active:
                     time.sleep(1)
-                    continue                                                                               
-
-                current_time = time.time()
-                elapsed_seconds = int(current_time - last_update)
+                    continue
 
-                if elapsed_seconds > 0:
-                    active_window = self.window_tracker.get_active_window()
-                    
-                    # Skip processing if window is excluded (None is returned)
-                    if active_window is None:
-                        last_update = current_time
-                        time.sleep(0.1)
+                with self._tracking_lock:
+                    # end_session may have won the race for the lock
+                    if not self.session_active:
                         continue
+                    # A failed flush keeps its deltas buffered for the next one
+                    self._track_tick(time.time())
 
-                    # Retry AI classification if it fails
-                    retry_count = 3
-                    is_productive = False
-
-                    for _ in range(retry_count):
-                        try:
-                            is_productive = self.ai_classifier.classify_window(active_window)
-                            break
-                        except Exception as e:
-                            print(f"AI Classification retry error: {e}")
-                            time.sleep(1)
-
-                    # Update times
-                    if is_productive:
-                        self.current_session['productive_time'] += elapsed_seconds
-                    else:
-                        self.current_session['unproductive_time'] += elapsed_seconds
-
-                    # Update window details
-                    if active_window not in self.current_session['window_details']:
-                        self.current_session['window_details'][active_window] = {
-                            'productive': is_productive,
-                            'active_time': 0,
-                            'idle_time': 0
-                        }
-
-                    self.current_session['window_details'][active_window]['active_time'] += elapsed_seconds
-
-                    # Update MongoDB
-                    try:
-                        self.sessions_collection.update_one(
-                            {"_id": self.current_session['_id']},
-                            {"$set": {
-                                "productive_time": self.current_session['productive_time'],
-                                "unproductive_time": self.current_session['unproductive_time'],
-                                "window_details": self.current_session['window_details']
-                            }}
-                        )
-                        consecutive_errors = 0  # Reset error counter on successful update
-                    except Exception as e:
-                        print(f"MongoDB update error: {e}")
-                        consecutive_errors += 1
-                        if consecutive_errors > 5:
-                            print("Too many consecutive errors, resetting session state...")
-                            self.session_active = False
-                            break
-
-                    last_update = current_time
-
-                time.sleep(0.1)
+                consecutive_errors = 0
+                storage_errors = 0
+
+                # Wakes early when the window tracker reports a focus change
+                self.window_tracker.wait_for_change(self.poll_interval)
+
+            except (pymongo.errors.PyMongoError, OSError) as e:
+                storage_errors += 1
+                delay = min(2 ** storage_errors, 60)
+                print(f"Storage error in tracking loop, retrying in {delay}s: {e}")
+                self._stopped.wait(delay)
 
             except Exception as e:
                 print(f"Error in tracking loop: {e}")
@@ -508,7 +885,7 @@ class ProductivityTracker:
                 '$lt': today_end
             },
             'employee_id': self.employee_id  # Only get sessions for this employee
-        }))
+        }, {APPLIED_FIELD: False}))
 
         # Calculate total times and window details
         total_productive_time = 0
@@ -520,7 +897,8 @@ class ProductivityTracker:
             total_unproductive_time += session.get('unproductive_time', 0)
 
             # Aggregate window times
-            for window, details in session.get('window_details', {}).items():
+            for key, details in session.get('window_details', {}).items():
+                window = decode_window_key(key)
                 if window not in window_times:
                     window_times[window] = {
                         'window': window,
@@ -573,6 +951,23 @@ class ProductivityTracker:
             'productive_windows': productive_windows
         }
         
+    def get_session_timeline(self, session_id, bucket_seconds=60):
+        """
+        Build a timeline for a session from its persisted segment chunks.
+
+        Args:
+            session_id (str): ID of the session.
+            bucket_seconds (int): Width of each timeline bucket in seconds.
+
+        Returns:
+            list: Productive, unproductive, pending and idle seconds per bucket.
+        """
+        chunks = self.segments_collection.find({
+            'session_id': session_id,
+            'employee_id': self.employee_id  # Only read this employee's sessions
+        }).sort('chunk', 1)
+        return SegmentLog.bucket_totals(SegmentLog.iter_chunk_documents(chunks), bucket_seconds)
+
     def get_privacy_settings(self):
         """Get privacy settings for the current employee"""
         if not self.employee_id:
@@ -580,7 +975,8 @@ class ProductivityTracker:
                 'enableScreenshots': True,
                 'screenshotInterval': 15,
                 'enableTextExtraction': True,
-                'enableAiAnalysis': True
+                'enableAiAnalysis': True,
+                'ocrProfile': self.ocr_pipeline.default_profile.name
             }
             
         settings_doc = self.db['user_settings'].find_one({
@@ -596,7 +992,8 @@ class ProductivityTracker:
                 'enableScreenshots': True,
                 'screenshotInterval': 15,
                 'enableTextExtraction': True,
-                'enableAiAnalysis': True
+                'enableAiAnalysis': True,
+                'ocrProfile': self.ocr_pipeline.default_profile.name
             }
             
     def update_privacy_settings(self, settings):
@@ -609,6 +1006,11 @@ class ProductivityTracker:
             required_keys = ['enableScreenshots', 'screenshotInterval', 'enableTextExtraction', 'enableAiAnalysis']
             if not all(key in settings for key in required_keys):
                 return {"status": "error", "message": "Invalid settings format"}
+            if 'ocrProfile' in settings and settings['ocrProfile'] not in OCR_PROFILES:
+                return {
+                    "status": "error",
+                    "message": f"Unknown OCR profile. Choose one of: {', '.join(OCR_PROFILES)}"
+                }
                 
             # Update settings in database with employee_id
             self.db['user_settings'].update_one(
@@ -636,8 +1038,14 @@ class ProductivityTracker:
                 self.screenshots_collection.delete_many({'employee_id': self.employee_id})
                 self.sessions_collection.delete_many({'employee_id': self.employee_id})
                 self.reports_collection.delete_many({'employee_id': self.employee_id})
+                self.segments_collection.delete_many({'employee_id': self.employee_id})
                 self.db['daily_scores'].delete_many({'employee_id': self.employee_id})
                 self.db['user_settings'].delete_many({'employee_id': self.employee_id})
+                if self.ai_classifier.feedback_store is not None:
+                    # Also takes the corrections back out of the shared classifier
+                    self.ai_classifier.forget_feedback(self.employee_id)
+                else:
+                    self.db['classifier_feedback'].delete_many({'employee_id': self.employee_id})
                 
                 return {"status": "success", "message": "All user data deleted"}
             elif delete_type == 'screenshots':
@@ -663,8 +1071,13 @@ class ProductivityTracker:
                 # Export sessions
                 sessions = list(self.sessions_collection.find(
                     {'employee_id': self.employee_id}, 
-                    {'_id': False}
+                    {'_id': False, APPLIED_FIELD: False}
                 ))
+                for session in sessions:
+                    session['window_details'] = {
+                        decode_window_key(key): details
+                        for key, details in session.get('window_details', {}).items()
+                    }
                 zipf.writestr('sessions.json', json.dumps(sessions, default=str, indent=2))
                 
                 # Export screenshots metadata (not the actual images)
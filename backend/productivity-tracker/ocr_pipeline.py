@@ -0,0 +1,640 @@
+import os
+import time
+import argparse
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+import pyautogui
+import pytesseract
+import numpy as np
+from PIL import Image
+from stage_stats import StageStats
+from screen_hash import dhash, hamming_distance
+
+try:
+    import tesserocr
+except ImportError:  # Optional: pytesseract is used instead
+    tesserocr = None
+
+# Queue policies when OCR falls behind capture
+DROP = 'drop'          # Discard the new capture
+COALESCE = 'coalesce'  # Store the oldest waiting capture without text; the newer screen supersedes it
+
+# How a capture is prepared and read: downscale factor, grayscale,
+# black-and-white binarization, Tesseract page segmentation mode, language
+OcrProfile = namedtuple('OcrProfile', ['name', 'scale', 'grayscale', 'binarize', 'psm', 'lang'])
+
+# From most faithful to fastest; selected by the 'ocrProfile' privacy setting
+OCR_PROFILES = {
+    'full': OcrProfile('full', 1.0, False, False, 3, 'eng'),
+    'accurate': OcrProfile('accurate', 1.0, True, False, 3, 'eng'),
+    'balanced': OcrProfile('balanced', 0.75, True, False, 3, 'eng'),
+    'fast': OcrProfile('fast', 0.5, True, True, 11, 'eng'),
+}
+
+
+def binarize(image):
+    """Threshold a grayscale image to black and white at its Otsu level"""
+    pixels = np.asarray(image)
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    below = np.cumsum(histogram)
+    below_sum = np.cumsum(histogram * np.arange(256))
+    above = below[-1] - below
+    # Between-class variance of every threshold, up to a constant factor
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (below_sum[-1] * below - below_sum * below[-1]) ** 2 / (below * above)
+    threshold = int(np.argmax(np.nan_to_num(variance)))
+    return Image.fromarray(np.where(pixels > threshold, 255, 0).astype(np.uint8))
+
+
+def preprocess(image, profile):
+    """
+    Prepare a capture for OCR as a profile says.
+
+    Args:
+        image (PIL.Image.Image): Capture.
+        profile (OcrProfile): Preprocessing profile.
+
+    Returns:
+        PIL.Image.Image: The prepared image.
+    """
+    if profile.grayscale or profile.binarize:
+        # Before scaling, so the scaler handles a third of the data
+        image = image.convert('L')
+    if profile.scale != 1.0:
+        factor = 1 / profile.scale
+        if factor.is_integer():
+            image = image.reduce(int(factor))
+        else:
+            size = (max(1, round(image.width * profile.scale)), max(1, round(image.height * profile.scale)))
+            image = image.resize(size, Image.BILINEAR)
+    if profile.binarize:
+        image = binarize(image)
+    return image
+
+
+class OcrEngine:
+    """
+    Text recognition on in-memory images.
+
+    Uses tesserocr when it is installed, which runs Tesseract in this
+    process on the image's raw pixels. Otherwise the PIL image is handed to
+    pytesseract, which runs the tesseract binary.
+    """
+    def __init__(self, lang='eng'):
+        """
+        Initialize the engine.
+
+        Args:
+            lang (str): Tesseract language(s), e.g. 'eng' or 'eng+deu'.
+        """
+        self.lang = lang
+        self._api = None
+        self._lock = threading.Lock()  # A Tesseract API handles one image at a time
+        if tesserocr is not None:
+            try:
+                self._api = tesserocr.PyTessBaseAPI(lang=lang)
+            except RuntimeError as e:
+                print(f"tesserocr unavailable, using pytesseract: {e}")
+
+    @property
+    def backend(self):
+        """Name of the OCR backend in use"""
+        return 'tesserocr' if self._api is not None else 'pytesseract'
+
+    def image_to_text(self, image, psm=3):
+        """
+        Recognize the text of an image.
+
+        Args:
+            image (PIL.Image.Image): Image to read; grayscale ('L') images
+                are passed to tesserocr as a raw buffer without conversion.
+            psm (int): Tesseract page segmentation mode.
+
+        Returns:
+            str: Recognized text.
+        """
+        if self._api is None:
+            return pytesseract.image_to_string(image, lang=self.lang, config=f'--psm {psm}')
+
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        bytes_per_pixel = 1 if image.mode == 'L' else 3
+        with self._lock:
+            self._api.SetPageSegMode(psm)
+            self._api.SetImageBytes(
+                image.tobytes(), image.width, image.height,
+                bytes_per_pixel, image.width * bytes_per_pixel
+            )
+            return self._api.GetUTF8Text()
+
+    def image_to_words(self, image, psm=3):
+        """
+        Recognize the words of an image with their positions.
+
+        Args:
+            image (PIL.Image.Image): Image to read.
+            psm (int): Tesseract page segmentation mode.
+
+        Returns:
+            list: (text, (left, top, right, bottom), line) of every word in
+            reading order; words of one text line share the same ``line``.
+        """
+        words = []
+        if self._api is None:
+            data = pytesseract.image_to_data(
+                image, lang=self.lang, config=f'--psm {psm}',
+                output_type=pytesseract.Output.DICT
+            )
+            for i, text in enumerate(data['text']):
+                if text.strip():
+                    left, top = data['left'][i], data['top'][i]
+                    words.append((
+                        text.strip(),
+                        (left, top, left + data['width'][i], top + data['height'][i]),
+                        (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+                    ))
+            return words
+
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        bytes_per_pixel = 1 if image.mode == 'L' else 3
+        level = tesserocr.RIL.WORD
+        with self._lock:
+            self._api.SetPageSegMode(psm)
+            self._api.SetImageBytes(
+                image.tobytes(), image.width, image.height,
+                bytes_per_pixel, image.width * bytes_per_pixel
+            )
+            self._api.Recognize()
+            iterator = self._api.GetIterator()
+            if iterator is None:
+                return words
+            line = 0
+            for word in tesserocr.iterate_level(iterator, level):
+                if word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                    line += 1
+                text = word.GetUTF8Text(level)
+                if text and text.strip():
+                    words.append((text.strip(), word.BoundingBox(level), line))
+        return words
+
+    def close(self):
+        """Free the Tesseract API"""
+        if self._api is not None:
+            with self._lock:
+                self._api.End()
+                self._api = None
+
+
+class ScreenshotOcrPipeline:
+    """
+    Screenshot capture decoupled from OCR.
+
+    Capture threads grab the screen, preprocess it as the employee's OCR
+    profile says and queue it with its screenshot document; nothing is
+    written to disk. A dispatcher thread feeds the bounded queue to a pool
+    of OCR threads with one Tesseract engine each. Tesseract runs outside
+    the GIL (in the tesseract binary, or in tesserocr's native code), so
+    the threads read on several cores without holding up capture, and no
+    worker process has to re-import the API module on spawn platforms or
+    in the packaged executable.
+    When the pool falls behind, the queue policy drops the new capture or
+    coalesces by storing the oldest waiting one without its text. Exact
+    per-tile checksums decide what changed: a screen whose tiles all match
+    their cached text skips OCR, otherwise only the changed tiles are read,
+    or the whole capture when most of it changed. Screens whose perceptual
+    hash barely moved since the last capture read also skip OCR. Finished documents are
+    inserted in batches. Each stage is timed into a latency histogram.
+    """
+    def __init__(self, insert_many, workers=None, max_pending=None, policy=None,
+                 batch_size=None, flush_interval=None, capture=None,
+                 change_threshold=None, default_profile=None):
+        """
+        Initialize the pipeline; the pool starts with the first capture.
+
+        Args:
+            insert_many (callable): Stores a list of screenshot documents.
+            workers (int, optional): OCR threads (OCR_WORKERS, default one
+                less than the number of cores).
+            max_pending (int, optional): Captures waiting for a worker
+                (OCR_QUEUE_SIZE, default 4).
+            policy (str, optional): DROP or COALESCE (OCR_QUEUE_POLICY).
+            batch_size (int, optional): Documents per insert (OCR_INSERT_BATCH).
+            flush_interval (float, optional): Seconds a finished document may
+                wait for its batch (OCR_INSERT_WAIT).
+            capture (callable, optional): Returns a PIL image of the screen;
+                defaults to pyautogui.screenshot.
+            change_threshold (int, optional): Hash bits (of 256) that may
+                differ for a changed screen to still count as unchanged
+                (SCREEN_CHANGE_THRESHOLD, default 1). One bit absorbs
+                rendering noise such as a blinking caret, while one added
+                line of text changes two or more; 0 turns the check off.
+            default_profile (str, optional): Name of the profile used when
+                none is selected (OCR_PROFILE, default 'accurate').
+        """
+        if workers is None:
+            workers = int(os.getenv('OCR_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+        self.workers = max(1, workers)
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv('OCR_QUEUE_SIZE', 4))
+        self.policy = policy or os.getenv('OCR_QUEUE_POLICY', COALESCE)
+        if self.policy not in (DROP, COALESCE):
+            raise ValueError(f"Unknown OCR queue policy: {self.policy}")
+        self.batch_size = batch_size or int(os.getenv('OCR_INSERT_BATCH', 10))
+        self.flush_interval = flush_interval if flush_interval is not None else float(os.getenv('OCR_INSERT_WAIT', 5))
+        self.insert_many = insert_many
+        self.capture_screen = capture or pyautogui.screenshot
+        self.default_profile = OCR_PROFILES[default_profile or os.getenv('OCR_PROFILE', 'accurate')]
+        if change_threshold is None:
+            change_threshold = int(os.getenv('SCREEN_CHANGE_THRESHOLD', 1))
+        self.change_threshold = change_threshold
+        self.stage_stats = StageStats()
+
+        self._cond = threading.Condition()
+        self._pending = deque()    # (seq, document, image, plan, profile, queued_at)
+        self._results = []         # (seq, document) ready to insert
+        self._results_since = None
+        self._outstanding = set()  # Sequence numbers not inserted or dropped yet
+        self._next_seq = 0
+        self._running = 0
+        self._flush_waiters = 0
+        self._stopped = False
+        self._coalesced = deque(maxlen=64)  # _ids of recent captures stored without text
+        self._pool = None
+        self._dispatcher = None
+        self._local = threading.local()  # OCR engines of a worker thread, by language
+        self._engines = []
+        self._engines_lock = threading.Lock()
+
+    def _engine(self, lang):
+        """The calling worker thread's OCR engine for a language"""
+        engines = getattr(self._local, 'engines', None)
+        if engines is None:
+            engines = self._local.engines = {}
+        engine = engines.get(lang)
+        if engine is None:
+            engine = engines[lang] = OcrEngine(lang)
+            with self._engines_lock:
+                self._engines.append(engine)
+        return engine
+
+    def _read_regions(self, regions, psm, lang, words=False):
+        """
+        Run OCR on image regions in a worker thread.
+
+        Args:
+            regions (list): PIL images to read.
+            psm (int): Tesseract page segmentation mode.
+            lang (str): Tesseract language(s).
+            words (bool): Read positioned words instead of plain text.
+
+        Returns:
+            tuple: (text or words of each region, seconds spent in OCR).
+        """
+        started = time.perf_counter()
+        engine = self._engine(lang)
+        read = engine.image_to_words if words else engine.image_to_text
+        results = [read(region, psm) for region in regions]
+        return results, time.perf_counter() - started
+
+    def profile(self, name=None):
+        """The OCR profile of a name, or the default one for unknown names"""
+        return OCR_PROFILES.get(name, self.default_profile)
+
+    def capture(self, profile=None):
+        """
+        Grab the screen and prepare it for OCR.
+
+        Args:
+            profile (OcrProfile, optional): Preprocessing profile; the
+                default profile if omitted.
+
+        Returns:
+            tuple: (capture timestamp, preprocessed PIL image).
+        """
+        started = time.perf_counter()
+        image = self.capture_screen()
+        timestamp = datetime.now()
+        lap = self.stage_stats.lap('capture', started)
+        image = preprocess(image, profile or self.default_profile)
+        self.stage_stats.lap('preprocess', lap)
+        return timestamp, image
+
+    def fingerprint(self, image):
+        """Perceptual hash of a capture"""
+        started = time.perf_counter()
+        value = dhash(image)
+        self.stage_stats.lap('fingerprint', started)
+        return value
+
+    def is_unchanged(self, fingerprint, previous):
+        """Whether a capture shows the same screen as an earlier fingerprint"""
+        return previous is not None and hamming_distance(fingerprint, previous) <= self.change_threshold
+
+    def submit_unchanged(self, document, same_as):
+        """
+        Store a capture that matches an earlier one without reading it.
+
+        Refused while the earlier capture is still waiting for OCR, or once
+        it was coalesced away, since it may never get any text to refer to;
+        the caller reads the capture instead.
+
+        Args:
+            document (dict): Screenshot document.
+            same_as: ``_id`` of the screenshot whose text applies.
+
+        Returns:
+            bool: True if the document was stored as unchanged.
+        """
+        with self._cond:
+            if same_as in self._coalesced or any(
+                    entry[1].get('_id') == same_as for entry in self._pending):
+                self.stage_stats.count('unchanged_refused')
+                return False
+            # Queued under the same lock, so the capture cannot be coalesced in between
+            document['unchanged'] = True
+            document['same_as'] = same_as
+            self.stage_stats.count('unchanged')
+            return self.submit(document)
+
+    def plan_tiles(self, tile_cache, image):
+        """Find the tiles of a capture that changed since they were last read"""
+        started = time.perf_counter()
+        plan = tile_cache.plan(image)
+        self.stage_stats.lap('tile_diff', started)
+        return plan
+
+    def submit(self, document, image=None, plan=None, profile=None):
+        """
+        Queue a screenshot document for OCR and insertion.
+
+        Args:
+            document (dict): Screenshot document; its 'text' is filled in.
+            image (PIL.Image.Image, optional): Capture to read; without one
+                the document is stored with an empty text.
+            plan (TilePlan, optional): Read only what the plan says changed
+                and record it in the document's 'tiles'; the whole capture
+                is read otherwise. A plan with nothing dirty marks the
+                document unchanged; it refers to the identical capture read
+                last through 'same_as', or gets the cached text if there is
+                none.
+            profile (OcrProfile, optional): Profile the capture was prepared
+                with; sets how Tesseract reads it.
+
+        Returns:
+            bool: False if the capture was dropped because OCR is behind.
+        """
+        profile = profile or self.default_profile
+        if image is not None:
+            document['ocr_profile'] = profile.name
+        if plan is not None and not plan.dirty:
+            # Every tile is cached: the text is known without OCR
+            if plan.same_as is not None:
+                document['same_as'] = plan.same_as
+            else:
+                document['text'] = plan.complete([])
+            document['tiles'] = {'grid': list(plan.grid), 'changed': []}
+            document['unchanged'] = True
+            self.stage_stats.count('unchanged')
+            image = None
+
+        with self._cond:
+            if self._stopped:
+                return False
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="ocr-dispatcher", daemon=True)
+                self._dispatcher.start()
+
+            if image is not None and len(self._pending) >= self.max_pending:
+                if self.policy == DROP:
+                    self.stage_stats.count('dropped')
+                    return False
+                # Keep the record, so later captures may point at it
+                stale_seq, stale_document = self._pending.popleft()[:2]
+                stale_document['text'] = ""
+                stale_document['ocr_skipped'] = 'coalesced'
+                if '_id' in stale_document:
+                    self._coalesced.append(stale_document['_id'])
+                self._add_result(stale_seq, stale_document)
+                self.stage_stats.count('coalesced')
+
+            seq = self._next_seq
+            self._next_seq += 1
+            self._outstanding.add(seq)
+            if image is None:
+                document.setdefault('text', "")
+                self._add_result(seq, document)
+            else:
+                self._pending.append((seq, document, image, plan, profile, time.perf_counter()))
+            self.stage_stats.count('captures')
+            self._cond.notify_all()
+        return True
+
+    def _add_result(self, seq, document):
+        """Hold a finished document for the next insert; caller holds the lock"""
+        if not self._results:
+            self._results_since = time.monotonic()
+        self._results.append((seq, document))
+
+    def _finish(self, seq, document, plan, future):
+        """Pool callback: attach the text and hold the document for insertion"""
+        try:
+            texts, seconds = future.result()
+            self.stage_stats.record('ocr', seconds)
+            if plan is None:
+                text = texts[0]
+            else:
+                text = plan.complete(texts, document.get('_id'))
+                document['tiles'] = {
+                    'grid': list(plan.grid),
+                    'changed': plan.changed,
+                    'whole_frame': plan.whole_frame
+                }
+                if plan.whole_frame:
+                    self.stage_stats.count('whole_frame_reads')
+                else:
+                    self.stage_stats.count('tiles_read', len(plan.dirty))
+                    self.stage_stats.count('tiles_reused', len(plan.known))
+        except Exception as e:
+            print(f"OCR error: {e}")
+            self.stage_stats.count('ocr_errors')
+            text = ""
+        document['text'] = text
+        with self._cond:
+            self._running -= 1
+            self._add_result(seq, document)
+            self._cond.notify_all()
+
+    def _insert_due(self):
+        """Whether the finished documents should be inserted now; caller holds the lock"""
+        if not self._results:
+            return False
+        return (self._flush_waiters or self._stopped
+                or len(self._results) >= self.batch_size
+                or time.monotonic() - self._results_since >= self.flush_interval)
+
+    def _dispatch_loop(self):
+        """Feed waiting captures to the pool and insert finished documents in batches"""
+        slots = self.workers
+        while True:
+            jobs = []
+            batch = []
+            with self._cond:
+                while not (self._pending and self._running < slots) and not self._insert_due():
+                    if self._stopped and not self._pending and not self._running:
+                        return
+                    timeout = None
+                    if self._results:
+                        timeout = max(0.0, self._results_since + self.flush_interval - time.monotonic())
+                    self._cond.wait(timeout)
+
+                while self._pending and self._running < slots:
+                    jobs.append(self._pending.popleft())
+                    self._running += 1
+                if self._insert_due():
+                    batch, self._results = self._results, []
+
+            for seq, document, image, plan, profile, queued_at in jobs:
+                self.stage_stats.record('queue_wait', time.perf_counter() - queued_at)
+                self._start_ocr(seq, document, image, plan, profile)
+
+            if batch:
+                self._insert_batch(batch)
+
+    def _start_ocr(self, seq, document, image, plan, profile):
+        """Hand a capture to the pool"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='ocr')
+        regions = plan.regions(image) if plan is not None else [image]
+        future = self._pool.submit(
+            self._read_regions, regions, profile.psm, profile.lang, plan is not None
+        )
+        future.add_done_callback(partial(self._finish, seq, document, plan))
+
+    def _insert_batch(self, batch):
+        """Store finished documents with one insert_many call"""
+        started = time.perf_counter()
+        try:
+            self.insert_many([document for _, document in batch])
+            self.stage_stats.count('inserted', len(batch))
+        except Exception as e:
+            print(f"Screenshot insert error: {e}")
+            self.stage_stats.count('insert_errors', len(batch))
+        self.stage_stats.lap('insert', started)
+        with self._cond:
+            for seq, _ in batch:
+                self._outstanding.discard(seq)
+            self._cond.notify_all()
+
+    def flush(self, timeout):
+        """
+        Wait until every capture submitted so far has been read and inserted.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if nothing submitted before the call is outstanding.
+        """
+        with self._cond:
+            target = self._next_seq
+            self._flush_waiters += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(
+                    lambda: not any(seq < target for seq in self._outstanding),
+                    timeout
+                )
+            finally:
+                self._flush_waiters -= 1
+
+    def pending(self):
+        """Number of captures waiting, being read or waiting for insertion"""
+        with self._cond:
+            return len(self._outstanding)
+
+    def stats(self):
+        """Get per-stage latency histograms and queue counters"""
+        with self._cond:
+            queue = {
+                'waiting': len(self._pending),
+                'running': self._running,
+                'unsaved': len(self._results),
+                'max_pending': self.max_pending,
+                'policy': self.policy,
+                'workers': self.workers
+            }
+        return dict(
+            self.stage_stats.snapshot(),
+            queue=queue,
+            backend='tesserocr' if tesserocr is not None else 'pytesseract'
+        )
+
+    def close(self, timeout=10):
+        """
+        Read and insert what is queued, then stop the dispatcher and pool
+        and free the OCR engines.
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            dispatcher = self._dispatcher
+        if dispatcher is not None:
+            dispatcher.join(timeout)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        with self._engines_lock:
+            engines, self._engines = self._engines, []
+        for engine in engines:
+            engine.close()
+
+
+if __name__ == '__main__':
+    # Profile benchmark: python ocr_pipeline.py --benchmark screen1.png screen2.png
+    parser = argparse.ArgumentParser(description="Compare OCR profiles on sample screenshots")
+    parser.add_argument('--benchmark', nargs='+', metavar='IMAGE', required=True,
+                        help="screenshots to read with every profile")
+    parser.add_argument('--profiles', nargs='+', choices=sorted(OCR_PROFILES), default=list(OCR_PROFILES),
+                        help="profiles to compare (default: all)")
+    parser.add_argument('--rounds', type=int, default=1, help="reads per image and profile")
+    args = parser.parse_args()
+
+    samples = []
+    for path in args.benchmark:
+        with Image.open(path) as sample:
+            samples.append(sample.convert('RGB'))
+
+    engines = {}
+    results = []
+    for name in args.profiles:
+        profile = OCR_PROFILES[name]
+        engine = engines.get(profile.lang)
+        if engine is None:
+            engine = engines[profile.lang] = OcrEngine(profile.lang)
+        preprocess_seconds = ocr_seconds = 0.0
+        characters = 0
+        for _ in range(args.rounds):
+            for sample in samples:
+                started = time.perf_counter()
+                prepared = preprocess(sample, profile)
+                lap = time.perf_counter()
+                text = engine.image_to_text(prepared, profile.psm)
+                preprocess_seconds += lap - started
+                ocr_seconds += time.perf_counter() - lap
+                characters += sum(1 for character in text if not character.isspace())
+        reads = args.rounds * len(samples)
+        results.append((name, preprocess_seconds / reads, ocr_seconds / reads, characters / reads))
+
+    baseline_seconds = results[0][1] + results[0][2]
+    baseline_characters = results[0][3]
+    print(f"{len(samples)} image(s), {args.rounds} round(s), backend: {next(iter(engines.values())).backend}")
+    print(f"{'profile':<10} {'prep ms':>9} {'ocr ms':>9} {'chars':>8} {'speedup':>8} {'yield':>7}")
+    for name, preprocess_seconds, ocr_seconds, characters in results:
+        speedup = baseline_seconds / (preprocess_seconds + ocr_seconds) if preprocess_seconds + ocr_seconds else 0.0
+        char_yield = characters / baseline_characters if baseline_characters else 0.0
+        print(f"{name:<10} {preprocess_seconds * 1000:9.1f} {ocr_seconds * 1000:9.1f} "
+              f"{characters:8.0f} {speedup:7.2f}x {char_yield:6.0%}")
+    for engine in engines.values():
+        engine.close()
@@ -19,6 +19,7 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import re
 import os
+from segment_log import SegmentLog
 from datetime import datetime, timedelta
 
 class ReportGenerator:
@@ -182,8 +183,49 @@ class ReportGenerator:
         
         return sections
 
-    def generate_report_to_buffer(self, session_data, summary, buffer):
-        """Generate a PDF report and write it to a buffer"""
+    def _create_timeline_table(self, segments, start_time):
+        """
+        Build an hourly activity timeline table from a stream of segments.
+
+        Returns None if the stream is empty.
+        """
+        buckets = SegmentLog.bucket_totals(segments, bucket_seconds=3600)
+        if not buckets:
+            return None
+
+        timeline_data = [['Hour', 'Productive', 'Unproductive', 'Pending', 'Idle']]
+        for bucket in buckets:
+            hour_start = start_time + timedelta(seconds=bucket['offset'])
+            timeline_data.append([
+                hour_start.strftime('%H:%M'),
+                f"{bucket['productive'] // 60}m",
+                f"{bucket['unproductive'] // 60}m",
+                f"{bucket['pending'] // 60}m",
+                f"{bucket['idle'] // 60}m"
+            ])
+
+        timeline_table = Table(timeline_data, colWidths=[1.2*inch, 1.2*inch, 1.2*inch, 1.2*inch, 1.2*inch])
+        timeline_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), self.primary_color),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, self.border_color),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [self.light_bg, colors.white]),
+        ]))
+        return timeline_table
+
+    def generate_report_to_buffer(self, session_data, summary, buffer, segments=None):
+        """
+        Generate a PDF report and write it to a buffer.
+
+        ``segments`` is an optional stream of (start, duration, title, verdict)
+        tuples from the session's SegmentLog, used for the activity timeline.
+        """
         try:
             doc = SimpleDocTemplate(
                 buffer,
@@ -293,6 +335,14 @@ class ReportGenerator:
             ]))
             story.append(app_table)
             story.append(Spacer(1, 20))
+
+            # Activity Timeline
+            if segments is not None:
+                timeline_table = self._create_timeline_table(segments, session_data['start_time'])
+                if timeline_table is not None:
+                    story.append(Paragraph("Activity Timeline", self.styles['SectionHeader']))
+                    story.append(timeline_table)
+                    story.append(Spacer(1, 20))
             
             # AI Summary Section
             story.append(Paragraph("AI Analysis Summary", self.styles['SectionHeader']))
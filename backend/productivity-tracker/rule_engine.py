@@ -0,0 +1,274 @@
+import re
+import time
+from collections import namedtuple
+from ttl_cache import LRUTTLCache
+
+# Title rules in the order AIClassifier checks them. The first rule that
+# matches a window title decides its verdict.
+PRODUCTIVE_DOMAINS = [
+    r'github\.com',
+    r'gitlab\.com',
+    r'bitbucket\.org',
+    r'stackoverflow\.com',
+    r'docs\.python\.org',
+    r'developer\.mozilla\.org',
+    r'w3schools\.com',
+    r'medium\.com',
+    r'dev\.to',
+    r'learn\.microsoft\.com',
+    r'aws\.amazon\.com',
+    r'cloud\.google\.com',
+    r'docs\.aws\.amazon\.com',
+    r'azure\.microsoft\.com',
+    r'jira\.com',
+    r'atlassian\.com',
+    r'codepen\.io',
+    r'replit\.com',
+    r'kaggle\.com',
+    r'freecodecamp\.org',
+    r'udemy\.com',
+    r'coursera\.org',
+    r'edx\.org',
+    r'linkedin\.com/learning',
+    r'pluralsight\.com',
+    r'educative\.io'
+]
+
+UNPRODUCTIVE_DOMAINS = [
+    r'facebook\.com',
+    r'instagram\.com',
+    r'twitter\.com',
+    r'reddit\.com',
+    r'netflix\.com',
+    r'hulu\.com',
+    r'disney\.com',
+    r'disneyplus\.com',
+    r'youtube\.com/(?!.*tutorial|.*learn|.*education|.*programming|.*code|.*development)',
+    r'twitch\.tv',
+    r'tiktok\.com',
+    r'pinterest\.com',
+    r'snapchat\.com',
+    r'tumblr\.com',
+    r'9gag\.com',
+    r'buzzfeed\.com',
+    r'espn\.com',
+    r'nfl\.com',
+    r'nba\.com',
+    r'mlb\.com'
+]
+
+PRODUCTIVE_ACTIVITIES = [
+    r'\.py\b',  # Python files
+    r'\.js\b',  # JavaScript files
+    r'\.html\b',  # HTML files
+    r'\.css\b',  # CSS files
+    r'\.java\b',  # Java files
+    r'\.cpp\b|\.c\b|\.h\b',  # C/C++ files
+    r'\.php\b',  # PHP files
+    r'\.sql\b',  # SQL files
+    r'\.md\b',  # Markdown files
+    r'\.json\b',  # JSON files
+    r'\.xml\b',  # XML files
+    r'\.yml\b|\.yaml\b',  # YAML files
+    r'\.sh\b|\.bat\b|\.ps1\b',  # Shell scripts
+    r'pull request|PR #|issue #|commit',  # Git operations
+    r'debug|breakpoint|console|terminal',  # Development activities
+    r'localhost|127\.0\.0\.1|0\.0\.0\.0',  # Local development
+    r'ssh:|ftp:|sftp:',  # Remote connections
+    r'database|db connection|query',  # Database work
+    r'meeting notes|agenda|minutes',  # Meeting documentation
+    r'report|analysis|dashboard',  # Business activities
+    r'project plan|roadmap|sprint',  # Project management
+    r'presentation|slides|deck',  # Presentations
+    r'document|specification|requirements',  # Documentation
+    r'learning|tutorial|course|training',  # Learning activities
+]
+
+PRODUCTIVE_KEYWORDS = [
+    'work', 'project', 'task', 'meeting', 'email', 'code', 'develop', 'write', 'edit',
+    'design', 'create', 'build', 'research', 'learn', 'study', 'review', 'analyse', 'analyze',
+    'report', 'document', 'presentation', 'client', 'customer', 'planning', 'debug',
+    'test', 'implement', 'deploy', 'database', 'server', 'api', 'cloud', 'git', 'terminal',
+    'console', 'editor', 'ide', 'notebook', 'programming', 'development'
+]
+
+# Memo marker for "not looked up yet"; None means no rule matched
+_NO_RESULT = object()
+
+# A matched title rule: rule set it came from, its pattern and its verdict
+Rule = namedtuple('Rule', ['kind', 'pattern', 'productive'])
+
+
+class RuleEngine:
+    """
+    Title rules compiled into combined regular expressions.
+
+    Consecutive rule sets with the same verdict are joined into one
+    alternation with a named group per rule, so a title is scanned at most
+    once per verdict tier instead of once per rule. The scan uses a plain
+    alternation; only on a hit is the same alternation with a named group per
+    rule re-matched at the hit position, and ``match.lastgroup`` names the
+    rule that fired. Literal keyword sets share a single word-bounded group
+    and the keyword is looked up from the matched text. Tiers are
+    searched in priority order, which gives the same verdicts as checking
+    the rules one by one. Results are memoized per title in a bounded LRU
+    cache.
+    """
+    def __init__(self, rule_sets, memo_size=4096):
+        """
+        Compile the rule sets.
+
+        Args:
+            rule_sets (list): (kind, patterns, productive) tuples in priority
+                order, with an optional fourth ``literal`` flag. Patterns are
+                regular expressions matched case insensitively; literal sets
+                hold plain words matched as whole words.
+            memo_size (int): Number of titles whose result is remembered.
+        """
+        self.rules = []
+        self._literals = {}  # group name -> {casefolded word: rule index}
+        self._tiers = []
+        tier_groups = []
+        tier_verdict = None
+        for rule_set in rule_sets:
+            kind, patterns, productive = rule_set[:3]
+            literal = len(rule_set) > 3 and rule_set[3]
+            if tier_groups and productive != tier_verdict:
+                self._tiers.append(self._compile_tier(tier_groups))
+                tier_groups = []
+            tier_verdict = productive
+
+            if literal:
+                name = f"l{len(self._literals)}"
+                words = self._literals[name] = {}
+                for word in patterns:
+                    words.setdefault(word.casefold(), len(self.rules))
+                    self.rules.append(Rule(kind, word, productive))
+                words_pattern = '|'.join(re.escape(word) for word in patterns)
+                tier_groups.append((name, rf"\b(?:{words_pattern})\b"))
+            else:
+                for pattern in patterns:
+                    tier_groups.append((f"r{len(self.rules)}", pattern))
+                    self.rules.append(Rule(kind, pattern, productive))
+        if tier_groups:
+            self._tiers.append(self._compile_tier(tier_groups))
+
+        self._memo = LRUTTLCache(max_entries=memo_size)
+
+    @staticmethod
+    def _compile_tier(groups):
+        """Compile a tier as (scan regex, regex with a named group per rule)"""
+        scan = re.compile('|'.join(f"(?:{pattern})" for _, pattern in groups), re.IGNORECASE)
+        named = re.compile('|'.join(f"(?P<{name}>{pattern})" for name, pattern in groups), re.IGNORECASE)
+        return scan, named
+
+    @classmethod
+    def from_classifier_rules(cls, productive_domains, unproductive_domains,
+                              activities=PRODUCTIVE_ACTIVITIES, keywords=PRODUCTIVE_KEYWORDS,
+                              memo_size=4096):
+        """Build the engine in the order AIClassifier applies its title strategies"""
+        return cls([
+            ('productive_domain', productive_domains, True),
+            ('unproductive_domain', unproductive_domains, False),
+            ('activity', activities, True),
+            ('keyword', keywords, True, True)
+        ], memo_size=memo_size)
+
+    def match(self, title):
+        """
+        Find the rule that decides a window title.
+
+        Args:
+            title (str): Window title.
+
+        Returns:
+            Rule or None: A matching rule of the highest priority tier.
+        """
+        rule = self._memo.get(title, _NO_RESULT)
+        if rule is not _NO_RESULT:
+            return rule
+
+        rule = None
+        for scan, named in self._tiers:
+            found = scan.search(title)
+            if found:
+                found = named.match(title, found.start())
+                group = found.lastgroup
+                if group[0] == 'l':
+                    index = self._literals[group][found.group(group).casefold()]
+                else:
+                    index = int(group[1:])
+                rule = self.rules[index]
+                break
+
+        self._memo.put(title, rule)
+        return rule
+
+    def clear(self):
+        """Forget memoized results"""
+        self._memo.clear()
+
+    def stats(self):
+        """Get memo counters"""
+        return dict(self._memo.stats(), rules=len(self.rules))
+
+
+def _legacy_match(rule_sets, title):
+    """Reference: one re.search per rule, the way the classifier used to check titles"""
+    for kind, patterns, productive in rule_sets:
+        for pattern in patterns:
+            if re.search(pattern, title, re.IGNORECASE):
+                return Rule(kind, pattern, productive)
+    return None
+
+
+if __name__ == '__main__':
+    # Microbenchmark: python rule_engine.py
+    titles = [
+        "main.py - productivity-tracker - Visual Studio Code",
+        "Pull Request #42 · org/repo - github.com - Google Chrome",
+        "r/programming - reddit.com - Mozilla Firefox",
+        "Funny cats compilation - youtube.com/watch - Google Chrome",
+        "Python tutorial for beginners - youtube.com/watch - Google Chrome",
+        "Quarterly report draft - Word",
+        "Inbox (3) - personal mail",
+        "Untitled - Notepad",
+        "Spotify Premium",
+        "New Tab - Google Chrome",
+    ]
+    engine = RuleEngine.from_classifier_rules(PRODUCTIVE_DOMAINS, UNPRODUCTIVE_DOMAINS)
+    legacy_sets = [
+        ('productive_domain', PRODUCTIVE_DOMAINS, True),
+        ('unproductive_domain', UNPRODUCTIVE_DOMAINS, False),
+        ('activity', PRODUCTIVE_ACTIVITIES, True),
+        ('keyword', [r'\b' + re.escape(keyword) + r'\b' for keyword in PRODUCTIVE_KEYWORDS], True)
+    ]
+
+    for title in titles:
+        expected = _legacy_match(legacy_sets, title)
+        engine.clear()
+        actual = engine.match(title)
+        assert (expected and expected.productive) == (actual and actual.productive), title
+        print(f"{str(actual.productive if actual else None):>5}  {title}")
+
+    rounds = 2000
+
+    def timed(function):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for title in titles:
+                function(title)
+        return (time.perf_counter() - started) / (rounds * len(titles)) * 1_000_000
+
+    legacy_us = timed(lambda title: _legacy_match(legacy_sets, title))
+
+    def uncached(title):
+        engine.clear()
+        return engine.match(title)
+
+    compiled_us = timed(uncached)
+    memo_us = timed(engine.match)
+
+    print(f"\nlegacy loop:   {legacy_us:8.2f} us/title")
+    print(f"compiled scan: {compiled_us:8.2f} us/title")
+    print(f"memoized:      {memo_us:8.2f} us/title")
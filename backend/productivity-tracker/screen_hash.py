@@ -0,0 +1,29 @@
+import numpy as np
+from PIL import Image
+
+
+def dhash(image, hash_size=16):
+    """
+    Perceptual difference hash of an image.
+
+    The image is shrunk to (hash_size + 1) x hash_size grayscale pixels and
+    every bit records whether a pixel is brighter than its left neighbour,
+    so the hash survives small rendering noise but changes when content
+    moves or text appears.
+
+    Args:
+        image (PIL.Image.Image): Image to hash.
+        hash_size (int): Rows of the hash; the hash has hash_size ** 2 bits.
+
+    Returns:
+        int: The hash.
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(first, second):
+    """Number of bits two hashes differ in"""
+    return bin(first ^ second).count('1')
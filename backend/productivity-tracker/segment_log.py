@@ -0,0 +1,239 @@
+import sys
+from array import array
+from bson.binary import Binary
+
+# Verdict codes stored per segment
+VERDICT_UNPRODUCTIVE = 0
+VERDICT_PRODUCTIVE = 1
+VERDICT_PENDING = 2
+VERDICT_IDLE = 3
+
+# Column layout of a segment: (start offset, duration, window id, verdict)
+_COLUMNS = (('starts', 'I'), ('durations', 'I'), ('window_ids', 'I'), ('verdicts', 'B'))
+
+
+def verdict_code(is_productive):
+    """Map a classification result (True/False/None) to a verdict code"""
+    if is_productive is None:
+        return VERDICT_PENDING
+    return VERDICT_PRODUCTIVE if is_productive else VERDICT_UNPRODUCTIVE
+
+
+class SegmentLog:
+    """
+    Compact, array-backed timeline of a tracking session.
+
+    Each segment is stored column-wise in ``array`` buffers as
+    (start offset in seconds, duration in seconds, window id, verdict), with
+    window titles interned once in a shared title table. Segments are
+    persisted as binary chunks so a full-day timeline only takes a few KB.
+    """
+    def __init__(self):
+        """Initialize an empty segment log"""
+        self.titles = []
+        self._title_ids = {}
+        self.starts = array('I')
+        self.durations = array('I')
+        self.window_ids = array('I')
+        self.verdicts = array('B')
+
+        # Persistence cursor
+        self._persisted_count = 0
+        self._persisted_titles = 0
+        self._chunk_index = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def intern(self, title):
+        """
+        Get the id of a window title, adding it to the title table if needed.
+
+        Args:
+            title (str): Window label.
+
+        Returns:
+            int: Index of the title in the title table.
+        """
+        title_id = self._title_ids.get(title)
+        if title_id is None:
+            title_id = len(self.titles)
+            self.titles.append(title)
+            self._title_ids[title] = title_id
+        return title_id
+
+    def append(self, start_offset, duration, window, is_productive, idle=False):
+        """
+        Record time spent in a window.
+
+        Contiguous time in the same window with the same verdict extends the
+        previous segment instead of adding a new one.
+
+        Args:
+            start_offset (int): Seconds since the session started.
+            duration (int): Length of the segment in seconds.
+            window (str): Window label.
+            is_productive (bool or None): Verdict, or None while pending.
+            idle (bool): Whether the user was idle during the segment.
+        """
+        if duration <= 0:
+            return
+
+        start_offset = max(0, int(start_offset))
+        window_id = self.intern(window)
+        verdict = VERDICT_IDLE if idle else verdict_code(is_productive)
+
+        last = len(self.starts) - 1
+        if (last >= self._persisted_count
+                and self.window_ids[last] == window_id
+                and self.verdicts[last] == verdict
+                and self.starts[last] + self.durations[last] == start_offset):
+            self.durations[last] += duration
+            return
+
+        self.starts.append(start_offset)
+        self.durations.append(duration)
+        self.window_ids.append(window_id)
+        self.verdicts.append(verdict)
+
+    def resolve(self, window, is_productive):
+        """
+        Replace the pending verdict of a window's unpersisted segments.
+
+        Args:
+            window (str): Window label.
+            is_productive (bool): Verdict that arrived for the window.
+        """
+        window_id = self._title_ids.get(window)
+        if window_id is None:
+            return
+        verdict = verdict_code(is_productive)
+        for index in range(self._persisted_count, len(self.starts)):
+            if self.window_ids[index] == window_id and self.verdicts[index] == VERDICT_PENDING:
+                self.verdicts[index] = verdict
+
+    def iter_segments(self):
+        """
+        Stream the segments held in memory.
+
+        Yields:
+            tuple: (start offset, duration, window title, verdict code).
+        """
+        for index in range(len(self.starts)):
+            yield (
+                self.starts[index],
+                self.durations[index],
+                self.titles[self.window_ids[index]],
+                self.verdicts[index]
+            )
+
+    def unpersisted_count(self):
+        """Number of segments that have not been written to a chunk yet"""
+        return len(self.starts) - self._persisted_count
+
+    def take_chunk(self, final=False):
+        """
+        Pack the segments that are ready for persistence into a chunk.
+
+        Segments are only persisted up to the first one with a pending
+        verdict, so verdicts can still be resolved in memory; ``final``
+        persists everything that is left.
+
+        Args:
+            final (bool): Whether this is the last chunk of the session.
+
+        Returns:
+            dict or None: Chunk fields, or None if there is nothing to write.
+        """
+        end = len(self.starts)
+        if not final:
+            for index in range(self._persisted_count, end):
+                if self.verdicts[index] == VERDICT_PENDING:
+                    end = index
+                    break
+
+        begin = self._persisted_count
+        if end <= begin:
+            return None
+
+        chunk = {
+            'chunk': self._chunk_index,
+            'count': end - begin,
+            'title_base': self._persisted_titles,
+            'titles': self.titles[self._persisted_titles:],
+            'byte_order': sys.byteorder
+        }
+        for name, _ in _COLUMNS:
+            chunk[name] = Binary(getattr(self, name)[begin:end].tobytes())
+
+        self._persisted_count = end
+        self._persisted_titles = len(self.titles)
+        self._chunk_index += 1
+        return chunk
+
+    @staticmethod
+    def iter_chunk_documents(documents):
+        """
+        Stream segments out of persisted chunk documents.
+
+        Args:
+            documents (iterable): Chunk documents in chunk order.
+
+        Yields:
+            tuple: (start offset, duration, window title, verdict code).
+        """
+        titles = []
+        for doc in documents:
+            titles[doc['title_base']:] = doc.get('titles', [])
+
+            columns = []
+            for name, typecode in _COLUMNS:
+                column = array(typecode)
+                column.frombytes(bytes(doc[name]))
+                if doc.get('byte_order', sys.byteorder) != sys.byteorder:
+                    column.byteswap()
+                columns.append(column)
+
+            starts, durations, window_ids, verdicts = columns
+            for index in range(doc['count']):
+                yield starts[index], durations[index], titles[window_ids[index]], verdicts[index]
+
+    @staticmethod
+    def bucket_totals(segments, bucket_seconds=60):
+        """
+        Fold a stream of segments into fixed-size timeline buckets.
+
+        Args:
+            segments (iterable): (start, duration, title, verdict) tuples.
+            bucket_seconds (int): Width of each bucket in seconds.
+
+        Returns:
+            list: One dict per bucket with productive, unproductive, pending
+            and idle seconds, in timeline order.
+        """
+        buckets = []
+        keys = {
+            VERDICT_PRODUCTIVE: 'productive',
+            VERDICT_UNPRODUCTIVE: 'unproductive',
+            VERDICT_PENDING: 'pending',
+            VERDICT_IDLE: 'idle'
+        }
+        for start, duration, _, verdict in segments:
+            key = keys.get(verdict, 'unproductive')
+            position = start
+            remaining = duration
+            while remaining > 0:
+                index = position // bucket_seconds
+                while len(buckets) <= index:
+                    buckets.append({
+                        'offset': len(buckets) * bucket_seconds,
+                        'productive': 0,
+                        'unproductive': 0,
+                        'pending': 0,
+                        'idle': 0
+                    })
+                take = min(remaining, (index + 1) * bucket_seconds - position)
+                buckets[index][key] += take
+                position += take
+                remaining -= take
+        return buckets
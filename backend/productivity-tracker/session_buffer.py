@@ -0,0 +1,257 @@
+import time
+import threading
+
+# MongoDB field names may not contain '.' or start with '$', so window
+# titles are escaped with their full-width equivalents before being used
+# as keys inside update paths.
+_KEY_ESCAPES = (('.', '．'), ('$', '＄'))
+
+
+def encode_window_key(window):
+    """Escape a window title so it can be used as a MongoDB field name"""
+    for char, escaped in _KEY_ESCAPES:
+        window = window.replace(char, escaped)
+    return window
+
+
+def decode_window_key(key):
+    """Reverse encode_window_key for titles read back from MongoDB"""
+    for char, escaped in _KEY_ESCAPES:
+        key = key.replace(escaped, char)
+    return key
+
+
+class SessionWriteBuffer:
+    """
+    Write-behind buffer for session counters.
+
+    Collects per-window time deltas in memory and flushes them to the
+    session document as a single ``$inc`` update, so the cost of a write
+    depends on what changed since the last flush rather than on the total
+    number of windows seen in the session.
+    """
+    def __init__(self, collection, session_id, flush_interval=30, max_pending_windows=50, journal=None):
+        """
+        Initialize the buffer for one session document.
+
+        Args:
+            collection: MongoDB collection holding the session documents.
+            session_id (ObjectId): ID of the session document to update.
+            flush_interval (float): Seconds between time-based flushes.
+            max_pending_windows (int): Number of distinct buffered windows that
+                triggers a flush before the interval elapses.
+            journal (SessionJournal, optional): Journal that flushes are
+                appended to instead of writing to MongoDB directly.
+        """
+        self.collection = collection
+        self.journal = journal
+        self.session_id = session_id
+        self.flush_interval = flush_interval
+        self.max_pending_windows = max_pending_windows
+
+        self._lock = threading.Lock()
+        self._productive_delta = 0
+        self._unproductive_delta = 0
+        self._pending_delta = 0
+        self._window_deltas = {}
+        self._last_flush = time.time()
+
+        # Flush counters
+        self.flush_count = 0
+        self.failed_flushes = 0
+        self.last_flush_size = 0
+        self.total_flushed_fields = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+        self.total_flush_latency = 0.0
+
+    def record(self, window, is_productive, active_seconds=0, idle_seconds=0):
+        """
+        Buffer time spent in a window.
+
+        Args:
+            window (str): Window label.
+            is_productive (bool or None): Classification of the window, or
+                None while its verdict is pending.
+            active_seconds (int): Active seconds to add.
+            idle_seconds (int): Idle seconds to add.
+        """
+        with self._lock:
+            if is_productive is None:
+                self._pending_delta += active_seconds
+            elif is_productive:
+                self._productive_delta += active_seconds
+            else:
+                self._unproductive_delta += active_seconds
+
+            delta = self._window_deltas.setdefault(window, {
+                'productive': is_productive,
+                'active_time': 0,
+                'idle_time': 0
+            })
+            delta['productive'] = is_productive
+            delta['active_time'] += active_seconds
+            delta['idle_time'] += idle_seconds
+
+    def reattribute(self, window, is_productive, seconds):
+        """
+        Move time recorded as pending to the window's final verdict.
+
+        Args:
+            window (str): Window label.
+            is_productive (bool): Verdict that arrived for the window.
+            seconds (int): Pending seconds previously recorded for the window.
+        """
+        with self._lock:
+            self._pending_delta -= seconds
+            if is_productive:
+                self._productive_delta += seconds
+            else:
+                self._unproductive_delta += seconds
+
+            delta = self._window_deltas.setdefault(window, {
+                'productive': is_productive,
+                'active_time': 0,
+                'idle_time': 0
+            })
+            delta['productive'] = is_productive
+
+    def has_pending(self):
+        """Check whether there are buffered deltas waiting to be written"""
+        return bool(
+            self._window_deltas or self._productive_delta
+            or self._unproductive_delta or self._pending_delta
+        )
+
+    def should_flush(self, now=None):
+        """
+        Check whether the buffer is due for a flush.
+
+        Args:
+            now (float, optional): Current time as returned by time.time().
+
+        Returns:
+            bool: True if the interval elapsed or the size threshold is reached.
+        """
+        if not self.has_pending():
+            return False
+        if len(self._window_deltas) >= self.max_pending_windows:
+            return True
+        now = now if now is not None else time.time()
+        return now - self._last_flush >= self.flush_interval
+
+    def _take_pending(self):
+        """Swap out the buffered deltas and return them"""
+        with self._lock:
+            pending = (
+                self._productive_delta, self._unproductive_delta,
+                self._pending_delta, self._window_deltas
+            )
+            self._productive_delta = 0
+            self._unproductive_delta = 0
+            self._pending_delta = 0
+            self._window_deltas = {}
+        return pending
+
+    def _restore_pending(self, productive, unproductive, pending, window_deltas):
+        """Merge deltas from a failed flush back into the buffer"""
+        with self._lock:
+            self._productive_delta += productive
+            self._unproductive_delta += unproductive
+            self._pending_delta += pending
+            for window, delta in window_deltas.items():
+                current = self._window_deltas.setdefault(window, {
+                    'productive': delta['productive'],
+                    'active_time': 0,
+                    'idle_time': 0
+                })
+                current['active_time'] += delta['active_time']
+                current['idle_time'] += delta['idle_time']
+
+    @staticmethod
+    def build_update(productive, unproductive, pending, window_deltas):
+        """
+        Build the MongoDB update document for a set of deltas.
+
+        Returns:
+            dict: Update with ``$inc`` for counters and ``$set`` for verdicts.
+        """
+        increments = {}
+        verdicts = {}
+        if productive:
+            increments['productive_time'] = productive
+        if unproductive:
+            increments['unproductive_time'] = unproductive
+        if pending:
+            increments['pending_time'] = pending
+
+        for window, delta in window_deltas.items():
+            prefix = f"window_details.{encode_window_key(window)}"
+            increments[f"{prefix}.active_time"] = delta['active_time']
+            increments[f"{prefix}.idle_time"] = delta['idle_time']
+            verdicts[f"{prefix}.productive"] = delta['productive']
+
+        update = {}
+        if increments:
+            update['$inc'] = increments
+        if verdicts:
+            update['$set'] = verdicts
+        return update
+
+    def flush(self):
+        """
+        Write buffered deltas to MongoDB (or the journal) as one update.
+
+        Deltas are put back into the buffer if the write fails so that no
+        time is lost; the next flush retries them.
+
+        Returns:
+            bool: False if the write failed, True otherwise.
+        """
+        self._last_flush = time.time()
+        if not self.has_pending():
+            return True
+
+        productive, unproductive, pending, window_deltas = self._take_pending()
+        update = self.build_update(productive, unproductive, pending, window_deltas)
+        size = sum(len(fields) for fields in update.values())
+
+        started = time.perf_counter()
+        try:
+            if self.journal:
+                self.journal.update(self.collection.name, self.session_id, update)
+            else:
+                self.collection.update_one({"_id": self.session_id}, update)
+        except Exception as e:
+            print(f"Session flush error: {e}")
+            self.failed_flushes += 1
+            self._restore_pending(productive, unproductive, pending, window_deltas)
+            return False
+
+        latency = time.perf_counter() - started
+        self.flush_count += 1
+        self.last_flush_size = size
+        self.total_flushed_fields += size
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+        return True
+
+    def stats(self):
+        """
+        Get flush size and latency counters.
+
+        Returns:
+            dict: Flush counters, latencies in milliseconds.
+        """
+        average = self.total_flush_latency / self.flush_count if self.flush_count else 0.0
+        return {
+            'flush_count': self.flush_count,
+            'failed_flushes': self.failed_flushes,
+            'pending_windows': len(self._window_deltas),
+            'last_flush_size': self.last_flush_size,
+            'total_flushed_fields': self.total_flushed_fields,
+            'last_flush_latency_ms': round(self.last_flush_latency * 1000, 3),
+            'avg_flush_latency_ms': round(average * 1000, 3),
+            'max_flush_latency_ms': round(self.max_flush_latency * 1000, 3)
+        }
@@ -0,0 +1,531 @@
+import os
+import glob
+import time
+import uuid
+import threading
+from collections import deque
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Field of journaled documents holding, per writer, the sequence number of
+# the last update applied to them; readers should project it out
+APPLIED_FIELD = '_journal_applied'
+
+
+def _lock_file(path):
+    """
+    Open a lock file and take an exclusive OS lock on it without blocking.
+
+    The lock is released by the OS when the process exits, however it exits.
+
+    Returns:
+        file: The open lock file, or None if another process holds the lock.
+    """
+    handle = open(path, 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+class SessionJournal:
+    """
+    Local append-only journal for MongoDB writes made while tracking.
+
+    Writes are queued in memory and return immediately. A writer thread
+    appends them to a JSON-lines file and fsyncs in batches, and a replayer
+    thread drains the file to MongoDB with ``bulk_write`` whenever the
+    database is reachable. Every record carries its writer's id and a
+    sequence number, and updated documents remember the last number applied
+    per writer in ``APPLIED_FIELD``, so replaying the same record twice has
+    no effect. This keeps sessions intact across database outages and
+    process restarts.
+
+    Every process (e.g. each gunicorn worker) journals to its own file and
+    holds an OS lock on it. On start, journals whose lock is free belong to
+    processes that are gone; their unreplayed records are taken over.
+
+    Records MongoDB refuses for good (e.g. a duplicate key or a failed
+    validation) are moved to a ``.rejected`` file so they cannot hold up
+    the records behind them.
+    """
+    def __init__(self, db, path, fsync_interval=1.0, replay_interval=2.0, batch_size=500):
+        """
+        Initialize the journal and start its background threads.
+
+        Args:
+            db: MongoDB database the journaled writes target.
+            path (str): Base journal path. This process journals to
+                ``<name>.<pid><ext>`` next to it, with ``.ckpt`` and
+                ``.lock`` files alongside.
+            fsync_interval (float): Seconds between batched fsyncs.
+            replay_interval (float): Seconds between replay attempts.
+            batch_size (int): Maximum number of records per bulk_write.
+        """
+        self.db = db
+        self.base_path = path
+        root, ext = os.path.splitext(path)
+        self.path = f"{root}.{os.getpid()}{ext}"
+        self.checkpoint_path = f"{self.path}.ckpt"
+        self.fsync_interval = fsync_interval
+        self.replay_interval = replay_interval
+        self.batch_size = batch_size
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._queue = deque()
+        self.writer_id = uuid.uuid4().hex
+        self._sequence = 0
+        self._queue_ready = threading.Condition()
+        self._file_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._replayed = threading.Condition()
+
+        # Journal counters
+        self.replayed = 0
+        self.skipped = 0  # Corrupt or rejected records passed over by the replayer
+        self.replay_failures = 0
+        self.last_replay_error = None
+
+        self._lock_handle = _lock_file(f"{self.path}.lock")
+        if self._lock_handle is None:
+            raise RuntimeError(f"Journal {self.path} is in use by another process")
+
+        # Records left over from a previous run still count as pending
+        self._repair_tail()
+        self._adopt_orphans()
+        self.appended = self._count_backlog()
+
+        self._writer = threading.Thread(target=self._writer_loop, name="journal-writer", daemon=True)
+        self._replayer = threading.Thread(target=self._replay_loop, name="journal-replayer", daemon=True)
+        self._writer.start()
+        self._replayer.start()
+
+    def _append(self, *records):
+        """
+        Queue records for the writer thread.
+
+        Records are numbered in the order they are queued, which is the
+        order they are written and replayed in, and serialized right away
+        so later changes to the caller's objects do not leak into the
+        journal.
+        """
+        with self._queue_ready:
+            for record in records:
+                self._sequence += 1
+                record['writer'] = self.writer_id
+                record['seq'] = self._sequence
+                self._queue.append(json_util.dumps(record) + '\n')
+            self.appended += len(records)
+            self._queue_ready.notify()
+
+    def insert(self, collection_name, document):
+        """
+        Journal an insert. The document gets a client-side ``_id`` if it has
+        none, so the insert can be replayed as an idempotent upsert.
+
+        Args:
+            collection_name (str): Target collection.
+            document (dict): Document to insert; modified in place.
+
+        Returns:
+            ObjectId: The document's ``_id``.
+        """
+        document.setdefault('_id', ObjectId())
+        self._append({'collection': collection_name, 'op': 'insert', 'document': document})
+        return document['_id']
+
+    def insert_many(self, collection_name, documents):
+        """
+        Journal several inserts at once; they are replayed together in the
+        next bulk_write.
+
+        Args:
+            collection_name (str): Target collection.
+            documents (list): Documents to insert; modified in place.
+
+        Returns:
+            list: The documents' ``_id`` values.
+        """
+        for document in documents:
+            document.setdefault('_id', ObjectId())
+        self._append(*(
+            {'collection': collection_name, 'op': 'insert', 'document': document}
+            for document in documents
+        ))
+        return [document['_id'] for document in documents]
+
+    def update(self, collection_name, document_id, update):
+        """
+        Journal an update of a single document.
+
+        Args:
+            collection_name (str): Target collection.
+            document_id: ``_id`` of the document to update.
+            update (dict): MongoDB update document.
+        """
+        self._append({
+            'collection': collection_name,
+            'op': 'update',
+            'document_id': document_id,
+            'update': update
+        })
+
+    def pending(self):
+        """Number of records that have not been replayed to MongoDB yet"""
+        return self.appended - self.replayed - self.skipped
+
+    def sync(self, timeout):
+        """
+        Wait until every journaled record has been replayed.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if the journal is fully drained.
+        """
+        deadline = time.time() + timeout
+        with self._replayed:
+            while self.pending() > 0:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._replayed.wait(remaining)
+        return True
+
+    def stats(self):
+        """Get journal counters"""
+        return {
+            'appended': self.appended,
+            'replayed': self.replayed,
+            'skipped': self.skipped,
+            'pending': self.pending(),
+            'replay_failures': self.replay_failures,
+            'last_replay_error': self.last_replay_error
+        }
+
+    def close(self):
+        """Stop the background threads and release the journal lock"""
+        self._stopped.set()
+        with self._queue_ready:
+            self._queue_ready.notify()
+        self._writer.join(self.fsync_interval + 5)
+        self._replayer.join(self.replay_interval + 5)
+        self._lock_handle.close()
+
+    def _repair_tail(self):
+        """Terminate a record torn by a crash so new records start on their own line"""
+        try:
+            with open(self.path, 'rb+') as journal:
+                journal.seek(0, os.SEEK_END)
+                if journal.tell() == 0:
+                    return
+                journal.seek(-1, os.SEEK_END)
+                if journal.read(1) != b'\n':
+                    journal.write(b'\n')
+        except FileNotFoundError:
+            pass
+
+    def _adopt_orphans(self):
+        """
+        Take over the unreplayed records of journals left by dead processes.
+
+        Their records after the checkpoint are appended to this process's
+        journal before it accepts writes, then the orphaned files are
+        removed. A crash in between only replays the copied records twice,
+        which has no effect.
+        """
+        root, ext = os.path.splitext(self.base_path)
+        # The base path itself is where journals were kept before they
+        # became per process
+        candidates = glob.glob(f"{glob.escape(root)}.*{ext}") + [self.base_path]
+        for orphan in candidates:
+            if orphan == self.path or not os.path.isfile(orphan):
+                continue
+            lock_path = f"{orphan}.lock"
+            handle = _lock_file(lock_path)
+            if handle is None:
+                continue  # Its process is still running
+
+            try:
+                lines = []
+                try:
+                    with open(f"{orphan}.ckpt", 'r') as checkpoint:
+                        offset = int(checkpoint.read().strip() or 0)
+                except (FileNotFoundError, ValueError):
+                    offset = 0
+                with open(orphan, 'rb') as journal:
+                    journal.seek(offset)
+                    # A line without a newline was torn by the crash
+                    lines = [line for line in journal if line.endswith(b'\n') and line.strip()]
+                if lines:
+                    with open(self.path, 'ab') as journal:
+                        journal.writelines(lines)
+                        journal.flush()
+                        os.fsync(journal.fileno())
+                    print(f"Took over {len(lines)} journaled writes from {orphan}")
+                for path in (orphan, f"{orphan}.ckpt"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            except OSError as e:
+                print(f"Could not take over journal {orphan}: {e}")
+            finally:
+                handle.close()
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _count_backlog(self):
+        """Count the records after the checkpoint that still need replaying"""
+        count = 0
+        try:
+            with open(self.path, 'rb') as journal:
+                journal.seek(self._read_checkpoint())
+                for line in journal:
+                    if line.endswith(b'\n') and line.strip():
+                        count += 1
+        except FileNotFoundError:
+            pass
+        return count
+
+    def _writer_loop(self):
+        """Append queued records to the journal file and fsync in batches"""
+        while True:
+            with self._queue_ready:
+                if not self._queue and not self._stopped.is_set():
+                    self._queue_ready.wait(self.fsync_interval)
+                lines = list(self._queue)
+                self._queue.clear()
+
+            if not lines:
+                if self._stopped.is_set():
+                    return
+                continue
+
+            try:
+                with self._file_lock:
+                    with open(self.path, 'a', encoding='utf-8') as journal:
+                        journal.writelines(lines)
+                        journal.flush()
+                        os.fsync(journal.fileno())
+            except Exception as e:
+                print(f"Journal write error: {e}")
+                # Put the records back in order and retry on the next batch
+                with self._queue_ready:
+                    self._queue.extendleft(reversed(lines))
+                time.sleep(self.fsync_interval)
+                continue
+
+            # Batch up small writes
+            if not self._stopped.is_set():
+                time.sleep(self.fsync_interval)
+
+    def _read_checkpoint(self):
+        """Byte offset of the first record not yet replayed"""
+        try:
+            with open(self.checkpoint_path, 'r') as checkpoint:
+                return int(checkpoint.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_checkpoint(self, offset):
+        """Persist the replay position"""
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w') as checkpoint:
+            checkpoint.write(str(offset))
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _read_batch(self, offset):
+        """
+        Read complete records starting at a byte offset.
+
+        Returns:
+            tuple: (records, number of corrupt records skipped, offset after
+            the last complete record).
+        """
+        records = []
+        corrupt = 0
+        try:
+            with open(self.path, 'rb') as journal:
+                journal.seek(offset)
+                while len(records) < self.batch_size:
+                    line = journal.readline()
+                    if not line.endswith(b'\n'):
+                        break  # Partial record still being written
+                    offset += len(line)
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(json_util.loads(line.decode('utf-8')))
+                    except ValueError as e:
+                        # A record torn by a crash; the rest of the file is intact
+                        print(f"Skipping corrupt journal record: {e}")
+                        corrupt += 1
+        except FileNotFoundError:
+            pass
+        return records, corrupt, offset
+
+    @staticmethod
+    def _to_request(record):
+        """Turn a journal record into an idempotent bulk_write request"""
+        if record['op'] == 'insert':
+            document = record['document']
+            fields = {key: value for key, value in document.items() if key != '_id'}
+            return UpdateOne({'_id': document['_id']}, {'$setOnInsert': fields}, upsert=True)
+
+        # A writer's records are replayed in sequence order, so an update is
+        # skipped if the document already holds this sequence number or a
+        # later one from the same writer
+        marker = f"{APPLIED_FIELD}.{record['writer']}"
+        update = dict(record['update'])
+        update['$max'] = dict(update.get('$max', {}), **{marker: record['seq']})
+        return UpdateOne(
+            {'_id': record['document_id'], marker: {'$not': {'$gte': record['seq']}}},
+            update
+        )
+
+    def _apply(self, records):
+        """Replay records in order, batching consecutive writes per collection"""
+        batch = []
+        collection_name = None
+        for record in records:
+            if batch and record['collection'] != collection_name:
+                self.db[collection_name].bulk_write(batch, ordered=True)
+                batch = []
+            collection_name = record['collection']
+            batch.append(self._to_request(record))
+        if batch:
+            self.db[collection_name].bulk_write(batch, ordered=True)
+
+    @staticmethod
+    def _is_transient(error):
+        """
+        Check whether a replay error may go away by retrying.
+
+        Write errors reported for specific records (duplicate keys,
+        validation) and records that cannot be turned into a request are
+        permanent; connection problems, timeouts and other server errors
+        are retried.
+        """
+        if isinstance(error, BulkWriteError):
+            return not error.details.get('writeErrors')
+        return isinstance(error, (PyMongoError, OSError))
+
+    def _apply_or_reject(self, records):
+        """
+        Replay records, setting aside the ones MongoDB will never accept.
+
+        If a batch fails for a permanent reason, its records are replayed
+        one by one to find the bad ones, which are appended to the
+        ``.rejected`` file next to the journal. Replaying the good records
+        again has no effect.
+
+        Returns:
+            int: Number of rejected records.
+
+        Raises:
+            Exception: A transient error; nothing was rejected.
+        """
+        try:
+            self._apply(records)
+            return 0
+        except Exception as e:
+            if self._is_transient(e):
+                raise
+
+        rejected = []
+        for record in records:
+            try:
+                self._apply([record])
+            except Exception as e:
+                if self._is_transient(e):
+                    raise
+                rejected.append({'record': record, 'error': str(e)})
+
+        with open(f"{self.path}.rejected", 'a', encoding='utf-8') as rejects:
+            rejects.writelines(json_util.dumps(reject) + '\n' for reject in rejected)
+            rejects.flush()
+            os.fsync(rejects.fileno())
+        print(f"Rejected {len(rejected)} journal records MongoDB will not accept: {rejected[0]['error']}")
+        return len(rejected)
+
+    def _compact(self, offset):
+        """Truncate the journal once every record in it has been replayed"""
+        with self._file_lock:
+            try:
+                if os.path.getsize(self.path) != offset:
+                    return offset
+            except FileNotFoundError:
+                pass
+            # Reset the checkpoint first: a crash before the truncation then
+            # only causes an idempotent replay instead of skipped records
+            self._write_checkpoint(0)
+            with open(self.path, 'w'):
+                pass
+            return 0
+
+    def _replay_loop(self):
+        """Drain the journal file to MongoDB, backing off while it is unreachable"""
+        delay = self.replay_interval
+        offset = self._read_checkpoint()
+
+        while not self._stopped.is_set():
+            records, corrupt, next_offset = self._read_batch(offset)
+            if not records:
+                if next_offset != offset:
+                    offset = next_offset
+                    self._write_checkpoint(offset)
+                    self._credit(0, corrupt)
+                if offset:
+                    offset = self._compact(offset)
+                self._stopped.wait(self.replay_interval)
+                continue
+
+            try:
+                rejected = self._apply_or_reject(records)
+            except Exception as e:
+                self.replay_failures += 1
+                if self.last_replay_error is None:
+                    print(f"Journal replay paused, MongoDB unavailable: {e}")
+                self.last_replay_error = str(e)
+                self._stopped.wait(delay)
+                delay = min(delay * 2, 60)
+                continue
+
+            if self.last_replay_error is not None:
+                print("Journal replay resumed")
+            self.last_replay_error = None
+            delay = self.replay_interval
+
+            offset = next_offset
+            self._write_checkpoint(offset)
+            self._credit(len(records) - rejected, corrupt + rejected)
+
+    def _credit(self, replayed, skipped):
+        """Count records as no longer pending and wake sync() callers"""
+        with self._replayed:
+            self.replayed += replayed
+            self.skipped += skipped
+            self._replayed.notify_all()
@@ -0,0 +1,106 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still in flight get the same Future instead of repeating it, and receive
+    its exception if it fails. Blocking (``do``) and Future-based
+    (``do_future``) callers share flights, so a request thread can wait on a
+    classification the tracking pipeline already started.
+    """
+    def __init__(self):
+        """Initialize an empty flight table"""
+        self._flights = {}
+        self._lock = threading.Lock()
+
+        # Flight counters
+        self.flights = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _join(self, key):
+        """Get the in-flight Future for a key; the caller holds the lock"""
+        future = self._flights.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def _land(self, key, future):
+        """Forget a finished flight unless a newer one replaced it"""
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def do(self, key, start, timeout=None):
+        """
+        Join or start the flight for a key and wait for its result.
+
+        Args:
+            key: Flight key.
+            start (callable): Starts the work and returns a Future; only
+                called if no flight for the key is running.
+            timeout (float, optional): Maximum number of seconds to wait.
+
+        Returns:
+            The flight's result.
+
+        Raises:
+            concurrent.futures.TimeoutError: If the flight did not finish
+                in time.
+            Exception: Whatever the flight failed with.
+        """
+        future = self.do_future(key, start)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            raise
+
+    def do_future(self, key, start):
+        """
+        Start work that completes through a Future, once per key.
+
+        Args:
+            key: Flight key.
+            start (callable): Starts the work and returns a Future.
+
+        Returns:
+            Future: The in-flight Future for the key.
+        """
+        with self._lock:
+            future = self._join(key)
+            if future is not None:
+                return future
+            future = start()
+            if future.done():
+                return future
+            self._flights[key] = future
+            self.flights += 1
+
+        def _on_done(done):
+            if done.exception() is not None:
+                self.errors += 1
+            self._land(key, done)
+
+        future.add_done_callback(_on_done)
+        return future
+
+    def in_flight(self):
+        """Number of keys currently in flight"""
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self):
+        """Get flight counters"""
+        return {
+            'flights': self.flights,
+            'coalesced': self.coalesced,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'in_flight': self.in_flight()
+        }
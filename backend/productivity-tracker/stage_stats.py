@@ -0,0 +1,137 @@
+import time
+import threading
+
+# Latency histograms have one bucket per power of two microseconds:
+# bucket 0 holds samples under 1µs, bucket i samples in [2^(i-1), 2^i) µs
+HISTOGRAM_BUCKETS = 32
+
+
+class _ThreadBuffer:
+    """Counters and histograms written only by the thread that owns them"""
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.counters = {}
+        # name -> [bucket counts, total seconds]
+        self.latencies = {}
+
+    def merge_into(self, counters, latencies):
+        for name, value in list(self.counters.items()):
+            counters[name] = counters.get(name, 0) + value
+        for name, (buckets, total) in list(self.latencies.items()):
+            merged = latencies.setdefault(name, [[0] * HISTOGRAM_BUCKETS, 0.0])
+            for index, count in enumerate(buckets):
+                merged[0][index] += count
+            merged[1] += total
+
+
+def _percentile(buckets, count, fraction):
+    """Upper bound, in milliseconds, of the bucket holding a percentile"""
+    rank = fraction * count
+    seen = 0
+    for index, bucket in enumerate(buckets):
+        seen += bucket
+        if seen >= rank:
+            return (1 << index) / 1000.0
+    return (1 << (len(buckets) - 1)) / 1000.0
+
+
+class StageStats:
+    """
+    Low-overhead counters and log2 latency histograms.
+
+    Every thread writes to its own buffer (a threading.local), so recording
+    takes no lock; the buffers are registered in a list and summed when
+    stats are read. Buffers of finished threads are folded into a retired
+    total, so short-lived request threads do not pile up.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._buffers = []
+        self._retired = _ThreadBuffer()
+        self._lock = threading.Lock()  # Guards registration and reads only
+
+    def _buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = _ThreadBuffer(threading.current_thread())
+            self._local.buffer = buffer
+            with self._lock:
+                self._buffers.append(buffer)
+        return buffer
+
+    def count(self, name, value=1):
+        """Add to a counter"""
+        counters = self._buffer().counters
+        counters[name] = counters.get(name, 0) + value
+
+    def record(self, name, seconds):
+        """Add a latency sample to a histogram"""
+        latencies = self._buffer().latencies
+        histogram = latencies.get(name)
+        if histogram is None:
+            histogram = latencies[name] = [[0] * HISTOGRAM_BUCKETS, 0.0]
+        bucket = min(int(seconds * 1_000_000).bit_length(), HISTOGRAM_BUCKETS - 1)
+        histogram[0][bucket] += 1
+        histogram[1] += seconds
+
+    def lap(self, name, started):
+        """
+        Record the time since ``started`` and start the next lap.
+
+        Args:
+            name (str): Histogram name.
+            started (float): time.perf_counter() value the lap began at.
+
+        Returns:
+            float: The current time.perf_counter() value.
+        """
+        now = time.perf_counter()
+        self.record(name, now - started)
+        return now
+
+    def snapshot(self):
+        """
+        Sum the buffers of all threads.
+
+        Returns:
+            dict: Counters, and per histogram its sample count, mean,
+            p50/p90/p99 (bucket upper bounds) and non-empty buckets keyed
+            by their upper bound in microseconds.
+        """
+        counters = {}
+        latencies = {}
+        with self._lock:
+            live = []
+            for buffer in self._buffers:
+                if buffer.thread.is_alive():
+                    live.append(buffer)
+                else:
+                    # Nothing writes to a finished thread's buffer any more
+                    buffer.merge_into(self._retired.counters, self._retired.latencies)
+            self._buffers = live
+            self._retired.merge_into(counters, latencies)
+            for buffer in live:
+                buffer.merge_into(counters, latencies)
+
+        histograms = {}
+        for name, (buckets, total) in sorted(latencies.items()):
+            samples = sum(buckets)
+            if not samples:
+                continue
+            histograms[name] = {
+                'count': samples,
+                'total_ms': round(total * 1000, 3),
+                'mean_ms': round(total * 1000 / samples, 4),
+                'p50_ms': _percentile(buckets, samples, 0.5),
+                'p90_ms': _percentile(buckets, samples, 0.9),
+                'p99_ms': _percentile(buckets, samples, 0.99),
+                'buckets_us': {
+                    f"<{1 << index}": bucket
+                    for index, bucket in enumerate(buckets) if bucket
+                }
+            }
+        return {
+            'counters': dict(sorted(counters.items())),
+            'latency': histograms,
+            'threads': len(self._buffers)
+        }
@@ -0,0 +1,205 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import pymongo
+from dotenv import load_dotenv
+from ai_classifier import AIClassifier
+from main import ProductivityTracker
+from session_journal import SessionJournal
+from feedback_store import FeedbackStore
+from ocr_pipeline import ScreenshotOcrPipeline
+
+
+class TenantRegistry:
+    """
+    Per-employee ProductivityTracker instances for a multi-user API process.
+
+    Every employee gets their own tracker, session state and tracking worker,
+    while the MongoDB client, AIClassifier (with everyone's classifier
+    feedback), write journal and OCR worker pool are shared.
+    Trackers without an active session are evicted in least-recently-used
+    order once the registry is over capacity or they have been idle too long;
+    trackers pinned by a request in flight are never evicted.
+    """
+    def __init__(self, max_tenants=100, idle_timeout=3600):
+        """
+        Initialize the registry and its shared resources.
+
+        Args:
+            max_tenants (int): Number of trackers kept before LRU eviction.
+            idle_timeout (float): Seconds without requests after which a
+                tracker with no active session is evicted.
+        """
+        load_dotenv()
+
+        mongodb_uri = os.getenv('MONGODB_URI')
+        if not mongodb_uri:
+            raise ValueError("""
+            MongoDB URI not found!
+            Please ensure your .env file contains:
+            MONGODB_URI=your_mongodb_connection_string
+            """)
+
+        # Shared across all tenants
+        self.client = pymongo.MongoClient(mongodb_uri)
+        self.db = self.client['productivity_tracker']
+        self.ai_classifier = AIClassifier()
+        self.ai_classifier.load_feedback(FeedbackStore(self.db['classifier_feedback']))
+        self.journal = SessionJournal(
+            self.db,
+            os.path.join(os.getenv('JOURNAL_DIR', 'journal'), 'session_journal.log'),
+            fsync_interval=float(os.getenv('JOURNAL_FSYNC_INTERVAL', 1.0))
+        )
+        self.ocr_pipeline = ScreenshotOcrPipeline(
+            lambda documents: self.journal.insert_many('screenshots', documents)
+        )
+
+        self.max_tenants = max_tenants
+        self.idle_timeout = idle_timeout
+        self._tenants = OrderedDict()
+        self._last_seen = {}
+        self._pins = {}  # employee_id -> requests using the tracker
+        self._lock = threading.Lock()
+
+        # Registry counters
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, employee_id):
+        """
+        Get the tracker for an employee, creating it on first use.
+
+        Args:
+            employee_id (str): Unique identifier for the employee.
+
+        Returns:
+            ProductivityTracker: The employee's tracker.
+        """
+        with self._lock:
+            return self._get_locked(employee_id)
+
+    def pin(self, employee_id):
+        """
+        Get an employee's tracker and keep it from being evicted until
+        ``unpin`` is called, e.g. for the duration of a request.
+
+        Args:
+            employee_id (str): Unique identifier for the employee.
+
+        Returns:
+            ProductivityTracker: The employee's tracker.
+        """
+        with self._lock:
+            self._pins[employee_id] = self._pins.get(employee_id, 0) + 1
+            return self._get_locked(employee_id)
+
+    def unpin(self, employee_id):
+        """Let a tracker pinned with ``pin`` be evicted again"""
+        with self._lock:
+            pins = self._pins.get(employee_id, 0) - 1
+            if pins > 0:
+                self._pins[employee_id] = pins
+            else:
+                self._pins.pop(employee_id, None)
+
+    def release(self, employee_id):
+        """
+        Drop an employee's tracker right away unless a session is running
+        or another request is using it.
+
+        Called from a request that pinned the tracker itself; that one pin
+        does not keep the tracker.
+
+        Args:
+            employee_id (str): Unique identifier for the employee.
+
+        Returns:
+            bool: True if the tracker was evicted.
+        """
+        with self._lock:
+            tracker = self._tenants.get(employee_id)
+            if tracker is None or tracker.session_active or self._pins.get(employee_id, 0) > 1:
+                return False
+            self._remove_locked(employee_id)
+            return True
+
+    def stats(self):
+        """Get registry counters"""
+        with self._lock:
+            active = sum(1 for tracker in self._tenants.values() if tracker.session_active)
+            return {
+                'tenants': len(self._tenants),
+                'active_sessions': active,
+                'created': self.created,
+                'evicted': self.evicted,
+                'max_tenants': self.max_tenants
+            }
+
+    def close(self, timeout=10):
+        """
+        Stop every tracker, read and store the queued screenshots and stop
+        the journal once it has caught up.
+
+        Args:
+            timeout (float): Seconds to wait for each of the OCR pipeline
+                and the journal.
+        """
+        with self._lock:
+            for employee_id in list(self._tenants):
+                self._remove_locked(employee_id)
+        self.ocr_pipeline.close(timeout)
+        if not self.journal.sync(timeout):
+            print(f"Warning: {self.journal.pending()} journaled writes left for the next start")
+        self.journal.close()
+
+    def _get_locked(self, employee_id):
+        """Get or create a tracker and evict others; the caller holds the lock"""
+        tracker = self._tenants.get(employee_id)
+        if tracker is None:
+            tracker = self._create(employee_id)
+            self._tenants[employee_id] = tracker
+        else:
+            self._tenants.move_to_end(employee_id)
+        self._last_seen[employee_id] = time.time()
+        self._evict_locked(keep=employee_id)
+        return tracker
+
+    def _create(self, employee_id):
+        """Build a tracker on the shared resources and start its tracking worker"""
+        tracker = ProductivityTracker(
+            employee_id=employee_id,
+            client=self.client,
+            ai_classifier=self.ai_classifier,
+            journal=self.journal,
+            ocr_pipeline=self.ocr_pipeline
+        )
+        worker = threading.Thread(
+            target=tracker.update_tracking,
+            name=f"tracking-{employee_id}",
+            daemon=True
+        )
+        worker.start()
+        self.created += 1
+        return tracker
+
+    def _remove_locked(self, employee_id):
+        """Stop and forget a tracker; the caller holds the lock"""
+        tracker = self._tenants.pop(employee_id)
+        self._last_seen.pop(employee_id, None)
+        tracker.shutdown()
+        self.evicted += 1
+
+    def _evict_locked(self, keep=None):
+        """Evict idle or least recently used trackers without an active session"""
+        now = time.time()
+        for employee_id in list(self._tenants):
+            if employee_id == keep:
+                continue
+            over_capacity = len(self._tenants) > self.max_tenants
+            expired = now - self._last_seen.get(employee_id, now) > self.idle_timeout
+            if not over_capacity and not expired:
+                continue
+            if self._tenants[employee_id].session_active or employee_id in self._pins:
+                continue
+            self._remove_locked(employee_id)
@@ -0,0 +1,85 @@
+import pytest
+
+from app_index import AppNameIndex, normalize_app_name
+
+PRODUCTIVE_APPS = [
+    'code', 'Visual Studio Code', 'excel', 'EXCEL.EXE', 'python', 'notepad++',
+    'numbers', 'Numbers', 'pages', 'access', 'preview', 'slack', 'google chrome'
+]
+UNPRODUCTIVE_APPS = [
+    'youtube', 'YouTube', 'steam', 'Steam', 'origin', 'signal', 'Signal',
+    'disney+', 'epic games', 'spotify'
+]
+
+
+@pytest.fixture
+def index():
+    return AppNameIndex(PRODUCTIVE_APPS, UNPRODUCTIVE_APPS)
+
+
+@pytest.mark.parametrize('label, verdict', [
+    ("Numbers don't lie - YouTube", False),
+    ("Signal and noise in data - Visual Studio Code", True),
+    ("Access denied - Slack", True),
+    ("Preview of the origin story - Spotify", False),
+    ("Steam summer sale - Google Chrome", True),
+    ("Python vs Excel | Steam", False),
+    ("How to code – YouTube", False),
+])
+def test_only_the_app_part_of_a_title_is_searched(index, label, verdict):
+    assert index.lookup(label) is verdict
+
+
+@pytest.mark.parametrize('label', ["Numbers", "Signal", "Pages", "Origin", "Access", "Preview"])
+def test_generic_app_names_are_not_indexed(index, label):
+    assert index.lookup(label) is None
+
+
+@pytest.mark.parametrize('label, verdict', [
+    ("EXCEL", True),
+    ("excel.exe", True),
+    ("Budget.xlsx - Excel2016", True),
+    ("main.py - project - Visual Studio Code", True),
+    ("script.py - Python3", True),
+    ("changes.txt - Notepad++", True),
+    ("Disney+", False),
+    ("Fortnite - Epic Games", False),
+    ("Untitled - Notepad", None),
+    ("", None),
+])
+def test_trailing_app_names_match(index, label, verdict):
+    assert index.lookup(label) is verdict
+
+
+def test_longest_match_wins(index):
+    index.add('visual studio', False)
+    assert index.lookup("Visual Studio Code") is True
+    assert index.lookup("Visual Studio") is False
+
+
+def test_productive_wins_over_unproductive_duplicate():
+    index = AppNameIndex(productive_apps=['Steam'], unproductive_apps=['steam.exe'])
+    assert index.lookup("Steam") is True
+    assert index.size == 1
+
+
+def test_remove_prunes_entries(index):
+    size = index.size
+    assert index.remove('Epic Games')
+    assert index.lookup("Epic Games") is None
+    assert not index.remove('Epic Games')
+    assert index.size == size - 1
+    assert index.lookup("Visual Studio Code") is True
+
+
+def test_stats_count_hits_and_misses(index):
+    index.lookup("Slack")
+    index.lookup("Untitled - Notepad")
+    stats = index.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_normalize_app_name():
+    assert normalize_app_name("WINWORD.EXE") == ['winword']
+    assert normalize_app_name("Visual Studio Code") == ['visual', 'studio', 'code']
+    assert normalize_app_name("Notepad++") == ['notepad++']
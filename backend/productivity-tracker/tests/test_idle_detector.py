@@ -0,0 +1,46 @@
+import idle_detector
+from idle_detector import IdleDetector, _SubprocessProbe
+
+
+def test_helper_runs_once_per_interval(monkeypatch):
+    monkeypatch.setattr(idle_detector, 'SUBPROCESS_PROBE_INTERVAL', 60)
+    clock = [100.0]
+    monkeypatch.setattr(idle_detector.time, 'monotonic', lambda: clock[0])
+    reads = []
+
+    def read():
+        reads.append(clock[0])
+        return 10.0
+
+    probe = _SubprocessProbe(read)
+    assert probe() == 10.0
+    clock[0] += 5
+    assert probe() == 15.0
+    clock[0] += 60
+    assert probe() == 10.0
+    assert reads == [100.0, 165.0]
+
+
+def test_helper_without_reading(monkeypatch):
+    monkeypatch.setattr(idle_detector, 'SUBPROCESS_PROBE_INTERVAL', 60)
+    assert _SubprocessProbe(lambda: None)() is None
+
+
+def test_threshold():
+    detector = IdleDetector(threshold_seconds=300, probe=lambda: 299.5)
+    assert not detector.is_idle()
+    assert detector.is_idle(300)
+
+
+def test_failing_probe_disables_detection():
+    calls = []
+
+    def probe():
+        calls.append(1)
+        raise FileNotFoundError("xprintidle")
+
+    detector = IdleDetector(probe=probe)
+    assert detector.idle_seconds() is None
+    assert detector.idle_seconds() is None
+    assert len(calls) == 1
+    assert not detector.is_idle()
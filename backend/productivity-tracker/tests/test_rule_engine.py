@@ -0,0 +1,88 @@
+import re
+
+import pytest
+
+from rule_engine import (
+    PRODUCTIVE_ACTIVITIES,
+    PRODUCTIVE_DOMAINS,
+    PRODUCTIVE_KEYWORDS,
+    UNPRODUCTIVE_DOMAINS,
+    RuleEngine,
+    _legacy_match,
+)
+
+LEGACY_RULE_SETS = [
+    ('productive_domain', PRODUCTIVE_DOMAINS, True),
+    ('unproductive_domain', UNPRODUCTIVE_DOMAINS, False),
+    ('activity', PRODUCTIVE_ACTIVITIES, True),
+    ('keyword', [r'\b' + re.escape(keyword) + r'\b' for keyword in PRODUCTIVE_KEYWORDS], True)
+]
+
+TITLES = [
+    "main.py - productivity-tracker - Visual Studio Code",
+    "Pull Request #42 · org/repo - github.com - Google Chrome",
+    "r/programming - reddit.com - Mozilla Firefox",
+    "Funny cats compilation - youtube.com/watch - Google Chrome",
+    "Python tutorial for beginners - youtube.com/watch - Google Chrome",
+    "youtube.com/watch?v=1 learn python code - Google Chrome",
+    "reddit.com/r/python - debug help - Mozilla Firefox",
+    "Quarterly report draft - Word",
+    "Inbox (3) - personal mail",
+    "Untitled - Notepad",
+    "Spotify Premium",
+    "New Tab - Google Chrome",
+    "netflix.com - Stranger Things",
+    "GIT Bash",
+    "Homework - networking",
+    "API reference - Docs",
+    "",
+]
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine.from_classifier_rules(PRODUCTIVE_DOMAINS, UNPRODUCTIVE_DOMAINS)
+
+
+@pytest.mark.parametrize('title', TITLES)
+def test_verdict_matches_legacy_loop(engine, title):
+    expected = _legacy_match(LEGACY_RULE_SETS, title)
+    actual = engine.match(title)
+    assert (expected and expected.productive) == (actual and actual.productive)
+    assert (expected and expected.kind) == (actual and actual.kind)
+
+
+def test_first_rule_of_tier_wins(engine):
+    rule = engine.match("notes.md - github.com")
+    assert rule.kind == 'productive_domain'
+    assert rule.pattern == r'github\.com'
+
+
+def test_unproductive_tier_checked_before_activities(engine):
+    rule = engine.match("report.py - reddit.com")
+    assert rule.kind == 'unproductive_domain'
+    assert rule.productive is False
+
+
+def test_keywords_match_whole_words_only(engine):
+    assert engine.match("Homework - networking") is None
+    rule = engine.match("Weekly Meeting")
+    assert rule.kind == 'keyword'
+    assert rule.pattern == 'meeting'
+
+
+def test_memoized_result_is_reused(engine):
+    first = engine.match("main.py - Visual Studio Code")
+    second = engine.match("main.py - Visual Studio Code")
+    assert first is second
+    assert engine.match("Untitled - Notepad") is None
+    assert engine.match("Untitled - Notepad") is None
+    assert engine.stats()['rules'] == len(engine.rules)
+
+
+def test_custom_rule_sets_keep_priority():
+    engine = RuleEngine([
+        ('blocked', [r'casino'], False),
+        ('allowed', [r'casino\.example/reports'], True),
+    ])
+    assert engine.match("casino.example/reports").productive is False
@@ -0,0 +1,129 @@
+import pytest
+
+from session_buffer import SessionWriteBuffer, decode_window_key, encode_window_key
+
+mongomock = pytest.importorskip('mongomock')
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().db.sessions
+
+
+@pytest.fixture
+def session_id(collection):
+    return collection.insert_one({'productive_time': 0, 'unproductive_time': 0}).inserted_id
+
+
+def make_buffer(collection, session_id, **kwargs):
+    kwargs.setdefault('flush_interval', 3600)
+    kwargs.setdefault('max_pending_windows', 50)
+    return SessionWriteBuffer(collection, session_id, **kwargs)
+
+
+def test_deltas_stay_in_memory_until_due(collection, session_id):
+    buffer = make_buffer(collection, session_id)
+    buffer.record("main.py - Code", True, active_seconds=5)
+    buffer.record("main.py - Code", True, active_seconds=5)
+
+    assert not buffer.should_flush()
+    assert collection.find_one({'_id': session_id})['productive_time'] == 0
+    assert buffer.stats()['flush_count'] == 0
+
+
+def test_end_of_session_flush_writes_everything_once(collection, session_id):
+    buffer = make_buffer(collection, session_id)
+    buffer.record("main.py - Code", True, active_seconds=10, idle_seconds=2)
+    buffer.record("reddit.com - Firefox", False, active_seconds=4)
+    buffer.record("Untitled - Notepad", None, active_seconds=3)
+    buffer.reattribute("Untitled - Notepad", True, 3)
+
+    # Below both thresholds, as when end_session flushes the last deltas
+    assert not buffer.should_flush()
+    assert buffer.flush()
+    assert not buffer.has_pending()
+
+    session = collection.find_one({'_id': session_id})
+    assert session['productive_time'] == 13
+    assert session['unproductive_time'] == 4
+    assert session.get('pending_time', 0) == 0
+    details = session['window_details']
+    assert details[encode_window_key("main.py - Code")] == {'productive': True, 'active_time': 10, 'idle_time': 2}
+    assert details[encode_window_key("Untitled - Notepad")]['productive'] is True
+
+    # Nothing left to write; another flush is a no-op
+    assert buffer.flush()
+    assert buffer.stats()['flush_count'] == 1
+    assert collection.find_one({'_id': session_id})['productive_time'] == 13
+
+
+def test_flushes_add_up(collection, session_id):
+    buffer = make_buffer(collection, session_id)
+    buffer.record("main.py - Code", True, active_seconds=10)
+    buffer.flush()
+    buffer.record("main.py - Code", True, active_seconds=7)
+    buffer.flush()
+
+    session = collection.find_one({'_id': session_id})
+    assert session['productive_time'] == 17
+    assert session['window_details'][encode_window_key("main.py - Code")]['active_time'] == 17
+
+
+def test_flush_thresholds(collection, session_id):
+    buffer = make_buffer(collection, session_id, flush_interval=30, max_pending_windows=2)
+    assert not buffer.should_flush()
+    buffer.record("a", True, active_seconds=1)
+    assert not buffer.should_flush(now=buffer._last_flush + 1)
+    assert buffer.should_flush(now=buffer._last_flush + 30)
+    buffer.record("b", True, active_seconds=1)
+    assert buffer.should_flush(now=buffer._last_flush)
+
+
+def test_failed_flush_keeps_deltas(session_id):
+    class Failing:
+        name = 'sessions'
+
+        def update_one(self, query, update):
+            raise ConnectionError("MongoDB is down")
+
+    buffer = make_buffer(Failing(), session_id)
+    buffer.record("main.py - Code", True, active_seconds=10)
+    assert not buffer.flush()
+
+    buffer.record("main.py - Code", True, active_seconds=5)
+    update = buffer.build_update(*buffer._take_pending())
+    assert update['$inc']['productive_time'] == 15
+    assert buffer.stats()['failed_flushes'] == 1
+
+
+def test_flush_goes_to_journal_when_given(collection, session_id):
+    class Journal:
+        def __init__(self):
+            self.updates = []
+
+        def update(self, collection_name, document_id, update):
+            self.updates.append((collection_name, document_id, update))
+
+    journal = Journal()
+    buffer = make_buffer(collection, session_id, journal=journal)
+    buffer.record("main.py - Code", True, active_seconds=10)
+    assert buffer.flush()
+
+    assert journal.updates == [(
+        'sessions', session_id,
+        buffer.build_update(10, 0, 0, {"main.py - Code": {'productive': True, 'active_time': 10, 'idle_time': 0}})
+    )]
+    assert collection.find_one({'_id': session_id})['productive_time'] == 0
+
+
+def test_window_keys_round_trip():
+    title = "$HOME/report.v2.md - Code"
+    key = encode_window_key(title)
+    assert '.' not in key and '$' not in key
+    assert decode_window_key(key) == title
+
+
+def test_update_has_no_empty_operators():
+    assert SessionWriteBuffer.build_update(0, 0, 0, {}) == {}
+    assert set(SessionWriteBuffer.build_update(5, 0, 0, {})) == {'$inc'}
+
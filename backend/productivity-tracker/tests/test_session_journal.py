@@ -0,0 +1,174 @@
+import os
+import time
+
+import pytest
+from bson import json_util
+from bson.objectid import ObjectId
+
+from session_journal import APPLIED_FIELD, SessionJournal
+
+mongomock = pytest.importorskip('mongomock')
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().db
+
+
+@pytest.fixture
+def base_path(tmp_path):
+    return str(tmp_path / "journal.jsonl")
+
+
+@pytest.fixture
+def journal(db, base_path):
+    journal = SessionJournal(db, base_path, fsync_interval=0.01, replay_interval=0.01)
+    yield journal
+    journal.close()
+
+
+def own_path(base_path):
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{os.getpid()}{ext}"
+
+
+def record_line(collection_name, document, writer='orphan', seq=1):
+    record = {'collection': collection_name, 'op': 'insert', 'document': document, 'writer': writer, 'seq': seq}
+    return json_util.dumps(record) + '\n'
+
+
+def test_writes_are_replayed_in_order(journal, db):
+    session_id = journal.insert('sessions', {'employee_id': 'e1', 'active_time': 0})
+    journal.update('sessions', session_id, {'$inc': {'active_time': 5}})
+    journal.update('sessions', session_id, {'$inc': {'active_time': 3}})
+    journal.insert_many('activities', [{'app': 'code'}, {'app': 'chrome'}])
+
+    assert journal.sync(5)
+    assert journal.pending() == 0
+    assert db.sessions.find_one({'_id': session_id})['active_time'] == 8
+    assert db.activities.count_documents({}) == 2
+    assert journal.stats()['replayed'] == 5
+
+
+def test_journal_is_compacted_after_full_replay(journal):
+    journal.insert('sessions', {'employee_id': 'e1'})
+    assert journal.sync(5)
+    assert wait_for(lambda: os.path.getsize(journal.path) == 0)
+    assert journal._read_checkpoint() == 0
+
+
+def test_replaying_a_record_twice_has_no_effect(journal, db):
+    session_id = ObjectId()
+    records = [
+        {'collection': 'sessions', 'op': 'insert', 'writer': 'w1', 'seq': 1,
+         'document': {'_id': session_id, 'active_time': 0}},
+        {'collection': 'sessions', 'op': 'update', 'writer': 'w1', 'seq': 2,
+         'document_id': session_id, 'update': {'$inc': {'active_time': 5}}},
+        {'collection': 'sessions', 'op': 'update', 'writer': 'w2', 'seq': 1,
+         'document_id': session_id, 'update': {'$inc': {'active_time': 2}}}
+    ]
+    journal._apply(records)
+    journal._apply(records)
+    journal._apply(records[1:2])
+    session = db.sessions.find_one({'_id': session_id})
+    assert session['active_time'] == 7
+    # One marker per writer, however many updates were applied
+    assert session[APPLIED_FIELD] == {'w1': 2, 'w2': 1}
+
+
+def test_markers_stay_small_on_long_sessions(journal, db):
+    session_id = journal.insert('sessions', {'active_time': 0})
+    for _ in range(200):
+        journal.update('sessions', session_id, {'$inc': {'active_time': 1}})
+    assert journal.sync(5)
+    session = db.sessions.find_one({'_id': session_id})
+    assert session['active_time'] == 200
+    assert session[APPLIED_FIELD] == {journal.writer_id: 201}
+
+
+def test_backlog_and_corrupt_records_drain_pending(db, base_path):
+    with open(own_path(base_path), 'w') as handle:
+        handle.write(record_line('activities', {'_id': ObjectId(), 'app': 'code'}))
+        handle.write('{"collection": "activities", "op": \n')
+        handle.write(record_line('activities', {'_id': ObjectId(), 'app': 'chrome'}))
+
+    journal = SessionJournal(db, base_path, fsync_interval=0.01, replay_interval=0.01)
+    try:
+        assert journal.appended == 3
+        assert journal.sync(5)
+        stats = journal.stats()
+        assert (stats['replayed'], stats['skipped'], stats['pending']) == (2, 1, 0)
+        assert db.activities.count_documents({}) == 2
+    finally:
+        journal.close()
+
+
+def test_pending_survives_unreachable_database(base_path):
+    class Unreachable:
+        def __getitem__(self, name):
+            raise ConnectionError("MongoDB is down")
+
+    journal = SessionJournal(Unreachable(), base_path, fsync_interval=0.01, replay_interval=0.01)
+    try:
+        journal.insert('sessions', {'employee_id': 'e1'})
+        assert not journal.sync(0.2)
+        assert journal.pending() == 1
+        assert journal.stats()['last_replay_error'] == "MongoDB is down"
+    finally:
+        journal.close()
+
+
+def test_orphaned_journals_are_taken_over(db, base_path):
+    root, ext = os.path.splitext(base_path)
+    orphan = f"{root}.99999999{ext}"
+    replayed = record_line('activities', {'_id': ObjectId(), 'app': 'old'})
+    with open(orphan, 'w') as handle:
+        handle.write(replayed)
+        handle.write(record_line('activities', {'_id': ObjectId(), 'app': 'code'}))
+        handle.write('{"torn')
+    with open(f"{orphan}.ckpt", 'w') as handle:
+        handle.write(str(len(replayed)))
+    with open(base_path, 'w') as handle:
+        handle.write(record_line('activities', {'_id': ObjectId(), 'app': 'legacy'}))
+
+    journal = SessionJournal(db, base_path, fsync_interval=0.01, replay_interval=0.01)
+    try:
+        assert journal.appended == 2
+        assert not os.path.exists(orphan)
+        assert not os.path.exists(base_path)
+        assert journal.sync(5)
+        assert sorted(doc['app'] for doc in db.activities.find()) == ['code', 'legacy']
+    finally:
+        journal.close()
+
+
+def test_journal_in_use_is_not_opened_twice(journal, db, base_path):
+    with pytest.raises(RuntimeError):
+        SessionJournal(db, base_path)
+
+
+def test_rejected_records_do_not_block_the_journal(journal, db):
+    db.users.create_index('email', unique=True)
+    journal.insert('users', {'email': 'a@example.com'})
+    journal.insert('users', {'email': 'a@example.com'})
+    journal.update('sessions', None, 'not an update')
+    journal.insert('users', {'email': 'b@example.com'})
+
+    assert journal.sync(5)
+    stats = journal.stats()
+    assert (stats['replayed'], stats['skipped'], stats['pending']) == (2, 2, 0)
+    assert sorted(user['email'] for user in db.users.find()) == ['a@example.com', 'b@example.com']
+
+    with open(f"{journal.path}.rejected", 'rb') as rejects:
+        rejected = [json_util.loads(line.decode('utf-8')) for line in rejects]
+    assert [reject['record']['op'] for reject in rejected] == ['insert', 'update']
+    assert all(reject['error'] for reject in rejected)
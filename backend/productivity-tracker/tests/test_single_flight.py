@@ -0,0 +1,60 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=2)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_slow_leader_times_out(executor):
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = executor.submit(release.wait, 5)
+
+    with pytest.raises(FutureTimeoutError):
+        flights.do('app', lambda: leader, timeout=0.05)
+    assert flights.stats()['timeouts'] == 1
+
+    # The flight keeps running and later callers still join it
+    threading.Timer(0.05, release.set).start()
+    assert flights.do('app', lambda: pytest.fail("flight started twice"), timeout=5) is True
+    assert flights.stats()['coalesced'] == 1
+
+
+def test_concurrent_callers_share_one_flight(executor):
+    flights = SingleFlight()
+    started = []
+
+    def start():
+        started.append(1)
+        return executor.submit(lambda: time.sleep(0.1) or 'productive')
+
+    results = list(ThreadPoolExecutor(max_workers=4).map(
+        lambda _: flights.do('app', start, timeout=5), range(4)
+    ))
+    assert results == ['productive'] * 4
+    assert len(started) == 1
+    assert flights.in_flight() == 0
+
+
+def test_failed_flight_raises_to_every_caller():
+    flights = SingleFlight()
+    future = Future()
+    joined = flights.do_future('app', lambda: future)
+    future.set_exception(ValueError("bad response"))
+
+    with pytest.raises(ValueError):
+        joined.result()
+    with pytest.raises(ValueError):
+        flights.do('app', lambda: future)
+    stats = flights.stats()
+    assert (stats['errors'], stats['in_flight']) == (1, 0)
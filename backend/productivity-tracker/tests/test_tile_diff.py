@@ -0,0 +1,167 @@
+import pytest
+from PIL import Image, ImageDraw
+
+from tile_diff import TileCache, parse_grid
+
+SIZE = (400, 160)  # 2x2 grid: tiles of 200x80
+
+
+def capture(*boxes):
+    image = Image.new('L', SIZE, 255)
+    draw = ImageDraw.Draw(image)
+    for box in boxes:
+        draw.rectangle(box, fill=0)
+    return image
+
+
+@pytest.fixture
+def cache():
+    return TileCache(rows=2, columns=2, margin=8)
+
+
+def frame_words():
+    # (text, (left, top, right, bottom), line) relative to the whole capture
+    return [
+        ("hello", (10, 10, 60, 30), 1),
+        ("world", (250, 10, 300, 30), 1),
+        ("bottom", (10, 100, 70, 120), 2),
+        ("right", (300, 100, 350, 120), 2),
+    ]
+
+
+def test_parse_grid():
+    assert parse_grid("4x3") == (4, 3)
+    with pytest.raises(ValueError):
+        parse_grid("0x4")
+
+
+def test_tile_at(cache):
+    assert cache.tile_at(10, 10, SIZE) == 0
+    assert cache.tile_at(250, 10, SIZE) == 1
+    assert cache.tile_at(10, 100, SIZE) == 2
+    assert cache.tile_at(399, 159, SIZE) == 3
+    assert cache.tile_at(-5, 500, SIZE) == 2
+
+
+def test_first_capture_is_read_whole(cache):
+    image = capture()
+    plan = cache.plan(image)
+    assert plan.whole_frame
+    assert plan.changed == [0, 1, 2, 3]
+    assert [region.size for region in plan.regions(image)] == [SIZE]
+
+    text = plan.complete([frame_words()])
+    assert text == "hello world\nbottom right"
+
+
+def test_unchanged_capture_reuses_frame_text(cache):
+    image = capture()
+    cache.plan(image).complete([frame_words()])
+
+    plan = cache.plan(capture())
+    assert plan.changed == []
+    assert plan.regions(image) == []
+    assert plan.complete([]) == "hello world\nbottom right"
+
+
+def test_whole_frame_read_fills_tile_texts(cache):
+    cache.plan(capture()).complete([frame_words()])
+
+    # A change in the top-left tile only dirties that tile
+    image = capture((20, 40, 60, 60))
+    plan = cache.plan(image)
+    assert not plan.whole_frame
+    assert plan.changed == [0]
+    region, = plan.regions(image)
+    assert region.size == (208, 88)
+
+    text = plan.complete([[("changed", (10, 10, 60, 30), 1)]])
+    assert text == "changed world\nbottom right"
+
+
+def test_words_in_a_tile_margin_belong_to_the_neighbour(cache):
+    cache.plan(capture()).complete([frame_words()])
+
+    image = capture((20, 40, 60, 60))
+    plan = cache.plan(image)
+    # "edge" is centred at x=203, inside tile 1; tile 0 read it in its margin
+    words = [("left", (10, 10, 50, 30), 1), ("edge", (198, 10, 208, 30), 1)]
+    assert plan.complete([words]) == "left world\nbottom right"
+
+
+def test_most_tiles_dirty_switches_to_whole_frame(cache):
+    cache.plan(capture()).complete([frame_words()])
+
+    plan = cache.plan(capture((20, 20, 40, 40), (250, 20, 270, 40)))
+    assert plan.changed == [0, 1]
+    assert not plan.whole_frame
+
+    plan = cache.plan(capture((20, 20, 40, 40), (250, 20, 270, 40), (20, 100, 40, 120)))
+    assert plan.changed == [0, 1, 2]
+    assert plan.whole_frame
+
+
+def test_tile_reads_are_cached(cache):
+    cache.plan(capture()).complete([frame_words()])
+    image = capture((20, 40, 60, 60))
+    cache.plan(image).complete([[("changed", (10, 10, 60, 30), 1)]])
+
+    plan = cache.plan(image)
+    assert plan.changed == []
+    assert plan.complete([]) == "changed world\nbottom right"
+
+
+def test_merge_reads_rows_line_by_line(cache):
+    texts = {0: "a1\na2\n", 1: "b1", 2: "c1", 3: ""}
+    assert cache.merge(texts) == "a1 b1\na2\nc1"
+
+
+def test_merge_skips_missing_and_empty_tiles():
+    cache = TileCache(rows=1, columns=3)
+    assert cache.merge({2: "  right  ", 0: "\n\nleft"}) == "left right"
+    assert cache.merge({}) == ""
+
+
+def test_identical_capture_refers_to_the_last_read(cache):
+    cache.plan(capture()).complete([frame_words()], source='first')
+    plan = cache.plan(capture())
+    assert plan.same_as == 'first'
+
+    image = capture((20, 40, 60, 60))
+    cache.plan(image).complete([[("changed", (10, 10, 60, 30), 1)]], source='second')
+    plan = cache.plan(image)
+    assert plan.same_as == 'second'
+    assert plan.complete([]) == "changed world\nbottom right"
+
+    # Back to the first screen: the top-left tile is read again
+    plan = cache.plan(capture())
+    assert plan.changed == [0]
+    assert plan.same_as is None
+
+
+def test_adjacent_dirty_tiles_are_read_as_one_region(cache):
+    cache.plan(capture()).complete([frame_words()])
+
+    # A word across the column edge changes both top tiles
+    image = capture((150, 20, 250, 40))
+    plan = cache.plan(image)
+    assert plan.changed == [0, 1]
+    region, = plan.regions(image)
+    assert region.size == (400, 88)
+
+    text = plan.complete([[("straddling", (150, 20, 250, 40), 1)]])
+    assert text == "straddling\nbottom right"
+
+
+def test_separate_dirty_tiles_are_read_apart():
+    cache = TileCache(rows=2, columns=3, margin=8)
+    image = Image.new('L', (600, 160), 255)
+    cache.plan(image).complete([[]])
+
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((20, 20, 40, 40), fill=0)
+    draw.rectangle((520, 20, 540, 40), fill=0)
+    plan = cache.plan(image)
+    assert plan.changed == [0, 2]
+    assert [region.size for region in plan.regions(image)] == [(208, 88), (208, 88)]
+    assert plan.complete([[("left", (20, 20, 40, 40), 1)], [("right", (120, 20, 140, 40), 1)]]) == "left right"
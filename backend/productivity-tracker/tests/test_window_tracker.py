@@ -0,0 +1,62 @@
+import pytest
+
+import window_tracker
+from window_tracker import WindowTracker
+
+
+class FakeProcess:
+    # pid -> (create_time, name) of the processes currently running
+    table = {}
+    calls = 0
+
+    def __init__(self, pid):
+        FakeProcess.calls += 1
+        self._create_time, self._name = self.table[pid]
+
+    def create_time(self):
+        return self._create_time
+
+    def name(self):
+        return self._name
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(window_tracker.psutil, 'Process', FakeProcess)
+    monkeypatch.setattr(window_tracker.time, 'monotonic', lambda: clock[0])
+    FakeProcess.table = {10: (1.0, 'Code.exe')}
+    FakeProcess.calls = 0
+    tracker = WindowTracker()
+    tracker.clock = clock
+    return tracker
+
+
+def test_cached_name_needs_no_process_lookup(tracker):
+    assert tracker._get_process_name(10) == 'code.exe'
+    assert tracker._get_process_name(10) == 'code.exe'
+    assert FakeProcess.calls == 1
+    assert tracker.cache_stats()['process_cache_hits'] == 1
+
+
+def test_pid_is_checked_again_after_the_interval(tracker):
+    tracker._get_process_name(10)
+    tracker.clock[0] += tracker.process_check_interval
+    assert tracker._get_process_name(10) == 'code.exe'
+    assert FakeProcess.calls == 2
+    assert tracker.cache_stats()['process_cache_misses'] == 1
+
+
+def test_reused_pid_gets_the_new_name(tracker):
+    tracker._get_process_name(10)
+    FakeProcess.table[10] = (2.0, 'chrome.exe')
+    tracker.clock[0] += tracker.process_check_interval
+    assert tracker._get_process_name(10) == 'chrome.exe'
+
+
+def test_process_cache_is_bounded(tracker):
+    tracker.cache_size = 2
+    FakeProcess.table.update({11: (1.0, 'slack.exe'), 12: (1.0, 'teams.exe')})
+    for pid in (10, 11, 10, 12):
+        tracker._get_process_name(pid)
+    assert list(tracker._process_names) == [10, 12]
@@ -0,0 +1,282 @@
+import zlib
+import threading
+from bisect import bisect_right
+from itertools import zip_longest
+import numpy as np
+
+# Share of dirty tiles above which the whole capture is read in one pass;
+# one Tesseract call on the frame is cheaper than one per tile
+WHOLE_FRAME_SHARE = 0.5
+
+
+def parse_grid(value):
+    """
+    Read a tile grid setting such as "4x4" (rows x columns).
+
+    Returns:
+        tuple: (rows, columns).
+    """
+    rows, columns = (int(part) for part in value.lower().split('x'))
+    if rows < 1 or columns < 1:
+        raise ValueError(f"Invalid tile grid: {value}")
+    return rows, columns
+
+
+def _text_lines(text):
+    """Non-empty, stripped lines of an OCR result"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _words_text(words):
+    """Join (text, box, line) words into lines, keeping their order"""
+    lines = []
+    current = None
+    for text, _, line in words:
+        if not lines or line != current:
+            lines.append([])
+            current = line
+        lines[-1].append(text)
+    return "\n".join(" ".join(line) for line in lines)
+
+
+class TilePlan:
+    """
+    The tiles of one capture that need OCR, and the cached text of the rest.
+
+    Created by TileCache.plan; ``complete`` merges the words read from the
+    dirty tiles with the cached text into the full-screen text. When most
+    tiles are dirty the plan reads the whole capture in one pass instead,
+    and still caches the text of every tile from the word positions. A
+    capture identical to the last one read has nothing dirty and names that
+    capture in ``same_as``.
+    """
+    def __init__(self, cache, grid, size, known, dirty, checksums, whole_frame=False,
+                 text=None, same_as=None):
+        self.cache = cache
+        self.grid = grid
+        self.size = size  # (width, height) of the capture
+        self.known = known  # tile index -> cached text
+        self.dirty = dirty  # (tile index, box, checksum) of tiles to read
+        self.checksums = checksums  # Checksum of every tile, in index order
+        self.whole_frame = whole_frame
+        self._regions = [] if whole_frame else self._group_dirty()
+        self._text = text  # Text of the last capture read, if this one is identical
+        self.same_as = same_as  # Source of that text, as given to complete()
+
+    def _group_dirty(self):
+        """
+        Group dirty tiles that share an edge into one region each.
+
+        Returns:
+            list: (tile indexes, box) per region; the box bounds the tiles'
+            boxes, margins included.
+        """
+        rows, columns = self.grid
+        boxes = {index: box for index, box, _ in self.dirty}
+        regions = []
+        seen = set()
+        for start in boxes:
+            if start in seen:
+                continue
+            seen.add(start)
+            group = []
+            stack = [start]
+            while stack:
+                index = stack.pop()
+                group.append(index)
+                row, column = divmod(index, columns)
+                for r, c in ((row - 1, column), (row + 1, column), (row, column - 1), (row, column + 1)):
+                    neighbour = r * columns + c
+                    if 0 <= r < rows and 0 <= c < columns and neighbour in boxes and neighbour not in seen:
+                        seen.add(neighbour)
+                        stack.append(neighbour)
+            group_boxes = [boxes[index] for index in group]
+            box = (
+                min(box[0] for box in group_boxes), min(box[1] for box in group_boxes),
+                max(box[2] for box in group_boxes), max(box[3] for box in group_boxes)
+            )
+            regions.append((frozenset(group), box))
+        return regions
+
+    @property
+    def changed(self):
+        """Indexes of the tiles that need OCR"""
+        return [index for index, _, _ in self.dirty]
+
+    def regions(self, image):
+        """Crop the groups of dirty tiles out of the capture, or return all of it"""
+        if self.whole_frame:
+            return [image]
+        return [image.crop(box) for _, box in self._regions]
+
+    def complete(self, results, source=None):
+        """
+        Cache the text read from the dirty tiles and rebuild the screen text.
+
+        A word belongs to the tile whose area, margins excluded, holds its
+        centre; words a region read outside its own tiles belong to a
+        neighbour and are dropped, so the overlap never duplicates text.
+
+        Args:
+            results (list): Words read from each region returned by
+                ``regions``, as (text, (left, top, right, bottom), line)
+                with boxes relative to the region.
+            source (optional): Identifies the capture, e.g. the ``_id`` of
+                its screenshot; later identical captures refer to it.
+
+        Returns:
+            str: Text of the screen, in reading order.
+        """
+        if self._text is not None:
+            return self._text
+
+        if self.whole_frame:
+            regions = [(None, (0, 0))]
+        else:
+            regions = [(indexes, box[:2]) for indexes, box in self._regions]
+        tile_words = {index: [] for index, _, _ in self.dirty}
+        frame_words = []
+        for number, ((own, (left, top)), words) in enumerate(zip(regions, results)):
+            for text, (x0, y0, x1, y1), line in words:
+                box = (x0 + left, y0 + top, x1 + left, y1 + top)
+                index = self.cache.tile_at((box[0] + box[2]) / 2, (box[1] + box[3]) / 2, self.size)
+                if own is not None and index not in own:
+                    continue
+                word = (text, box, (number, line))
+                frame_words.append(word)
+                if index in tile_words:
+                    tile_words[index].append(word)
+
+        tile_texts = dict(self.known)
+        for index, _, checksum in self.dirty:
+            text = _words_text(tile_words[index])
+            self.cache.update(index, checksum, text)
+            tile_texts[index] = text
+        if self.whole_frame:
+            text = _words_text(frame_words)
+        else:
+            text = self.cache.merge(tile_texts)
+        self.cache.update_frame(self.checksums, text, source)
+        return text
+
+
+class TileCache:
+    """
+    Per-tile checksums and OCR text of one screen.
+
+    A capture is split into a grid of tiles and every tile is checksummed;
+    tiles whose checksum matches the one their cached text was read from
+    keep that text, so only the changed part of the screen is read again.
+    Dirty tiles that share an edge are read as one region. A changed word
+    crossing a tile edge changes both tiles, so it is read whole. Regions
+    also extend a margin into clean neighbours: an unchanged word reaching
+    further than that past the edge of a dirty tile is cut, and the region
+    and the neighbour's cached text may each keep a fragment of it.
+    """
+    def __init__(self, rows=4, columns=4, margin=8):
+        """
+        Initialize an empty cache.
+
+        Args:
+            rows (int): Tile rows.
+            columns (int): Tile columns.
+            margin (int): Pixels each tile extends into its neighbours.
+        """
+        self.grid = (rows, columns)
+        self.margin = margin
+        self._texts = {}  # tile index -> (checksum, text)
+        self._frame = None  # (tile checksums, text, source) of the last capture read
+        self._lock = threading.Lock()
+
+    def _edges(self, width, height):
+        """Pixel edges of the tile rows and columns, margins excluded"""
+        rows, columns = self.grid
+        row_edges = [height * row // rows for row in range(rows + 1)]
+        column_edges = [width * column // columns for column in range(columns + 1)]
+        return row_edges, column_edges
+
+    def tile_at(self, x, y, size):
+        """
+        Index of the tile whose area, margins excluded, holds a point.
+
+        Args:
+            x (float): Horizontal position in the capture.
+            y (float): Vertical position in the capture.
+            size (tuple): (width, height) of the capture.
+        """
+        rows, columns = self.grid
+        row_edges, column_edges = self._edges(*size)
+        row = min(max(bisect_right(row_edges, y) - 1, 0), rows - 1)
+        column = min(max(bisect_right(column_edges, x) - 1, 0), columns - 1)
+        return row * columns + column
+
+    def _tiles(self, image):
+        """Yield (index, box, checksum) for every tile of an image, margins included"""
+        pixels = np.asarray(image)
+        height, width = pixels.shape[:2]
+        rows, columns = self.grid
+        row_edges, column_edges = self._edges(width, height)
+        for row in range(rows):
+            top = max(0, row_edges[row] - self.margin)
+            bottom = min(height, row_edges[row + 1] + self.margin)
+            for column in range(columns):
+                left = max(0, column_edges[column] - self.margin)
+                right = min(width, column_edges[column + 1] + self.margin)
+                tile = np.ascontiguousarray(pixels[top:bottom, left:right])
+                yield row * columns + column, (left, top, right, bottom), zlib.crc32(tile)
+
+    def plan(self, image):
+        """
+        Compare a capture with the cached tiles.
+
+        Args:
+            image (PIL.Image.Image): Capture, ideally already grayscale.
+
+        Returns:
+            TilePlan: Dirty tiles to read and cached text of the others.
+        """
+        tiles = list(self._tiles(image))
+        checksums = tuple(checksum for _, _, checksum in tiles)
+        known = {}
+        dirty = []
+        with self._lock:
+            if self._frame is not None and self._frame[0] == checksums:
+                _, text, source = self._frame
+                return TilePlan(self, self.grid, image.size, {}, [], checksums, text=text, same_as=source)
+            for index, box, checksum in tiles:
+                cached = self._texts.get(index)
+                if cached is not None and cached[0] == checksum:
+                    known[index] = cached[1]
+                else:
+                    dirty.append((index, box, checksum))
+        whole_frame = len(dirty) > WHOLE_FRAME_SHARE * len(tiles)
+        return TilePlan(self, self.grid, image.size, known, dirty, checksums, whole_frame)
+
+    def update(self, index, checksum, text):
+        """Remember the text read from a tile"""
+        with self._lock:
+            self._texts[index] = (checksum, text)
+
+    def update_frame(self, checksums, text, source=None):
+        """Remember the text of the last capture read"""
+        with self._lock:
+            self._frame = (checksums, text, source)
+
+    def merge(self, tile_texts):
+        """
+        Join tile texts in reading order.
+
+        The tiles of a grid row cover the same band of lines, so the n-th
+        lines of its tiles are joined left to right before moving to the
+        next line, and rows follow top to bottom. Empty lines are skipped.
+        """
+        rows, columns = self.grid
+        lines = []
+        for row in range(rows):
+            row_lines = [
+                _text_lines(tile_texts.get(row * columns + column, ""))
+                for column in range(columns)
+            ]
+            for parts in zip_longest(*row_lines, fillvalue=""):
+                lines.append(" ".join(part for part in parts if part))
+        return "\n".join(lines)
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import asyncio
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class LocalBucketStore:
+    """
+    Bucket state kept in this process.
+
+    A bucket that has refilled to capacity is the same as no bucket, so
+    every ``prune_every`` takes the full buckets are dropped; one-off keys
+    such as client addresses do not pile up.
+    """
+    def __init__(self, prune_every=1000):
+        self.prune_every = prune_every
+        self._buckets = {}  # key -> (level, updated, time the bucket is full again)
+        self._takes = 0
+        self._lock = threading.Lock()
+
+    def take(self, key, tokens, rate, capacity):
+        """
+        Refill a bucket and take tokens from it if enough are available.
+
+        Returns:
+            tuple: (granted, seconds until the tokens would be available).
+        """
+        now = time.monotonic()
+        with self._lock:
+            level, updated, _ = self._buckets.get(key, (capacity, now, now))
+            level = min(capacity, level + (now - updated) * rate)
+            granted = level >= tokens
+            if granted:
+                level -= tokens
+            self._buckets[key] = (level, now, now + (capacity - level) / rate)
+
+            self._takes += 1
+            if self._takes >= self.prune_every:
+                self._takes = 0
+                self._buckets = {
+                    bucket_key: bucket for bucket_key, bucket in self._buckets.items()
+                    if bucket[2] > now
+                }
+        return granted, 0.0 if granted else (tokens - level) / rate
+
+
+class FileBucketStore:
+    """
+    Bucket state shared by the processes of one machine.
+
+    The buckets live in a small JSON file that is read and rewritten under
+    an exclusive file lock for every take.
+    """
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _locked(self, handle):
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(self, handle):
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def take(self, key, tokens, rate, capacity):
+        """Same contract as LocalBucketStore.take, across processes"""
+        with self._lock, open(self.path, 'a+') as handle:
+            self._locked(handle)
+            try:
+                handle.seek(0)
+                try:
+                    buckets = json.loads(handle.read() or '{}')
+                except ValueError:
+                    buckets = {}
+
+                now = time.time()
+                level, updated = buckets.get(key, (capacity, now))
+                level = min(capacity, level + max(0.0, now - updated) * rate)
+                granted = level >= tokens
+                if granted:
+                    level -= tokens
+                buckets[key] = (level, now)
+
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps(buckets))
+                handle.flush()
+            finally:
+                self._unlock(handle)
+        return granted, 0.0 if granted else (tokens - level) / rate
+
+
+class MongoBucketStore:
+    """
+    Bucket state shared through a MongoDB collection.
+
+    Refill and take happen in one atomic pipeline update of the bucket's
+    document, so any number of processes and hosts can share a budget.
+    """
+    def __init__(self, collection):
+        self.collection = collection
+
+    def take(self, key, tokens, rate, capacity):
+        """Same contract as LocalBucketStore.take, across hosts"""
+        now = time.time()
+        refilled = {'$min': [capacity, {'$add': [
+            {'$ifNull': ['$level', capacity]},
+            {'$multiply': [{'$max': [0, {'$subtract': [now, {'$ifNull': ['$updated', now]}]}]}, rate]}
+        ]}]}
+        bucket = self.collection.find_one_and_update(
+            {'_id': key},
+            [
+                {'$set': {'level': refilled, 'updated': now}},
+                {'$set': {
+                    'granted': {'$gte': ['$level', tokens]},
+                    'level': {'$cond': [{'$gte': ['$level', tokens]}, {'$subtract': ['$level', tokens]}, '$level']}
+                }}
+            ],
+            upsert=True,
+            return_document=True  # ReturnDocument.AFTER
+        )
+        if bucket['granted']:
+            return True, 0.0
+        return False, (tokens - bucket['level']) / rate
+
+
+class TokenBucketLimiter:
+    """
+    Token-bucket rate limiter with per-key buckets.
+
+    Each key refills at ``rate`` tokens per second up to ``capacity``. Callers
+    can take a token without waiting (``try_acquire``), wait up to a deadline
+    (``acquire``) or wait without blocking an event loop (``acquire_async``),
+    and fall back to cheaper work when no token is granted. Bucket state lives
+    in this process unless a shared store is given.
+    """
+    def __init__(self, rate, capacity, store=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float): Default tokens added per second.
+            capacity (float): Default bucket size, i.e. the allowed burst.
+            store (optional): LocalBucketStore (default), FileBucketStore or
+                MongoBucketStore.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.store = store if store is not None else LocalBucketStore()
+        self._limits = {}
+
+        # Limiter counters
+        self.granted = 0
+        self.denied = 0
+        self.wait_seconds = 0.0
+
+    def configure(self, key, rate, capacity):
+        """Give a key its own rate and capacity"""
+        self._limits[key] = (rate, capacity)
+
+    def _take(self, key, tokens):
+        rate, capacity = self._limits.get(key, (self.rate, self.capacity))
+        return self.store.take(key, tokens, rate, capacity)
+
+    def try_acquire(self, key='default', tokens=1):
+        """
+        Take tokens if they are available right now.
+
+        Returns:
+            bool: True if the tokens were granted.
+        """
+        granted, _ = self._take(key, tokens)
+        if granted:
+            self.granted += 1
+        else:
+            self.denied += 1
+        return granted
+
+    def acquire(self, key='default', tokens=1, timeout=None):
+        """
+        Wait for tokens, giving up at a deadline.
+
+        Args:
+            key (str): Bucket key.
+            tokens (int): Number of tokens to take.
+            timeout (float, optional): Maximum number of seconds to wait;
+                None waits as long as needed.
+
+        Returns:
+            bool: True if the tokens were granted before the deadline.
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        while True:
+            granted, wait = self._take(key, tokens)
+            if granted:
+                self.granted += 1
+                self.wait_seconds += time.monotonic() - started
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                # The tokens will not be there in time; do not sleep for nothing
+                self.denied += 1
+                return False
+            time.sleep(wait)
+
+    async def acquire_async(self, key='default', tokens=1, timeout=None):
+        """Like acquire, but sleeps with asyncio so the event loop keeps running"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = None if timeout is None else started + timeout
+        while True:
+            granted, wait = self._take(key, tokens)
+            if granted:
+                self.granted += 1
+                self.wait_seconds += loop.time() - started
+                return True
+            if deadline is not None and loop.time() + wait > deadline:
+                self.denied += 1
+                return False
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        """Get limiter counters"""
+        return {
+            'granted': self.granted,
+            'denied': self.denied,
+            'wait_seconds': round(self.wait_seconds, 3)
+        }
@@ -0,0 +1,117 @@
+import time
+import threading
+from collections import OrderedDict
+
+# Marks a missing entry, since None is a valid cached value
+_MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe bounded cache with LRU eviction and per-entry TTL.
+
+    ``get`` and ``put`` are O(1). Expired entries are dropped lazily when
+    they are read or reach the LRU end, so there is never a full scan.
+    """
+    def __init__(self, max_entries=1000, ttl_seconds=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept.
+            ttl_seconds (float, optional): Default time to live; None keeps
+                entries until they are evicted.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+        # Cache counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count=True):
+        """
+        Get a value and mark it as recently used.
+
+        Args:
+            key: Cache key.
+            default: Value returned when the key is missing or expired.
+            count (bool): Whether the lookup counts towards hit/miss stats.
+
+        Returns:
+            The cached value, or ``default``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl_seconds=None, created_at=None):
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: Cache key.
+            value: Value to store.
+            ttl_seconds (float, optional): Time to live overriding the default.
+            created_at (float, optional): Wall-clock time the value was
+                produced, for entries loaded from elsewhere; defaults to now.
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = None
+        if ttl is not None:
+            expires_at = (created_at if created_at is not None else time.time()) + ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                _, (_, old_expires_at) = self._entries.popitem(last=False)
+                if old_expires_at is not None and old_expires_at <= time.time():
+                    self.expirations += 1
+                else:
+                    self.evictions += 1
+
+    def delete(self, key):
+        """Remove a key if present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
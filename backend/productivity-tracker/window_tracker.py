@@ -1,7 +1,167 @@
+import os
 import platform
 import psutil
 import subprocess
+import threading
+import time
 import re
+from collections import OrderedDict
+
+try:
+    from Xlib import X, display as xdisplay
+    from Xlib.error import BadWindow, CatchError, XError
+except ImportError:  # python-xlib is optional
+    xdisplay = None
+
+
+class _X11EventBackend:
+    """
+    In-process X11 active-window backend built on python-xlib.
+
+    Reads ``_NET_ACTIVE_WINDOW`` from the root window and ``_NET_WM_NAME``
+    from the active window, and listens for PropertyNotify events on both so
+    focus and title changes are pushed instead of polled. All X calls happen
+    on the backend's event thread.
+    """
+    def __init__(self):
+        self._display = xdisplay.Display()
+        self._root = self._display.screen().root
+        self._net_active_window = self._display.intern_atom('_NET_ACTIVE_WINDOW')
+        self._net_wm_name = self._display.intern_atom('_NET_WM_NAME')
+        self._wm_name = self._display.intern_atom('WM_NAME')
+
+        self._lock = threading.Lock()
+        self._title = "Unknown"
+        self._active = None
+        self.changed = threading.Event()
+
+        self._root.change_attributes(event_mask=X.PropertyChangeMask)
+        self._refresh_active_window()
+
+        self._thread = threading.Thread(target=self._event_loop, name="x11-window-events", daemon=True)
+        self._thread.start()
+
+    def get_title(self):
+        with self._lock:
+            return self._title
+
+    def _read_title(self, window):
+        """Read the UTF-8 window name, falling back to the legacy WM_NAME"""
+        for atom in (self._net_wm_name, self._wm_name):
+            prop = window.get_full_property(atom, X.AnyPropertyType)
+            if prop and prop.value:
+                value = prop.value
+                return value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+        return "Unknown"
+
+    def _refresh_active_window(self):
+        """
+        Re-read the active window and move the title subscription to it, so
+        only the focused window's property changes are delivered.
+        """
+        prop = self._root.get_full_property(self._net_active_window, X.AnyPropertyType)
+        window_id = prop.value[0] if prop and len(prop.value) else 0
+
+        if window_id != (self._active.id if self._active else 0):
+            previous = self._active
+            self._active = None
+            if previous is not None:
+                # The window may already be gone; that error is dropped
+                previous.change_attributes(event_mask=X.NoEventMask, onerror=CatchError(BadWindow))
+            if window_id:
+                self._active = self._display.create_resource_object('window', window_id)
+                self._active.change_attributes(event_mask=X.PropertyChangeMask)
+        self._refresh_title()
+
+    def _refresh_title(self):
+        """Re-read the title of the active window"""
+        title = self._read_title(self._active) if self._active is not None else "Unknown"
+        with self._lock:
+            changed = title != self._title
+            self._title = title
+        if changed:
+            self.changed.set()
+
+    def _event_loop(self):
+        while True:
+            try:
+                event = self._display.next_event()
+                if event.type != X.PropertyNotify:
+                    continue
+                if event.window == self._root and event.atom == self._net_active_window:
+                    self._refresh_active_window()
+                elif (event.atom in (self._net_wm_name, self._wm_name) and self._active is not None
+                        and event.window == self._active):
+                    # Events of a window focused earlier may still be queued
+                    self._refresh_title()
+            except XError:
+                # The active window went away between the event and the read
+                self._active = None
+                self._refresh_title()
+            except Exception as e:
+                print(f"X11 event loop error: {e}")
+                time.sleep(1)
+
+
+class _XpropSpyBackend:
+    """
+    Active-window backend built on long-lived ``xprop -spy`` helpers.
+
+    One helper watches ``_NET_ACTIVE_WINDOW`` on the root window; a second
+    one watches the title of the current active window and is replaced on
+    each focus change. No process is started per poll.
+    """
+    _window_id_re = re.compile(r'window id # (0x[0-9a-fA-F]+)')
+    _title_re = re.compile(r'= "(.*)"$')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._title = "Unknown"
+        self._title_proc = None
+        self.changed = threading.Event()
+
+        self._root_proc = subprocess.Popen(
+            ['xprop', '-root', '-spy', '_NET_ACTIVE_WINDOW'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+        )
+        threading.Thread(target=self._watch_root, name="xprop-active-window", daemon=True).start()
+
+    def get_title(self):
+        with self._lock:
+            return self._title
+
+    def _set_title(self, title):
+        with self._lock:
+            changed = title != self._title
+            self._title = title
+        if changed:
+            self.changed.set()
+
+    def _watch_root(self):
+        for line in self._root_proc.stdout:
+            match = self._window_id_re.search(line)
+            window_id = match.group(1) if match else None
+            if self._title_proc is not None:
+                self._title_proc.kill()
+                self._title_proc = None
+            if not window_id or int(window_id, 16) == 0:
+                self._set_title("Unknown")
+                continue
+
+            self._title_proc = subprocess.Popen(
+                ['xprop', '-id', window_id, '-spy', '_NET_WM_NAME'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+            )
+            threading.Thread(
+                target=self._watch_title, args=(self._title_proc,), daemon=True
+            ).start()
+
+    def _watch_title(self, proc):
+        for line in proc.stdout:
+            match = self._title_re.search(line.strip())
+            if match and proc is self._title_proc:
+                self._set_title(match.group(1).replace('\\"', '"'))
+
 
 class WindowTracker:
     def __init__(self):
@@ -26,6 +186,151 @@ class WindowTracker:
             'notepad++.exe': 'Notepad++',
             'explorer.exe': 'File Explorer'
         }
+
+        # Browser processes and the word their title suffix contains
+        self.browser_processes = {
+            'chrome.exe': 'chrome',
+            'msedge.exe': 'edge',
+            'firefox.exe': 'firefox'
+        }
+        self._title_suffix_re = re.compile(r'(.*)\s[-–—]\s(.*)$')
+
+        # Event-driven Linux backend, created on first use
+        self._linux_backend = None
+        self._linux_backend_failed = False
+
+        # Windows hot-path caches
+        self.cache_size = 256
+        self.process_check_interval = 30     # Seconds a cached pid is trusted without a check
+        self._process_names = OrderedDict()  # pid -> (create_time, process name, checked at)
+        self._labels = OrderedDict()         # (hwnd, raw title) -> (pid, window label)
+        self._label_keys = {}                # hwnd -> current (hwnd, raw title) key
+        self.process_cache_hits = 0
+        self.process_cache_misses = 0
+        self.label_cache_hits = 0
+        self.label_cache_misses = 0
+
+    def cache_stats(self):
+        """
+        Get hit/miss counters of the process name and window label caches.
+
+        Returns:
+            dict: Cache counters and sizes.
+        """
+        return {
+            'process_cache_hits': self.process_cache_hits,
+            'process_cache_misses': self.process_cache_misses,
+            'process_cache_size': len(self._process_names),
+            'label_cache_hits': self.label_cache_hits,
+            'label_cache_misses': self.label_cache_misses,
+            'label_cache_size': len(self._labels)
+        }
+
+    def _forget_process(self, pid):
+        """Drop every cache entry that belongs to a process that has exited"""
+        self._process_names.pop(pid, None)
+        for key in [key for key, (label_pid, _) in self._labels.items() if label_pid == pid]:
+            del self._labels[key]
+            if self._label_keys.get(key[0]) == key:
+                del self._label_keys[key[0]]
+
+    def _get_process_name(self, pid):
+        """
+        Get the lowercase process name for a pid.
+
+        A cached name is trusted for ``process_check_interval`` seconds.
+        After that the pid's create time is read again, and if it changed
+        the pid was reused and the entry is replaced, so a reused pid never
+        keeps the name of the process that used to own it. At most
+        ``cache_size`` pids are kept; the least recently used go first, so
+        exited processes age out.
+        """
+        now = time.monotonic()
+        cached = self._process_names.get(pid)
+        if cached is not None and now - cached[2] < self.process_check_interval:
+            self.process_cache_hits += 1
+            self._process_names.move_to_end(pid)
+            return cached[1]
+
+        process = psutil.Process(pid)
+        create_time = process.create_time()
+        if cached is not None and cached[0] == create_time:
+            self.process_cache_hits += 1
+            name = cached[1]
+        else:
+            if cached is not None:
+                self._forget_process(pid)
+            self.process_cache_misses += 1
+            name = process.name().lower()
+
+        self._process_names[pid] = (create_time, name, now)
+        self._process_names.move_to_end(pid)
+        if len(self._process_names) > self.cache_size:
+            self._process_names.popitem(last=False)
+        return name
+
+    def _build_window_label(self, process_name, window_title):
+        """Turn a process name and raw window title into the tracked window label"""
+        # Web browsers keep the page title ("Google Chrome: Page"), which
+        # decides whether the tab is productive
+        if process_name in self.browser_processes:
+            browser = self.app_name_mapping[process_name]
+            page = window_title
+            # Drop the trailing " - Google Chrome" / " — Mozilla Firefox"
+            match = self._title_suffix_re.match(window_title)
+            if match and self.browser_processes[process_name] in match.group(2).casefold():
+                page = match.group(1)
+            page = page.strip()
+            if not page or page.casefold() == browser.casefold():
+                return browser
+            return f"{browser}: {page}"
+
+        # Use mapping for known applications
+        if process_name in self.app_name_mapping:
+            return self.app_name_mapping[process_name]
+
+        # Fallback to simple extraction
+        return self._simplify_title(window_title, process_name)
+
+    def wait_for_change(self, timeout):
+        """
+        Wait until the active window changes or the timeout expires.
+
+        Backends that receive focus and title change events wake up as soon
+        as a change happens; otherwise this simply sleeps for ``timeout``.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait.
+
+        Returns:
+            bool: True if a change was reported before the timeout.
+        """
+        backend = self._linux_backend
+        if backend is None:
+            time.sleep(timeout)
+            return False
+        changed = backend.changed.wait(timeout)
+        backend.changed.clear()
+        return changed
+
+    def _get_linux_backend(self):
+        """Pick the in-process X11 backend, falling back to xprop helpers"""
+        if self._linux_backend is None and not self._linux_backend_failed:
+            if not os.environ.get('DISPLAY'):
+                self._linux_backend_failed = True
+                return None
+            if xdisplay is not None:
+                try:
+                    self._linux_backend = _X11EventBackend()
+                except Exception as e:
+                    print(f"X11 backend unavailable: {e}")
+            if self._linux_backend is None:
+                try:
+                    self._linux_backend = _XpropSpyBackend()
+                except Exception as e:
+                    print(f"xprop backend unavailable: {e}")
+            self._linux_backend_failed = self._linux_backend is None
+        return self._linux_backend
     
     def get_active_window(self):
         system = platform.system()
@@ -49,27 +354,32 @@ class WindowTracker:
         try:
             hwnd = win32gui.GetForegroundWindow()
             _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process = psutil.Process(pid)
-            
-            # Get process name and window title
-            process_name = process.name().lower()
             window_title = win32gui.GetWindowText(hwnd)
-            
-            # Use mapping for known applications
-            if process_name in self.app_name_mapping:
-                return self.app_name_mapping[process_name]
-            
-            # For web browsers, try to extract primary website
-            if process_name in ['chrome.exe', 'msedge.exe', 'firefox.exe']:
-                # Extract website name from title
-                website_match = re.search(r'([^-]+)', window_title)
-                if website_match:
-                    website = website_match.group(1).strip()
-                    return website
-            
-            # Fallback to simple extraction
-            simple_title = self._simplify_title(window_title, process_name)
-            return simple_title
+
+            # Same window, same title, same process: reuse the normalized label
+            key = (hwnd, window_title)
+            cached = self._labels.get(key)
+            if cached is not None and cached[0] == pid:
+                self.label_cache_hits += 1
+                self._labels.move_to_end(key)
+                return cached[1]
+            self.label_cache_misses += 1
+
+            # The title of this window changed; its old label is stale
+            previous_key = self._label_keys.get(hwnd)
+            if previous_key is not None:
+                self._labels.pop(previous_key, None)
+
+            process_name = self._get_process_name(pid)
+            label = self._build_window_label(process_name, window_title)
+
+            self._labels[key] = (pid, label)
+            self._label_keys[hwnd] = key
+            if len(self._labels) > self.cache_size:
+                old_key, _ = self._labels.popitem(last=False)
+                if self._label_keys.get(old_key[0]) == old_key:
+                    del self._label_keys[old_key[0]]
+            return label
         
         except Exception as e:
             print(f"Windows tracking error: {e}")
@@ -77,8 +387,12 @@ class WindowTracker:
 
     def _get_linux_active_window(self):
         """
-        Linux-specific window tracking using wmctrl or psutil.
+        Linux-specific window tracking using X11 events, with wmctrl as a last resort.
         """
+        backend = self._get_linux_backend()
+        if backend is not None:
+            return backend.get_title()
+
         try:
             # You can also use wmctrl if installed:
             result = subprocess.run(["wmctrl", "-lG"], stdout=subprocess.PIPE)
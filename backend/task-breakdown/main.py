@@ -7,13 +7,13 @@ from typing import List, Optional, Dict
 import os
 from dotenv import load_dotenv, find_dotenv
 import asyncio
-import time
 import google.generativeai as genai
 from google.ai.generativelanguage import GenerateContentResponse
 import json
 import re
 import uuid
 from auth import auth_middleware
+from token_bucket import TokenBucketLimiter
 from typing import List, Dict, Optional
 from pydantic import BaseModel
 
@@ -50,7 +50,18 @@ genai.configure(api_key=GEMINI_API_KEY)
 # Rate Limiting Configuration
 RATE_LIMIT_WINDOW = 60
 MAX_REQUESTS_PER_WINDOW = 20
-request_counts = {}
+request_limiter = TokenBucketLimiter(
+    rate=MAX_REQUESTS_PER_WINDOW / RATE_LIMIT_WINDOW,
+    capacity=MAX_REQUESTS_PER_WINDOW
+)
+
+# Budget for Gemini calls shared by all clients of this instance
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", 30))
+GEMINI_RATE_LIMIT_WAIT = float(os.getenv("GEMINI_RATE_LIMIT_WAIT", 10))
+gemini_limiter = TokenBucketLimiter(
+    rate=GEMINI_REQUESTS_PER_MINUTE / 60,
+    capacity=GEMINI_REQUESTS_PER_MINUTE
+)
 
 # Data Models
 class SubTask(BaseModel):
@@ -101,18 +112,15 @@ class Conversation(BaseModel):
 
 # Helper Functions
 def check_rate_limit(client_ip: str):
-    now = time.time()
-    if client_ip not in request_counts:
-        request_counts[client_ip] = []
-
-    request_counts[client_ip] = [ts for ts in request_counts[client_ip] if ts > now - RATE_LIMIT_WINDOW]
-
-    if len(request_counts[client_ip]) >= MAX_REQUESTS_PER_WINDOW:
+    if not request_limiter.try_acquire(client_ip):
         raise HTTPException(status_code=429, detail="Rate limit exceeded")
 
-    request_counts[client_ip].append(now)
+async def wait_for_gemini_budget():
+    if not await gemini_limiter.acquire_async("gemini", timeout=GEMINI_RATE_LIMIT_WAIT):
+        raise HTTPException(status_code=429, detail="AI service is busy, please try again shortly")
 
 async def analyze_with_ai(task_name: str, description: str, priority: str, due_date: str) -> str:  # Modified function signature
+    await wait_for_gemini_budget()
     try:
         model = genai.GenerativeModel('gemini-2.0-flash')
 
@@ -156,6 +164,7 @@ async def calculate_priority_score(task: str, deadline: Optional[datetime], prio
     return min(base_score, 100)
 
 async def chat_with_gemini(user_message: str):
+    await wait_for_gemini_budget()
     try:
         model = genai.GenerativeModel('gemini-2.0-flash')
         #context = "\n".join([f"{msg['user']}: {msg['message']}" for msg in conversation_history_list])
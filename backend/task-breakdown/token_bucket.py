@@ -0,0 +1,133 @@
+import time
+import asyncio
+import threading
+
+
+class LocalBucketStore:
+    """
+    Bucket state kept in this process.
+
+    A bucket that has refilled to capacity is the same as no bucket, so
+    every ``prune_every`` takes the full buckets are dropped; one-off keys
+    such as client addresses do not pile up.
+    """
+    def __init__(self, prune_every=1000):
+        self.prune_every = prune_every
+        self._buckets = {}  # key -> (level, updated, time the bucket is full again)
+        self._takes = 0
+        self._lock = threading.Lock()
+
+    def take(self, key, tokens, rate, capacity):
+        """
+        Refill a bucket and take tokens from it if enough are available.
+
+        Returns:
+            tuple: (granted, seconds until the tokens would be available).
+        """
+        now = time.monotonic()
+        with self._lock:
+            level, updated, _ = self._buckets.get(key, (capacity, now, now))
+            level = min(capacity, level + (now - updated) * rate)
+            granted = level >= tokens
+            if granted:
+                level -= tokens
+            self._buckets[key] = (level, now, now + (capacity - level) / rate)
+
+            self._takes += 1
+            if self._takes >= self.prune_every:
+                self._takes = 0
+                self._buckets = {
+                    bucket_key: bucket for bucket_key, bucket in self._buckets.items()
+                    if bucket[2] > now
+                }
+        return granted, 0.0 if granted else (tokens - level) / rate
+
+
+class TokenBucketLimiter:
+    """
+    Token-bucket rate limiter with per-key buckets.
+
+    Each key refills at ``rate`` tokens per second up to ``capacity``. Callers
+    can take a token without waiting (``try_acquire``) or wait up to a
+    deadline without blocking the event loop (``acquire_async``). Bucket
+    state lives in this process.
+
+    Trimmed copy of productivity-tracker/token_bucket.py; the two services
+    are deployed separately and this one only needs the local store.
+    """
+    def __init__(self, rate, capacity, store=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float): Default tokens added per second.
+            capacity (float): Default bucket size, i.e. the allowed burst.
+            store (LocalBucketStore, optional): Bucket state; a new store
+                by default.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.store = store if store is not None else LocalBucketStore()
+        self._limits = {}
+
+        # Limiter counters
+        self.granted = 0
+        self.denied = 0
+        self.wait_seconds = 0.0
+
+    def configure(self, key, rate, capacity):
+        """Give a key its own rate and capacity"""
+        self._limits[key] = (rate, capacity)
+
+    def _take(self, key, tokens):
+        rate, capacity = self._limits.get(key, (self.rate, self.capacity))
+        return self.store.take(key, tokens, rate, capacity)
+
+    def try_acquire(self, key='default', tokens=1):
+        """
+        Take tokens if they are available right now.
+
+        Returns:
+            bool: True if the tokens were granted.
+        """
+        granted, _ = self._take(key, tokens)
+        if granted:
+            self.granted += 1
+        else:
+            self.denied += 1
+        return granted
+
+    async def acquire_async(self, key='default', tokens=1, timeout=None):
+        """
+        Wait for tokens, giving up at a deadline, without blocking the event loop.
+
+        Args:
+            key (str): Bucket key.
+            tokens (int): Number of tokens to take.
+            timeout (float, optional): Maximum number of seconds to wait;
+                None waits as long as needed.
+
+        Returns:
+            bool: True if the tokens were granted before the deadline.
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = None if timeout is None else started + timeout
+        while True:
+            granted, wait = self._take(key, tokens)
+            if granted:
+                self.granted += 1
+                self.wait_seconds += loop.time() - started
+                return True
+            if deadline is not None and loop.time() + wait > deadline:
+                self.denied += 1
+                return False
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        """Get limiter counters"""
+        return {
+            'granted': self.granted,
+            'denied': self.denied,
+            'wait_seconds': round(self.wait_seconds, 3)
+        }